@@ -1,23 +1,35 @@
 #! /bin/env python
 
+import sys
+import time
+
+# startup profiling has to be set up before anything else is imported
+startup_time = time.time()
+if "--profile-startup" in sys.argv:
+  from SmokerLog.ImportProfiler import ImportProfiler
+  import_profiler = ImportProfiler()
+  import_profiler.install()
+else:
+  import_profiler = None
+
 from SmokerLog.Utils import *
 from SmokerLog.Units import *
+from SmokerLog.EventLoop import *
 from SmokerLog.TempLogger import *
-from SmokerLog.TempPlotter import *
-from SmokerLog.DataSources.StokerWebSource import *
+from SmokerLog.TempHistory import *
 from SmokerLog.DataSources.StokerJSONSource import *
+from SmokerLog.DataSources.ReplayDataSource import *
 
-import sys
-import dpath.util
+from PySide import QtCore,QtGui
+
+import threading
 import argparse
 import shlex
 import os
 import pprint
-import numpy
-import math
-import yaml
 import readline
 import inspect
+import resource
 
 
 
@@ -51,8 +63,7 @@ class Main(QtCore.QObject):
   started = QtCore.Signal()
 
   trigger_input_read = QtCore.Signal()
-  trigger_start_temp_reading = QtCore.Signal()
-  trigger_temp_read = QtCore.Signal()
+  new_data_read = QtCore.Signal( dict ) # carries data read by the (Qt-free) temp logger into the Qt event loop
 
   def set_default_config(self):
     pass
@@ -64,18 +75,24 @@ class Main(QtCore.QObject):
     mainargparser.add_argument("--host"           ,default="192.168.1.3" )
     mainargparser.add_argument("--read_interval"  ,default="1. min")
     mainargparser.add_argument("--debug"          ,default=False, action='store_true')
+    mainargparser.add_argument("--replay"         ,default=None, help="replay a recorded session (a sensor file prefix or a plot data pickle) instead of reading from the host")
+    mainargparser.add_argument("--speedup"        ,default=1., type=float, help="how many times faster than real time a replay runs (1 to 10000)")
+    mainargparser.add_argument("--profile-startup",default=False, action='store_true', help="print the time spent importing each module and the time it took to get to the prompt")
 
     args = mainargparser.parse_args(args = argv[1:])
 
     # set configuration options
     self.config = PyOptionTree()
     
-    self.config.set( "data/source"                  , args.host                                                    )
-    self.config.set( "templogger/read_interval"     , args.read_interval                                           )
-    self.config.set( "templogger/cache_buffer_size" , 10                                                           )
-    self.config.set( "app/log/filename"             , "SmokerLog.log"                                              )
-    self.config.set( "app/log/level"                , logging.DEBUG if args.debug else logging.INFO                )
-    self.config.set( "app/log/format"               , '[%(levelname)s] (%(threadName)s) %(asctime)s - %(message)s' )
+    self.config.addMapping( [ ( "data/source"                  , args.host                                                    )
+                            , ( "templogger/read_interval"     , args.read_interval                                           )
+                            , ( "templogger/cache_buffer_size" , 10                                                           )
+                            , ( "history/pickle/filename"      , ".TempPlotter.data.pickle"                                   )
+                            , ( "plotter/temperature/units"    , "F"                                                          )
+                            , ( "app/log/filename"             , "SmokerLog.log"                                              )
+                            , ( "app/log/level"                , logging.DEBUG if args.debug else logging.INFO                )
+                            , ( "app/log/format"               , '[%(levelname)s] (%(threadName)s) %(asctime)s - %(message)s' )
+                            ] )
 
     # configure logger
     logging.basicConfig(filename=self.config.get("app/log/filename")
@@ -110,21 +127,27 @@ class Main(QtCore.QObject):
 #                   |_|              |___/ |___/           
 
     # create the data source
-    if args.debug:
+    if args.replay is not None:
+      datasource = ReplayDataSource( args.replay, args.speedup )
+    elif args.debug:
       #datasource = DataSource( )
       datasource = IntermittentDataSource( )
     else:
       # datasource = StokerWebSource( self.config.get("data/source") )
       datasource = StokerJSONSource( self.config.get("data/source") )
-    # the temperature logger
-    self.templogger = TempLogger( datasource, self.config( "templogger" ) )
+    # the temperature logger does not use Qt. it runs on its own event loop, in its own thread.
+    self.loop = EventLoop()
+    self.templogger = TempLogger( datasource, self.config( "templogger" ), self.loop )
+
+    self.templog_thread = threading.Thread( target = self.loop.run, name = "TempLogger" )
+    self.templog_thread.daemon = True
+    self.finished.connect( self.loop.stop )
 
+    # the temperature history. the plotter, stats, etc. all read from here.
+    self.history = TempHistory( self.config( "history" ) )
 
-    self.templog_thread = QtCore.QThread(self)
-    self.templogger.moveToThread( self.templog_thread )
-    self.trigger_start_temp_reading.connect( self.templogger.start_reading )
-    self.trigger_temp_read.connect( self.templogger.read )
-    self.finished.connect( self.templog_thread.quit )
+    # data is emitted in the logger's thread. re-emitting it with a Qt signal queues it to the main thread.
+    self.templogger.new_data_read.connect( self.new_data_read.emit )
 
 
 #          _                       _       _   _            
@@ -135,14 +158,12 @@ class Main(QtCore.QObject):
 #                   |_|     |_|                             
 
 
-    # the temperature plotter
-    self.plot = TempPlotter()
-    self.templogger.new_data_read.connect( self.plot.append_to_data )
+    # the temperature plotter is created the first time a plot is requested, so
+    # pyqtgraph is not loaded unless it is needed.
+    self.plot = None
+    self.new_data_read.connect( self.append_to_history )
 
-    # plot refresh timer
-    self.plot_refresh_timer = QtCore.QTimer()
-    self.plot_refresh_timer.setInterval( (1*units.second).to( units.millisecond ).magnitude )
-    self.plot_refresh_timer.timeout.connect( self.plot.plot )
+    self.startup_seconds = None
 
 
 
@@ -176,13 +197,25 @@ class Main(QtCore.QObject):
 
     # start reading data
     self.templog_thread.start()    # start temp logger
-    self.trigger_start_temp_reading.emit()    # start reading data
+    self.loop.call_soon( self.templogger.start_reading )    # start reading data
 
     self.input_thread.start()    # start the user input thread
+
+    self.startup_seconds = time.time() - startup_time
+    logging.info( "startup took %.3f s" % self.startup_seconds )
+    if import_profiler is not None:
+      import_profiler.uninstall()
+      import_profiler.print_report()
+      print "time to prompt: %.3f s" % self.startup_seconds
+
     self.process_command("help") # kick off the input loop by processing the "help" command
 
 
 
+  def append_to_history(self,data):
+    # a slot on this object (rather than the history) makes sure the data is handled in the main thread
+    self.history.append_to_data( data )
+
   def process_command(self,input):
     input = shlex.split(input)
 
@@ -225,6 +258,7 @@ class Main(QtCore.QObject):
     self.finished.emit()
     # wait for threads to exit
     self.input_thread.wait()
+    self.templog_thread.join()
     
 
 
@@ -247,7 +281,7 @@ class Main(QtCore.QObject):
     except SystemExit:
       return
 
-    self.templogger.read_timer.stop()
+    self.loop.call_soon( self.templogger.read_timer.stop )
     self.quit()
 
   def command_log(self,*args):
@@ -276,6 +310,15 @@ class Main(QtCore.QObject):
     except SystemExit:
       return
 
+    if self.plot is None:
+      from SmokerLog.TempPlotter import TempPlotter
+      self.plot = TempPlotter( self.history, self.config( "plotter" ), self.templogger.data_source.now )
+
+      # plot refresh timer
+      self.plot_refresh_timer = QtCore.QTimer()
+      self.plot_refresh_timer.setInterval( (1*units.second).to( units.millisecond ).magnitude )
+      self.plot_refresh_timer.timeout.connect( self.plot.plot )
+
     self.plot.display()
     self.plot_refresh_timer.start()
 
@@ -292,9 +335,14 @@ class Main(QtCore.QObject):
 
     #print "Number of active threads: %d" % threading.active_count()
     print "user input thread: %s"        % (  "active" if self.input_thread.isRunning() else "inactive" )
-    print "temp logger thread: %s"       % (  "active" if self.templog_thread.isRunning() else "inactive" )
+    print "temp logger thread: %s"       % (  "active" if self.templog_thread.isAlive() else "inactive" )
     print "Run time: %s"                 % (datetime.datetime.now() - self.templogger.start)
-    print "Last read time: %s"           % fmtEpoch( self.plot.getMaxTime(), self.plot.timefmt )
+    print "Last read time: %s"           % fmtEpoch( self.history.getMaxTime(), self.history.timefmt )
+    print "Data points: %d"              % sum( [ len( self.history.data[sensor]['t'] ) for sensor in self.history.data ] )
+    if self.plot is not None:
+      print "Plot refreshes: %(refreshes)d (%(seconds).3f s total)" % self.plot.refresh_stats
+    print "Startup time: %.3f s"         % self.startup_seconds
+    print "Peak memory: %.1f MB"         % ( resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024. )
     self.templogger.print_status()
 
   def command_clear(self,*args):
@@ -308,8 +356,8 @@ class Main(QtCore.QObject):
     except SystemExit:
       return
 
-    self.templogger.clear()
-    self.plot.clear()
+    self.loop.call_soon( self.templogger.clear )
+    self.history.clear()
 
   def command_stats(self,*args):
     '''Compute and print some statistics of the recorded temperatures (avg, min, max, etc.)'''
@@ -322,36 +370,17 @@ class Main(QtCore.QObject):
     except SystemExit:
       return
 
-    stats = dict()
-
-    def calc_stats(t,T):
-
-      stats =  {}
-      # we need to convert all calculations to float
-      stats['domain']    = "%s - %s" % ( fmtEpoch( min( t), self.plot.timefmt ), fmtEpoch( max( t), self.plot.timefmt ) )
-      stats['current']  = float(      T[-1])
-      stats['max']      = float( max( T)   )
-      stats['min']      = float( min( T)   )
-      stats['avg']      = float( sum( T) / len( T ) )
-      stats['stdev']    = float( math.sqrt( sum( (T - stats['avg'])**2 )/len( T ) ) )
-
-      return stats
+    import yaml # deferred, only needed here
 
+    stats = dict()
 
-    stats["Total"] = {}
-    for sensor in self.plot.get_data():
-      t = self.plot.data[sensor]['t']
-      T = self.plot.data[sensor]['T']
-      stats["Total"][sensor] = calc_stats( t, T )
+    stats["Total"] = self.history.calc_stats()
 
     stats["Selected"] = {}
     
-    region_data = self.plot.get_region_data()
+    region_data = self.plot.get_region_data() if self.plot is not None else None
     if region_data:
-      for sensor in region_data:
-        t = region_data[sensor]['t']
-        T = region_data[sensor]['T']
-        stats["Selected"][sensor] = calc_stats( t, T )
+      stats["Selected"] = self.history.calc_stats( region_data )
 
 
     print yaml.dump( stats, default_flow_style=False )
@@ -367,7 +396,7 @@ class Main(QtCore.QObject):
     except SystemExit:
       return
 
-    pprint.pprint( self.plot.data )
+    pprint.pprint( self.history.data )
 
   def command_msg(self,*args):
     '''Print logged messages. For example, any debug messages that have been logged by the application.'''
@@ -435,6 +464,17 @@ class Main(QtCore.QObject):
     logging.debug( "setting '%s' to '%s'" % ( myargs.option, myargs.value ) )
 
     self.config.set( myargs.option, myargs.value )
+    self.config_changed( myargs.option )
+
+  def config_changed(self, option):
+    '''Let the component that owns option rebuild its settings.'''
+    (prefix,sep,key) = option.strip("/").partition("/")
+    if prefix == "templogger":
+      self.loop.call_soon( self.templogger.config_changed, key ) # the logger lives in the event loop's thread
+    elif prefix == "history":
+      self.history.config_changed( key )
+    elif prefix == "plotter" and self.plot is not None:
+      self.plot.config_changed( key )
 
   def command_help(self,*args):
     '''This output.'''
@@ -480,7 +520,7 @@ class Main(QtCore.QObject):
     except SystemExit:
       return
 
-    self.trigger_temp_read.emit()
+    self.loop.call_soon( self.templogger.read )
 
 
 
@@ -1,7 +1,10 @@
 import collections
+import datetime
 from ..Units import *
 
 class DataSource:
+  speedup = 1. # how much faster than real time the source's clock runs
+
   def get_data(self):
     '''Returns an ordered dict of temperature keyed on the sensor/probe name'''
     return collections.OrderedDict( [ ('sens1', 80), ('sens2', 87) ] )
@@ -10,6 +13,13 @@ class DataSource:
     info = {'tempunits' : 'F' }
     return info
 
+  def print_status(self):
+    pass
+
+  def now(self):
+    '''Returns the time that readings taken now should be stamped with'''
+    return datetime.datetime.now()
+
 class IntermittentDataSource(DataSource):
   iter = 0
   def get_data(self):
@@ -0,0 +1,173 @@
+import logging
+import threading
+import Queue
+import urlparse
+import time
+import bisect
+import collections
+
+
+class LatencyHistogram:
+  '''Histogram of the most recent request latencies (in seconds) using log-spaced buckets.
+     Only the last window samples are counted, so the histogram follows a host that gets slower or faster.'''
+  bounds = [ 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1., 2., 5., 10., 20. ]
+
+  def __init__(self, window = 100):
+    self.counts  = [0]*(len(self.bounds)+1) # the last bucket holds everything above the largest bound
+    self.total   = 0
+    self.samples = collections.deque( maxlen = window ) # bucket index of each sample in the window, oldest first
+
+  def add_bucket(self, i):
+    if len( self.samples ) == self.samples.maxlen:
+      self.counts[ self.samples[0] ] -= 1
+      self.total -= 1
+    self.samples.append( i )
+    self.counts[i] += 1
+    self.total += 1
+
+  def add(self, latency):
+    self.add_bucket( bisect.bisect_left( self.bounds, latency ) )
+
+  def add_timeout(self, timeout):
+    '''Adds a request that timed out. All we know is that it would have taken longer than timeout,
+       so it is counted in the first bucket above timeout.'''
+    self.add_bucket( bisect.bisect_right( self.bounds, timeout ) )
+
+  def percentile(self, p):
+    '''Returns the upper bound of the bucket containing the p'th fraction of samples, or None if there are no samples.'''
+    if self.total == 0:
+      return None
+    n = 0
+    for i in xrange(len(self.counts)):
+      n += self.counts[i]
+      if n >= p*self.total:
+        return self.bounds[i] if i < len(self.bounds) else float('inf')
+
+  def __str__(self):
+    labels = [ "<%g" % b for b in self.bounds ] + [ ">%g" % self.bounds[-1] ]
+    return " ".join( [ "%s:%d" % (l,n) for (l,n) in zip(labels,self.counts) if n > 0 ] )
+
+
+class HedgedRequester:
+  '''Issues GET requests with a timeout adapted to the latency history of each host.
+     If a request takes longer than is typical for its host, a second (hedged) request is sent
+     and whichever answers first is used.'''
+
+  def __init__(self, max_timeout, min_timeout = 0.5, timeout_factor = 2., timeout_percentile = 0.99, hedge_percentile = 0.9, min_samples = 10, window = 100, fetch = None):
+    self.max_timeout        = max_timeout # all times are in seconds
+    self.min_timeout        = min_timeout
+    self.timeout_factor     = timeout_factor
+    self.timeout_percentile = timeout_percentile
+    self.hedge_percentile   = hedge_percentile
+    self.min_samples        = min_samples
+    self.window             = window # number of recent requests the latency histograms cover
+    self.fetch              = fetch  # called as fetch(url, timeout=...) to make a request. requests.get if None
+
+    self.histograms = collections.OrderedDict()
+    self.stats      = dict()
+
+  def host_stats(self, host):
+    if not host in self.histograms:
+      self.histograms[host] = LatencyHistogram( self.window )
+      # recovering is set by a timeout and cleared once the adaptive timeout is above every latency seen since then
+      self.stats[host] = { 'requests' : 0, 'hedges' : 0, 'hedge_wins' : 0, 'timeouts' : 0, 'recovering' : False, 'slowest_since_timeout' : 0. }
+    return (self.histograms[host],self.stats[host])
+
+  def adaptive_timeout(self, hist):
+    return min( self.max_timeout, max( self.min_timeout, self.timeout_factor*hist.percentile( self.timeout_percentile ) ) )
+
+  def timeout(self, host):
+    '''Returns the timeout to use for the next request to host.'''
+    (hist,stats) = self.host_stats(host)
+    # fall back to the full timeout until we know what is typical, and after a timeout until the histogram
+    # has caught up with the host's latency, so a host that got slower for good does not keep timing out
+    if hist.total < self.min_samples or stats['recovering']:
+      return self.max_timeout
+    return self.adaptive_timeout( hist )
+
+  def hedge_delay(self, host):
+    '''Returns the time to wait on the first attempt before sending a hedged request, or None if we should not hedge.'''
+    (hist,stats) = self.host_stats(host)
+    if hist.total < self.min_samples:
+      return None
+    return hist.percentile( self.hedge_percentile )
+
+  def get(self, url):
+    import requests # deferred, it is slow to import
+    fetch = self.fetch if self.fetch is not None else requests.get
+    host = urlparse.urlparse(url).netloc
+    (hist,stats) = self.host_stats(host)
+    stats['requests'] += 1
+
+    timeout  = self.timeout(host)
+    hedge    = self.hedge_delay(host)
+    start    = time.time()
+    deadline = start + timeout
+    results  = Queue.Queue()
+
+    def attempt(n, timeout):
+      # run in a worker thread. results are put on the queue, including errors.
+      btime = time.time()
+      try:
+        page = fetch(url, timeout=timeout)
+        results.put( (n, time.time() - btime, page, None) )
+      except Exception, e:
+        results.put( (n, time.time() - btime, None, e) )
+
+    def launch(n, timeout):
+      thread = threading.Thread( target = attempt, args = (n,timeout) )
+      thread.daemon = True # a losing attempt should never keep the application from exiting
+      thread.start()
+
+    launch(0, timeout)
+    attempts = 1
+    finished = 0
+    error    = None
+    while finished < attempts:
+      wait = deadline - time.time()
+      if attempts == 1 and hedge is not None and hedge < timeout:
+        wait = min( wait, start + hedge - time.time() )
+
+      try:
+        (n,latency,page,e) = results.get( timeout = max( wait, 0. ) )
+      except Queue.Empty:
+        if time.time() < deadline and attempts == 1:
+          logging.debug("Request to %s is taking longer than usual. Sending hedged request." % host)
+          launch(1, deadline - time.time())
+          attempts += 1
+          stats['hedges'] += 1
+          continue
+        break
+
+      finished += 1
+      if e is None:
+        hist.add( latency )
+        if stats['recovering']:
+          stats['slowest_since_timeout'] = max( stats['slowest_since_timeout'], latency )
+          if hist.total >= self.min_samples and self.adaptive_timeout( hist ) > stats['slowest_since_timeout']:
+            stats['recovering'] = False
+        if n == 1:
+          stats['hedge_wins'] += 1
+        return page
+      error = e
+
+    if error is not None and not isinstance( error, requests.exceptions.Timeout ):
+      raise error
+
+    stats['timeouts'] += 1
+    hist.add_timeout( timeout )
+    stats['recovering'] = True
+    stats['slowest_since_timeout'] = 0.
+    raise requests.exceptions.Timeout( "No response from %s within %.2f seconds." % (host,timeout) )
+
+  def print_status(self):
+    for host in self.histograms:
+      hist  = self.histograms[host]
+      stats = self.stats[host]
+      print "%s latency: %d recent samples, p50 %s s, p90 %s s, p99 %s s, next timeout %.2f s" % ( host, hist.total
+                                                                                          , hist.percentile(0.5)
+                                                                                          , hist.percentile(0.9)
+                                                                                          , hist.percentile(0.99)
+                                                                                          , self.timeout(host) )
+      print "\thistogram (s): %s" % hist
+      print "\trequests: %(requests)d, hedged: %(hedges)d, hedges won: %(hedge_wins)d, timed out: %(timeouts)d" % stats
@@ -0,0 +1,114 @@
+from .DataSource import *
+import logging
+import datetime
+import time
+import pickle
+import glob
+import os
+
+
+class ReplayDataSource( DataSource ):
+  '''Data source that plays back a recorded session under a virtual clock that runs speedup times faster than real time.'''
+  timefmt = "%Y-%m-%d %H:%M:%S"
+
+  def __init__(self, source, speedup = 1., clock = time.time):
+    if speedup < 1 or speedup > 10000:
+      raise ValueError( "replay speedup must be between 1 and 10000 (got %s)" % speedup )
+
+    self.source  = source
+    self.speedup = float(speedup)
+    self.clock   = clock # wall clock, in seconds since the epoch
+
+    # samples maps sensor names to a list of (time,temp) tuples sorted by time
+    if os.path.isfile( self.source ):
+      self.samples = self.load_session( self.source )
+    else:
+      self.samples = self.load_sensor_files( self.source )
+
+    if len( self.samples ) < 1:
+      raise IOError( "no recorded data found for '%s'" % self.source )
+
+    self.begin = min( [ self.samples[name][0][0]  for name in self.samples ] )
+    self.end   = max( [ self.samples[name][-1][0] for name in self.samples ] )
+
+    # the virtual clock starts when data is first requested. until then it stays at the beginning of the session
+    self.wallstart = None
+    self.index = dict( [ (name,0) for name in self.samples ] )
+
+  def load_sensor_files(self, prefix):
+    '''Loads the sensor files written by TempLogger with the given prefix.'''
+    samples = collections.OrderedDict()
+    for filename in sorted( glob.glob( "%s-*.txt" % prefix ) ):
+      name = filename[len(prefix)+1:-len(".txt")]
+      if name == "eventLog":
+        continue
+      logging.debug("loading recorded data for '%s' from %s" % (name,filename))
+      samples[name] = []
+      with open( filename, 'r' ) as f:
+        for line in f:
+          line = line.strip()
+          if len(line) < 1:
+            continue
+          (t,temp) = line.rsplit(' ',1)
+          samples[name].append( ( time.mktime( time.strptime( t, self.timefmt ) ), float(temp) ) )
+      samples[name].sort()
+
+    return samples
+
+  def load_session(self, filename):
+    '''Loads a session captured by TempPlotter's pickle.'''
+    logging.debug("loading recorded session from %s" % filename)
+    data = pickle.load( open( filename, "rb" ) )
+    samples = collections.OrderedDict()
+    for name in data:
+      if len( data[name]['t'] ) > 0:
+        samples[name] = sorted( zip( [ float(t) for t in data[name]['t'] ], [ float(T) for T in data[name]['T'] ] ) )
+    return samples
+
+  def start(self):
+    '''Starts the virtual clock, if it is not running yet.'''
+    if self.wallstart is None:
+      self.wallstart = self.clock()
+
+  def virtual_time(self):
+    if self.wallstart is None:
+      return self.begin
+    return self.begin + ( self.clock() - self.wallstart )*self.speedup
+
+  def now(self):
+    return datetime.datetime.fromtimestamp( self.virtual_time() )
+
+  def finished(self):
+    return all( [ self.index[name] >= len( self.samples[name] ) for name in self.samples ] )
+
+  def get_data(self):
+    '''Returns the most recent recorded temperature of every sensor that has new samples at the current virtual time.'''
+    if self.finished():
+      logging.debug("replay of '%s' finished" % self.source)
+      return None
+
+    self.start()
+    vt = self.virtual_time()
+    data = collections.OrderedDict()
+    for name in self.samples:
+      i = self.index[name]
+      while i < len( self.samples[name] ) and self.samples[name][i][0] <= vt:
+        i += 1
+      if i > self.index[name]:
+        data[name] = self.samples[name][i-1][1]
+      self.index[name] = i
+
+    if len( data ) < 1:
+      return None
+
+    return data
+
+  def print_status(self):
+    progress = min( 1., ( self.virtual_time() - self.begin )/max( self.end - self.begin, 1. ) )
+    print "replaying %s at %gx (virtual time: %s, %.1f%% of %.1f min%s)" % ( self.source, self.speedup
+                                                                           , self.now().strftime( self.timefmt )
+                                                                           , 100*progress, (self.end - self.begin)/60.
+                                                                           , ", finished" if self.finished() else "" )
+
+  def __str__(self):
+    return "Replay of %s" % self.source
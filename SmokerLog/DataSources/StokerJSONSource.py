@@ -1,5 +1,5 @@
 from .DataSource import *
-import requests
+from .HedgedRequester import HedgedRequester
 import re
 import logging
 from io import StringIO
@@ -15,15 +15,20 @@ class StokerJSONSource( DataSource ):
     self.host = host
     self.url = "http://%(host)s/stoker.json" % {'host': self.host}
     self.timeout = 5*units.second
+    self.requester = HedgedRequester( max_timeout = self.timeout.to(units.second).magnitude )
+
+  def print_status(self):
+    self.requester.print_status()
 
   def __str__(self):
     return "Stoker JSON Interface (%s)" % self.host
 
   def get_data(self):
+    import requests # deferred, it is slow to import
     try:
       logging.debug("Requesting data from host (url: %s)" % self.url)
       # get the status page
-      page = requests.get(self.url, timeout=self.timeout.to(units.second).magnitude)
+      page = self.requester.get(self.url)
       # raise an exception for error codes
       page.raise_for_status()
       # get the raw json to parse
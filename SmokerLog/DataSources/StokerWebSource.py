@@ -1,4 +1,5 @@
 from .DataSource import *
+from .HedgedRequester import HedgedRequester
 import requests
 import re
 import logging
@@ -84,9 +85,13 @@ class StokerWebSource( DataSource ):
     self.parser = etree.HTMLParser()
     self.url = "http://%(host)s" % {'host': self.host}
     self.timeout = 5*units.second
+    self.requester = HedgedRequester( max_timeout = self.timeout.to(units.second).magnitude )
 
 
 
+  def print_status(self):
+    self.requester.print_status()
+
   def __str__(self):
     return "Stoker Web Interface (%s)" % self.host
 
@@ -95,7 +100,7 @@ class StokerWebSource( DataSource ):
     try:
       logging.debug("Requesting data from host (url: %s)" % self.url)
       # get the status page
-      page = requests.get(self.url, timeout=self.timeout.to(units.second).magnitude)
+      page = self.requester.get(self.url)
       # raise an exception for error codes
       page.raise_for_status()
       # get the raw html to parse
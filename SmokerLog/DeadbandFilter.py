@@ -0,0 +1,62 @@
+from .Units import *
+from .Utils import *
+
+import logging
+import collections
+
+
+# the settings read on every reading. rebuilt by config_changed() so filter() doesn't have to query the config tree.
+DeadbandSettings = collections.namedtuple( "DeadbandSettings", [ "enabled", "threshold", "heartbeat" ] )
+
+class DeadbandFilter:
+  '''Suppresses sensor readings that have not moved by more than a threshold since the last value that was passed on.
+     A sensor is always passed on once its heartbeat interval has elapsed, so a quiet sensor is not mistaken for a dropout.'''
+
+  def __init__(self, config):
+    logging.debug("constructing %s instance" % self.__class__.__name__)
+    self.config = config
+    self.config_changed()
+    self.clear()
+
+  def config_changed(self, key = None):
+    '''Rebuilds the settings snapshot. Must be called when an option in our config is changed.'''
+    self.settings = DeadbandSettings( enabled   = to_bool( self.config.get("enabled") )
+                                    , threshold = float( self.config.get("threshold") )
+                                    , heartbeat = unit( self.config.get("heartbeat"), units.minute ).to( units.second ).magnitude # in seconds
+                                    )
+
+  def filter(self, t, sensors):
+    '''Returns the sensors in the ordered dict sensors that should be passed on at time t (seconds since the epoch).'''
+    (enabled,threshold,heartbeat) = self.settings
+
+    passed = collections.OrderedDict()
+    for (name,temp) in sensors.items():
+      if not name in self.counts:
+        self.counts[name] = { 'received' : 0, 'suppressed' : 0 }
+      self.counts[name]['received'] += 1
+
+      # a sensor is suppressed only if we have passed on a value for it before, it has not
+      # moved by more than the threshold since then, and its heartbeat is not due yet.
+      if enabled and name in self.last:
+        (lastt,lasttemp) = self.last[name]
+        if abs( temp - lasttemp ) <= threshold and t - lastt < heartbeat:
+          self.counts[name]['suppressed'] += 1
+          continue
+
+      self.last[name] = (t,temp)
+      passed[name] = temp
+
+    return passed
+
+  def print_status(self):
+    print "deadband: %s (threshold: %s, heartbeat: %s s)" % ( "enabled" if self.settings.enabled else "disabled"
+                                                            , self.settings.threshold
+                                                            , self.settings.heartbeat )
+    for name in self.counts:
+      received   = self.counts[name]['received']
+      suppressed = self.counts[name]['suppressed']
+      print "\t%s: %d of %d readings suppressed (%.1f%%)" % ( name, suppressed, received, 100.*suppressed/received )
+
+  def clear(self):
+    self.last   = dict()                    # sensor name -> (time,temp) of the last value passed on
+    self.counts = collections.OrderedDict() # sensor name -> received/suppressed reading counts
@@ -0,0 +1,102 @@
+import threading
+import heapq
+import time
+import logging
+
+
+# a plain python replacement for the bits of Qt's event loop, signals and timers that the logging core needs.
+# nothing in here imports Qt, so the logger can run on a headless box.
+
+class Signal:
+  '''A minimal stand-in for QtCore.Signal. Connected slots are called in the thread that emits the signal.'''
+  def __init__(self):
+    self.slots = []
+
+  def connect(self, slot):
+    self.slots.append( slot )
+
+  def disconnect(self, slot):
+    self.slots.remove( slot )
+
+  def emit(self, *args):
+    for slot in list( self.slots ):
+      slot( *args )
+
+
+class EventLoop:
+  '''Runs queued and scheduled calls in the thread that calls run(). Calls may be queued from any thread.'''
+  def __init__(self):
+    self.condition = threading.Condition()
+    self.calls     = [] # heap of (time,sequence number,function,args)
+    self.sequence  = 0
+    self.running   = False
+    self.finished  = Signal()
+
+  def call_later(self, delay, func, *args):
+    with self.condition:
+      heapq.heappush( self.calls, ( time.time() + delay, self.sequence, func, args ) )
+      self.sequence += 1
+      self.condition.notify()
+
+  def call_soon(self, func, *args):
+    self.call_later( 0, func, *args )
+
+  def run(self):
+    logging.debug("starting event loop")
+    self.running = True
+    while self.running:
+      with self.condition:
+        if len( self.calls ) < 1:
+          self.condition.wait( 1. ) # wake up regularly so a stop() from a signal handler is noticed
+          continue
+        wait = self.calls[0][0] - time.time()
+        if wait > 0:
+          self.condition.wait( min( wait, 1. ) )
+          continue
+        (t,n,func,args) = heapq.heappop( self.calls )
+
+      try:
+        func( *args )
+      except Exception, e:
+        logging.exception( "Exception occured in event loop while calling %s" % func )
+
+    logging.debug("event loop finished")
+    self.finished.emit()
+
+  def stop(self):
+    with self.condition:
+      self.running = False
+      self.condition.notify()
+
+
+class Timer:
+  '''A repeating timer driven by an EventLoop, with the same interface as the parts of QtCore.QTimer that we use.'''
+  def __init__(self, loop):
+    self.loop       = loop
+    self.interval   = 0      # in milliseconds, like QTimer
+    self.active     = False
+    self.generation = 0      # used to ignore timeouts that were scheduled before a stop() or restart
+    self.timeout    = Signal()
+
+  def setInterval(self, interval):
+    self.interval = interval
+    if self.active:
+      self.start()
+
+  def start(self):
+    self.active = True
+    self.generation += 1
+    self.loop.call_later( self.interval / 1000., self.fire, self.generation )
+
+  def stop(self):
+    self.active = False
+    self.generation += 1
+
+  def isActive(self):
+    return self.active
+
+  def fire(self, generation):
+    if not self.active or generation != self.generation:
+      return
+    self.loop.call_later( self.interval / 1000., self.fire, generation )
+    self.timeout.emit()
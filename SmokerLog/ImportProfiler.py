@@ -0,0 +1,48 @@
+import __builtin__
+import sys
+import time
+import collections
+
+
+class ImportProfiler:
+  '''Records how long each module takes to import by wrapping the builtin __import__.
+     Only imports that actually load something are recorded, so repeated imports of a loaded module are not counted.'''
+
+  def __init__(self):
+    self.original = None
+    self.times    = collections.OrderedDict() # module name -> [cumulative time,self time]
+    self.children = [0.]                      # time spent in nested imports, one entry per import in progress
+
+  def install(self):
+    self.original = __builtin__.__import__
+    __builtin__.__import__ = self.profiled_import
+
+  def uninstall(self):
+    if self.original is not None:
+      __builtin__.__import__ = self.original
+      self.original = None
+
+  def profiled_import(self, name, *args, **kwargs):
+    nmods = len( sys.modules )
+    self.children.append( 0. )
+    btime = time.time()
+    try:
+      return self.original( name, *args, **kwargs )
+    finally:
+      elapsed  = time.time() - btime
+      children = self.children.pop()
+      self.children[-1] += elapsed
+      if len( sys.modules ) > nmods:
+        if not name in self.times:
+          self.times[name] = [0.,0.]
+        self.times[name][0] += elapsed
+        self.times[name][1] += elapsed - children
+
+  def total(self):
+    return self.children[0]
+
+  def print_report(self, n = 20):
+    print "imports took %.3f s total. most expensive modules:" % self.total()
+    print "\t%10s %10s  %s" % ("self (s)", "total (s)", "module")
+    for (name,(cum,own)) in sorted( self.times.items(), key = lambda item: item[1][1], reverse = True )[:n]:
+      print "\t%10.3f %10.3f  %s" % (own,cum,name)
@@ -0,0 +1,137 @@
+from .Units import *
+from .Utils import *
+from .EventLoop import Signal
+from .TempLogger import TempLogger
+
+import logging
+import pickle
+import numpy
+import math
+import os
+import collections
+
+
+# rebuilt by config_changed() so the pickle options don't have to be looked up in the config tree every time data changes.
+TempHistorySettings = collections.namedtuple( "TempHistorySettings", [ "pickle_enabled", "pickle_filename" ] )
+
+
+class TempHistory:
+  '''The time-temperature history of every sensor. This does not depend on Qt, so it can be used by the GUI and the headless logger.'''
+  timefmt = "%H:%M:%S"
+
+  def set_config_defaults(self):
+    defaults = { "pickle/enabled" : True
+               , "pickle/filename" : ".TempPlotter.data.pickle"
+               }
+    self.config.addMapping( [ ( opt, self.config.get( opt, defaults[opt] ) ) for opt in defaults ] )
+
+  def __init__(self, config = PyOptionTree() ):
+    logging.debug("constructing "+self.__class__.__name__+" instance")
+
+    self.data_changed = Signal()
+
+    self.config = config
+    self.set_config_defaults()
+    self.settings = None
+    self.config_changed()
+
+    # initialize data
+    if os.path.isfile( self.settings.pickle_filename ):
+      logging.debug("pickled plot data exists, loading now")
+      self.unpickle_data()
+    else:
+      logging.debug("no pickled data found (didn't find '%s'), initializing data" % self.settings.pickle_filename )
+      self.init_data()
+
+  def config_changed(self, key = None):
+    '''Rebuilds the settings snapshot. Must be called when an option in our config is changed.'''
+    old = self.settings
+    self.settings = TempHistorySettings( pickle_enabled  = to_bool( self.config.get("pickle/enabled") )
+                                       , pickle_filename = str( self.config.get("pickle/filename") )
+                                       )
+
+    was_enabled = old is not None and old.pickle_enabled
+    if self.settings.pickle_enabled and not was_enabled:
+      self.data_changed.connect( self.pickle_data )
+    if was_enabled and not self.settings.pickle_enabled:
+      self.data_changed.disconnect( self.pickle_data )
+
+
+  def get_data(self):
+    return self.data
+
+  def get_region_data(self, mint, maxt):
+    regioned_data = collections.OrderedDict()
+    for sensor in self.data:
+      mini = numpy.searchsorted( self.data[sensor]['t'], mint )
+      maxi = numpy.searchsorted( self.data[sensor]['t'], maxt )
+      regioned_data[sensor] = { 't' : self.data[sensor]['t'][mini:maxi]
+                              , 'T' : self.data[sensor]['T'][mini:maxi] }
+
+    return regioned_data
+
+  def append_to_data( self, data ):
+    # data contains all of the time-temperature history data points that will be
+    # plotted. we store a seprate time-temperature pair for every sensor.
+    logging.debug( "appending data to history")
+    t = strptime( data["time"], TempLogger.timefmt )
+    for name in data["sensors"]:
+      if not name in self.data:
+        self.data[name] = { 't' : numpy.array([]), 'T' : numpy.array([]) }
+
+      self.data[name]['t'] = numpy.append( self.data[name]['t'], time.mktime( t.timetuple() ) )
+      self.data[name]['T'] = numpy.append( self.data[name]['T'], data["sensors"][name] )
+
+    self.data_changed.emit()
+
+  def calc_stats(self, data = None):
+    '''Compute statistics (avg, min, max, etc.) of each sensor in data (all recorded data by default).'''
+    if data is None:
+      data = self.data
+
+    stats = dict()
+    for sensor in data:
+      t = data[sensor]['t']
+      T = data[sensor]['T']
+      if len( T ) < 1:
+        continue
+
+      stats[sensor] = {}
+      # we need to convert all calculations to float
+      stats[sensor]['domain']   = "%s - %s" % ( fmtEpoch( min( t), self.timefmt ), fmtEpoch( max( t), self.timefmt ) )
+      stats[sensor]['current']  = float(      T[-1])
+      stats[sensor]['max']      = float( max( T)   )
+      stats[sensor]['min']      = float( min( T)   )
+      stats[sensor]['avg']      = float( sum( T) / len( T ) )
+      stats[sensor]['stdev']    = float( math.sqrt( sum( (T - stats[sensor]['avg'])**2 )/len( T ) ) )
+
+    return stats
+
+  def getMinTime(self):
+    if len( self.data ) == 0:
+      return 0
+    else:
+      return min( [ min(self.data[sensor]['t']) for sensor in self.data ] )
+
+  def getMaxTime(self):
+    if len( self.data ) == 0:
+      return 0
+    else:
+      return max( [ max(self.data[sensor]['t']) for sensor in self.data ] )
+
+
+  def pickle_data(self):
+    logging.debug("pickling data to %s" % self.settings.pickle_filename )
+    pickle.dump( self.data, open( self.settings.pickle_filename, "wb" ) )
+
+  def unpickle_data(self):
+    logging.debug("unpickling data from %s" % self.settings.pickle_filename )
+    self.data = pickle.load( open( self.settings.pickle_filename, "rb" ) )
+
+  def clear(self):
+    self.init_data()
+    if os.path.isfile( self.settings.pickle_filename ):
+      os.remove( self.settings.pickle_filename )
+
+  def init_data(self):
+    self.data = collections.OrderedDict()
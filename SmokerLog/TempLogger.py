@@ -1,6 +1,8 @@
 
 from .Units import *
 from .Utils import *
+from .DeadbandFilter import DeadbandFilter
+from .EventLoop import Signal, Timer
 
 import datetime
 import time
@@ -10,24 +12,32 @@ import logging
 import collections
 
 
-class TempLogger(QtCore.QObject): # we inherit from QObject so we can emit signals
-  new_data_read = QtCore.Signal( dict )
+# the settings read on every reading and write. rebuilt by config_changed() so they don't have to be looked up in the config tree each time.
+TempLoggerSettings = collections.namedtuple( "TempLoggerSettings", [ "prefix", "read_interval", "cache_buffer_size" ] )
+
+
+class TempLogger:
   timefmt = "%Y-%m-%d %H:%M:%S"
 
   def set_config_defaults(self):
+    # the deadband is off by default. when enabled, readings that have not changed are not written to the log files or plots until the heartbeat is due.
     defaults = { "prefix" : "default"
                , "read_interval" : "1. min"
                , "cache_buffer_size" : 10
+               , "deadband/enabled" : False
+               , "deadband/threshold" : 0.
+               , "deadband/heartbeat" : "5 min"
                }
 
-    for opt in defaults:
-      self.config.set( opt, self.config.get( opt, defaults[opt] ) )
+    self.config.addMapping( [ ( opt, self.config.get( opt, defaults[opt] ) ) for opt in defaults ] )
 
 
-  def __init__(self, source, config):
-    super(TempLogger,self).__init__()
+  def __init__(self, source, config, loop):
     logging.debug("constructing %s instance" % self.__class__.__name__)
 
+    # signals are emitted from the event loop's thread
+    self.new_data_read = Signal()
+
     self.config = config
     self.set_config_defaults()
 
@@ -40,13 +50,16 @@ class TempLogger(QtCore.QObject): # we inherit from QObject so we can emit signa
     info = self.data_source.get_info()
     self.tempunits = info['tempunits']
 
-    # read timer
-    self.read_timer = QtCore.QTimer()
-    self.read_timer.setInterval( unit(self.config.get("read_interval"),units.minute).to( units.millisecond ).magnitude )
+    # filter that drops sensor values that haven't changed since the last reading
+    self.deadband = DeadbandFilter( self.config( "deadband" ) )
+
+    # read timer. the read interval is given in the source's time, which may run faster than real time (e.g. replays)
+    self.read_timer = Timer( loop )
 
 
     # data
     self.cache = collections.deque()
+    self.write_stats = { 'writes' : 0, 'items' : 0, 'seconds' : 0. }
 
  
     # connect signals
@@ -54,6 +67,22 @@ class TempLogger(QtCore.QObject): # we inherit from QObject so we can emit signa
     self.new_data_read.connect( self.append_to_cache )  # make sure data is appended to cache as it is read
     self.read_timer.timeout.connect( self.read )        # trigger a read on a regular basis
 
+    self.config_changed()
+
+  def config_changed(self, key = None):
+    '''Rebuilds the settings snapshot. Must be called (in the event loop's thread) when an option in our config is changed.
+       key is the option that changed, relative to our config. None means anything may have changed.'''
+    self.settings = TempLoggerSettings( prefix            = str( self.config.get("prefix") )
+                                      , read_interval     = unit(self.config.get("read_interval"),units.minute).to( units.millisecond ).magnitude / self.data_source.speedup # in ms
+                                      , cache_buffer_size = int( self.config.get("cache_buffer_size") )
+                                      )
+
+    if not key or key == "read_interval":
+      self.read_timer.setInterval( self.settings.read_interval )
+
+    if not key or key.startswith("deadband"):
+      self.deadband.config_changed( key[len("deadband/"):] if key else None )
+
 
   def start_reading(self):
     logging.debug("starting read timer")
@@ -69,7 +98,12 @@ class TempLogger(QtCore.QObject): # we inherit from QObject so we can emit signa
       logging.debug("Source returned None. Will try again later.")
       return
     logging.debug("recieved data")
-    etime = datetime.datetime.now()
+    etime = self.data_source.now()
+
+    temps = self.deadband.filter( time.mktime( etime.timetuple() ), temps )
+    if len( temps ) < 1:
+      logging.debug("No sensor values changed by more than the deadband. Nothing to emit.")
+      return
 
     data = { "time"    : etime.strftime( self.timefmt )
            , "sensors" : temps }
@@ -80,32 +114,40 @@ class TempLogger(QtCore.QObject): # we inherit from QObject so we can emit signa
 
   def write(self):
     logging.debug("Writing %d items in data cache to file." % len(self.cache))
+    btime = time.time()
+    self.write_stats['writes'] += 1
+    self.write_stats['items']  += len(self.cache)
     while len( self.cache ):
       item = self.cache.popleft()
       for (name,temp) in item["sensors"].items():
-        filename = "%s-%s.txt" % (self.config.get("prefix"),name)
+        filename = "%s-%s.txt" % (self.settings.prefix,name)
         with open( filename, 'a' ) as f:
           f.write( "%s %s\n" % (item["time"],temp) )
+    self.write_stats['seconds'] += time.time() - btime
 
   def append_to_cache( self, data ):
     # the cache is used to write data to file
     logging.debug("appending data to cache")
     self.cache.append(data)
-    if len( self.cache ) >= int( self.config.get("cache_buffer_size") ):
+    if len( self.cache ) >= self.settings.cache_buffer_size:
       self.write()
 
   def log_event(self, event, time = None):
     if time is None:
-      time = datetime.datetime.now()
-    filename = "%s-%s.txt" % (self.config.get("prefix"),"eventLog")
+      time = self.data_source.now()
+    filename = "%s-%s.txt" % (self.settings.prefix,"eventLog")
     with open( filename, 'a' ) as f:
       f.write( "%s '%s'\n" % (str(time),event) )
 
   def print_status(self):
     print "data source: %s" % self.data_source
+    self.data_source.print_status()
     print "read interval: %s" % unit(self.config.get("read_interval") )
+    self.deadband.print_status()
+    print "file writes: %(writes)d (%(items)d readings, %(seconds).3f s total)" % self.write_stats
 
   def clear(self):
     self.cache.clear()
+    self.deadband.clear()
 
     
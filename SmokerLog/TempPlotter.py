@@ -1,82 +1,76 @@
 
 from .Units import *
 from .Utils import *
-from TempLogger import TempLogger
 
+from PySide import QtCore
 import pyqtgraph as pg
 import logging
-import pickle
-import numpy
 import types
-import os
-import collections
 import datetime
+import collections
+
 
+# the settings read on every refresh. rebuilt by config_changed() so they don't have to be looked up in the config tree each time.
+TempPlotterSettings = collections.namedtuple( "TempPlotterSettings", [ "temperature_units", "template", "colors", "pens" ] )
 
 class TempPlotter(QtCore.QObject): # we inherit from QObject so we can emit signals
   data_changed = QtCore.Signal( )
   timefmt = "%H:%M:%S"
 
   def set_config_defaults(self):
-    defaults = { "pickle/enabled" : True
-               , "pickle/filename" : ".TempPlotter.data.pickle"
-               , "temperature/units" : "F"
+    defaults = { "temperature/units" : "F"
                , "temperature/display/template" : '<div style="text-align: left"><span style="color: white;">Current Temps</span><br>%(temps)s</br></div>'
                , "plot/colors/0" : 'red'
                , "plot/colors/1" : 'blue'
                , "plot/colors/2" : 'green'
                , "plot/colors/3" : 'yellow'
                }
-    for opt in defaults:
-      self.config.set( opt, self.config.get( opt, defaults[opt] ) )
+    self.config.addMapping( [ ( opt, self.config.get( opt, defaults[opt] ) ) for opt in defaults ] )
 
-  def __init__(self, config = PyOptionTree() ):
+  def __init__(self, history, config = PyOptionTree(), clock = datetime.datetime.now ):
     super(TempPlotter,self).__init__()
     logging.debug("constructing "+self.__class__.__name__+" instance")
 
     self.config = config
     self.set_config_defaults()
+    self.config_changed()
 
-    # initialize data
-    if os.path.isfile( self.config.get("pickle/filename") ):
-      logging.debug("pickled plot data exists, loading now")
-      self.data = pickle.load( open( self.config.get("pickle/filename"), "rb" ) )
-    else:
-      logging.debug("no pickled data found (didn't find '%s'), initializing data" % self.config.get("pickle/filename") )
-      self.init_data()
-
-
+    # the data we plot. the history is Qt-free and owns the data (and its pickle)
+    self.history = history
+    self.history.data_changed.connect( self.data_changed.emit )
 
-
-
-
-    logging.debug("[%s] connecting signals/slots" % self.__class__.__name__)
-    if self.config.get( "pickle/enabled" ):
-      self.data_changed.connect( self.pickle_data )
+    # returns the current time on the data source's clock, which runs faster than real time for replays
+    self.clock = clock
 
 
     # declare attributes we will use in the methods
     self.plotregion = None
+    self.refresh_stats = { 'refreshes' : 0, 'seconds' : 0. }
+
 
 
 
+  def config_changed(self, key = None):
+    '''Rebuilds the settings snapshot. Must be called when an option in our config is changed.'''
+    colors = []
+    while self.config.isValid( "plot/colors/%d" % len(colors) ):
+      colors.append( str( self.config.get( "plot/colors/%d" % len(colors) ) ) )
+
+    self.settings = TempPlotterSettings( temperature_units = str( self.config.get("temperature/units") )
+                                       , template          = self.config.get("temperature/display/template")
+                                       , colors            = tuple( colors )
+                                       , pens              = tuple( [ pg.mkPen( color[0] ) for color in colors ] )
+                                       )
 
   def get_data(self):
-    return self.data
+    return self.history.get_data()
 
   def get_region_data(self):
     if self.plotregion == None:
       return None
 
-    regioned_data = collections.OrderedDict()
     mint,maxt = self.plotregion.getRegion()
-    for sensor in self.data:
-      mini = numpy.searchsorted( self.data[sensor]['t'], mint )
-      maxi = numpy.searchsorted( self.data[sensor]['t'], maxt )
-      regioned_data[sensor] = { 't' : self.data[sensor]['t'][mini:maxi]
-                              , 'T' : self.data[sensor]['T'][mini:maxi] }
-
-    return regioned_data
+    return self.history.get_region_data( mint, maxt )
 
 
 
@@ -118,18 +112,18 @@ class TempPlotter(QtCore.QObject): # we inherit from QObject so we can emit sign
 
     axis.tickStrings = types.MethodType( dateTickStrings, axis )
     axis = self.zplot.getAxis('left')
-    axis.setLabel("temperature (%s)" % self.config.get("temperature/units"))
+    axis.setLabel("temperature (%s)" % self.settings.temperature_units)
 
     axis = self.rplot.getAxis('bottom')
     axis.setLabel("time")
     axis.tickStrings = types.MethodType( dateTickStrings, axis )
     axis = self.rplot.getAxis('left')
-    axis.setLabel("temperature (%s)" % self.config.get("temperature/units"))
+    axis.setLabel("temperature (%s)" % self.settings.temperature_units)
 
 
 
     # ad a text item to display current temperatures
-    text = self.config.get("temperature/display/template")
+    text = self.settings.template
     self.tempDisp = pg.TextItem( html=text, anchor=(1,0) )
     self.rplot.addItem( self.tempDisp )
 
@@ -198,36 +192,28 @@ class TempPlotter(QtCore.QObject): # we inherit from QObject so we can emit sign
 
 
   def append_to_data( self, data ):
-    # data contains all of the time-temperature history data points that will be
-    # plotted. we store a seprate time-temperature pair for every sensor.
-    logging.debug( "appending data to plot data")
-    t = strptime( data["time"], TempLogger.timefmt )
-    for name in data["sensors"]:
-      if not name in self.data:
-        self.data[name] = { 't' : numpy.array([]), 'T' : numpy.array([]) }
-
-      self.data[name]['t'] = numpy.append( self.data[name]['t'], time.mktime( t.timetuple() ) )
-      self.data[name]['T'] = numpy.append( self.data[name]['T'], data["sensors"][name] )
-
-    self.data_changed.emit()
+    self.history.append_to_data( data ) # the history's data_changed signal is forwarded to ours
 
 
   def plot(self):
+    btime = time.time()
     i = 0
-    N = len( self.data )
+    data = self.history.get_data()
 
 
-    for name in self.data:
+    for name in data:
       if name not in self.plotcurves:
         self.plotcurves[name] = dict()
         self.plotcurves[name]['region'] = self.rplot.plot( name = name )
         self.plotcurves[name]['zoom']   = self.zplot.plot( name = name )
 
-      self.plotcurves[name]['region'].setData(x = self.data[name]['t'], y = self.data[name]['T'], pen=pg.mkPen( self.config.get("plot/colors/%d"%i)[0] ) )
-      self.plotcurves[name]['zoom'  ].setData(x = self.data[name]['t'], y = self.data[name]['T'], pen=pg.mkPen( self.config.get("plot/colors/%d"%i)[0] ) )
+      self.plotcurves[name]['region'].setData(x = data[name]['t'], y = data[name]['T'], pen=self.settings.pens[i] )
+      self.plotcurves[name]['zoom'  ].setData(x = data[name]['t'], y = data[name]['T'], pen=self.settings.pens[i] )
       i += 1
 
     self.displayCurrentTemps()
+    self.refresh_stats['refreshes'] += 1
+    self.refresh_stats['seconds']   += time.time() - btime
 
   def show(self):
     pass
@@ -236,44 +222,25 @@ class TempPlotter(QtCore.QObject): # we inherit from QObject so we can emit sign
   def displayCurrentTemps(self):
     disp = ""
     i = 0
-    now = time.mktime( datetime.datetime.now().timetuple() )
-    for sensor in self.data:
-      T = self.data[sensor]['T'][-1]
-      t = self.data[sensor]['t'][-1]
+    now = time.mktime( self.clock().timetuple() )
+    data = self.history.get_data()
+    for sensor in data:
+      T = data[sensor]['T'][-1]
+      t = data[sensor]['t'][-1]
       dt = (now - t)/60.
-      disp = disp + '<br><span style="color:%(color)s;font-size:36pt">%(temp).2f@%(time).2f<span></br>' % {'color' : self.config.get("plot/colors/%d"%i), 'temp' : T, 'time' : dt}
+      disp = disp + '<br><span style="color:%(color)s;font-size:36pt">%(temp).2f@%(time).2f<span></br>' % {'color' : self.settings.colors[i], 'temp' : T, 'time' : dt}
       i += 1
     
-    text = self.config.get("temperature/display/template") % {'temps' : disp}
+    text = self.settings.template % {'temps' : disp}
     self.tempDisp.setHtml( text )
     view = self.rplot.viewRange()
     self.tempDisp.setPos( view[0][1], view[1][1] )
 
   def getMinTime(self):
-    if len( self.data ) == 0:
-      return 0
-    else:
-      return min( [ min(self.data[sensor]['t']) for sensor in self.data ] )
+    return self.history.getMinTime()
 
   def getMaxTime(self):
-    if len( self.data ) == 0:
-      return 0
-    else:
-      return max( [ max(self.data[sensor]['t']) for sensor in self.data ] )
-
-
-  def pickle_data(self):
-    logging.debug("pickling data to %s" % self.config.get("pickle/filename") )
-    pickle.dump( self.data, open( self.config.get("pickle/filename"), "wb" ) )
-
-  def unpickle_data(self):
-    logging.debug("unpickling data from %s" % self.config.get("pickle/filename") )
-    self.data = pickle.load( open( self.config.get("pickle/filename"), "rb" ) )
+    return self.history.getMaxTime()
 
   def clear(self):
-    self.init_data()
-    os.remove( self.config.get("pickle/filename") )
-  
-  def init_data(self):
-    self.data = collections.OrderedDict()
-
+    self.history.clear()
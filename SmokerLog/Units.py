@@ -1,12 +1,158 @@
-import pint
+import re
+import threading
+import collections
 
-units = pint.UnitRegistry()
+
+class FastUnit(object):
+  '''A time or temperature unit that can be used without pint. Values are converted through the base unit (seconds or kelvin) with
+
+       base = (value + offset)*factor
+  '''
+  def __init__(self, name, dimensionality, factor, offset = 0.):
+    self.name           = name # the pint name of the unit, used when we need to hand things over to pint
+    self.dimensionality = dimensionality
+    self.factor         = factor
+    self.offset         = offset
+
+  def __mul__(self, magnitude):
+    return FastQuantity( magnitude, self )
+  __rmul__ = __mul__
+
+  def to_pint(self):
+    return getattr( units.get_registry(), self.name )
+
+  def __str__(self):
+    return self.name
+
+  def __repr__(self):
+    return "<FastUnit('%s')>" % self.name
+
+
+class FastQuantity(object):
+  '''A magnitude with a FastUnit. Implements the parts of pint.Quantity that we use. Anything else is handed over to pint.'''
+  def __init__(self, magnitude, unit):
+    self.magnitude = magnitude
+    self.units     = unit
+
+  @property
+  def dimensionality(self):
+    return self.units.dimensionality
+
+  def to(self, u):
+    if isinstance( u, basestring ):
+      u = fast_units.get( u, u )
+    if not isinstance( u, FastUnit ) or u.dimensionality != self.units.dimensionality:
+      return self.to_pint().to( u.to_pint() if isinstance( u, FastUnit ) else u )
+    if u is self.units:
+      return self
+    return FastQuantity( ( self.magnitude + self.units.offset )*self.units.factor/u.factor - u.offset, u )
+
+  def to_pint(self):
+    return units.Quantity( self.magnitude, self.units.name )
+
+  def __str__(self):
+    return "%s %s" % (self.magnitude, self.units.name)
+
+  def __repr__(self):
+    return "<FastQuantity(%s, '%s')>" % (self.magnitude, self.units.name)
+
+
+def _fast_unit_table():
+  table = dict()
+  for (name,aliases,dim,factor,offset) in [ ( "second"      , ("s","sec","seconds")   , "[time]"        , 1.     , 0.     )
+                                          , ( "millisecond" , ("ms","milliseconds")   , "[time]"        , 0.001  , 0.     )
+                                          , ( "minute"      , ("min","minutes")       , "[time]"        , 60.    , 0.     )
+                                          , ( "hour"        , ("hr","hours")          , "[time]"        , 3600.  , 0.     )
+                                          , ( "kelvin"      , ("K",)                  , "[temperature]" , 1.     , 0.     )
+                                          , ( "degC"        , ("celsius",)            , "[temperature]" , 1.     , 273.15 )
+                                          , ( "degF"        , ("fahrenheit",)         , "[temperature]" , 5/9.   , 459.67 )
+                                          ]:
+    # all of the aliases share one unit, so units can be compared by identity
+    u = FastUnit( name, dim, factor, offset )
+    table[name] = u
+    for alias in aliases:
+      table[alias] = u
+  return table
+
+# note that F, C and h are not here. pint reads them as farad, coulomb and planck's constant.
+fast_units = _fast_unit_table()
+
+
+class LazyUnitRegistry(object):
+  '''Stands in for a pint.UnitRegistry. Building the registry (and importing pint) is slow, so it is not done until the first time it is used.
+     The units in fast_units are returned without building the registry.'''
+  def __init__(self):
+    self.registry = None
+
+  def get_registry(self):
+    if self.registry is None:
+      import pint
+      self.registry = pint.UnitRegistry()
+    return self.registry
+
+  def __getattr__(self, name):
+    if name in fast_units:
+      return fast_units[name]
+    return getattr( self.get_registry(), name )
+
+units = LazyUnitRegistry()
+
+
+# matches "<number>" and "<number> <unit>". anything else is parsed by pint.
+_quantity_regex = re.compile( r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([A-Za-z]*)\s*$" )
+
+def parse_quantity( string ):
+  '''Parses a quantity string. Simple time and temperature quantities are handled here, everything else is parsed by pint.'''
+  match = _quantity_regex.match( string )
+  if match:
+    (number,name) = match.groups()
+    number = int(number) if number.lstrip("+-").isdigit() else float(number)
+    if name == "":
+      return number
+    if name in fast_units:
+      return FastQuantity( number, fast_units[name] )
+  return units.parse_expression( string )
+
+
+_memo      = collections.OrderedDict()
+_memo_lock = threading.Lock()
+_memo_size = 256
 
 def unit( string, u = None ):
-  v = units.parse_expression( string )
+  if isinstance( u, basestring ):
+    u = getattr( units, u )
+
+  try:
+    key = (string, u)
+    hash( key )
+  except TypeError:
+    key = None
+
+  if key is not None:
+    v = _memo.get( key )
+    if v is not None:
+      return v
+
+  v = parse_quantity( string )
   if u is not None:
-    if u.dimensionality != v.dimensionality:
-      # if v does not have the same dimensions as u, throw away the units of v and assume it has the same units as u
-      v = (u / u.magnitude) * v.magnitude
+    if isinstance( u, FastUnit ):
+      if not isinstance( v, FastQuantity ) and hasattr( v, 'dimensionality' ) and v.dimensionality == u.to_pint().dimensionality:
+        # pint parsed a unit we don't know that has the same dimensions as u (e.g. "2 day"). convert it so the caller still gets a FastQuantity
+        v = FastQuantity( v.to( u.name ).magnitude, u )
+      elif not isinstance( v, FastQuantity ) or u.dimensionality != v.dimensionality:
+        # if v does not have the same dimensions as u, throw away the units of v and assume it has the same units as u
+        v = FastQuantity( getattr( v, 'magnitude', v ), u )
+    else:
+      if isinstance( v, FastQuantity ):
+        v = v.to_pint()
+      if u.dimensionality != v.dimensionality:
+        # if v does not have the same dimensions as u, throw away the units of v and assume it has the same units as u
+        v = (u / u.magnitude) * v.magnitude
+
+  if key is not None:
+    with _memo_lock:
+      _memo[key] = v
+      while len( _memo ) > _memo_size:
+        _memo.popitem( last = False ) # drop the oldest entry
 
   return v
@@ -1,7 +1,6 @@
 import time
 import datetime
 from pyoptiontree.pyoptiontree import *
-from PySide import QtCore,QtGui
 
 def fmtEpoch( t, fmt ):
   return datetime.datetime( *time.localtime( t )[0:6] ).strftime( fmt )
@@ -9,3 +8,10 @@ def fmtEpoch( t, fmt ):
 
 def strptime( t, fmt ):
   return datetime.datetime.strptime( t, fmt )
+
+
+def to_bool( v ):
+  # options set from the command line are strings
+  if isinstance( v, basestring ):
+    return v.strip().lower() in ( "true", "yes", "on", "1" )
+  return bool( v )
@@ -0,0 +1,51 @@
+"""
+Times the imports SmokerLog.py makes before it shows its prompt, in a
+fresh interpreter each time, with the heavy modules deferred (as they
+are now) and with them imported up front (as they used to be).  Qt is
+left out of both; it is needed either way.  Run from the repository
+root:
+
+  python2 -m SmokerLog.benchmarks.bench_startup [repeat]
+"""
+
+import sys, subprocess
+
+# what SmokerLog.py imports at startup, apart from PySide
+startup_modules = [ 'SmokerLog.Utils', 'SmokerLog.Units', 'SmokerLog.EventLoop', 'SmokerLog.TempLogger'
+                  , 'SmokerLog.TempHistory', 'SmokerLog.DataSources.StokerJSONSource', 'SmokerLog.DataSources.ReplayDataSource' ]
+
+# imported on first use. lxml comes with StokerWebSource, which SmokerLog.py no longer imports
+deferred_modules = [ 'pint', 'requests', 'yaml', 'pyqtgraph', 'lxml.html' ]
+
+child = '''
+import sys, time
+from SmokerLog.ImportProfiler import ImportProfiler
+profiler = ImportProfiler()
+profiler.install()
+btime = time.time()
+for name in %(startup)r:
+  __import__(name)
+if %(eager)r:
+  for name in %(deferred)r:
+    try:
+      __import__(name)
+    except ImportError:
+      pass
+  sys.modules['SmokerLog.Units'].units.get_registry()
+t = time.time() - btime
+profiler.uninstall()
+print t, ' '.join([name for name in %(deferred)r if name in sys.modules])
+'''
+
+def timestartup(eager):
+    out = subprocess.check_output([sys.executable, '-c', child % {'startup' : startup_modules, 'deferred' : deferred_modules, 'eager' : eager}])
+    t, loaded = (out.strip().split(' ', 1) + [''])[:2]
+    return float(t), loaded
+
+def main(repeat = 5):
+    for (label, eager) in [('deferred', False), ('up front', True)]:
+        results = [timestartup(eager) for i in xrange(repeat)]
+        print '%-8s  %.3f s   heavy modules loaded: %s' % (label, min([t for t, loaded in results]), results[0][1] or 'none')
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
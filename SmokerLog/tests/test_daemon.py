@@ -0,0 +1,42 @@
+import os, shutil, signal, tempfile, unittest
+
+from SmokerLogDaemon import Daemon
+
+
+class DaemonTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+        self.handlers = [(s, signal.getsignal(s)) for s in (signal.SIGINT, signal.SIGTERM)]
+
+    def tearDown(self):
+        for s, handler in self.handlers:
+            signal.signal(s, handler)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def testRunTicks(self):
+        # the debug source drops every third reading
+        daemon = Daemon(["SmokerLogDaemon.py", "--debug", "--read_interval", "0.01 s", "--prefix", "test"])
+        ticks = []
+        def tick():
+            ticks.append(True)
+            if len(ticks) == 6:
+                daemon.loop.stop()
+        daemon.templogger.read_timer.timeout.connect(tick)
+        daemon.loop.call_later(5., daemon.loop.stop)
+        daemon.run()
+
+        self.assertEqual(len(ticks), 6)
+        for sensor in ["sens1", "sens2"]:
+            f = open("test-%s.txt" % sensor)
+            lines = f.readlines()
+            f.close()
+            self.assertEqual(len(lines), 4)   # written from the cache on the way out
+            self.assertEqual(len(daemon.history.get_data()[sensor]['T']), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
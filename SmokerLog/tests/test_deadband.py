@@ -0,0 +1,65 @@
+import collections, unittest
+
+from pyoptiontree import PyOptionTree
+from SmokerLog.DeadbandFilter import DeadbandFilter
+from SmokerLog.TempLogger import TempLogger
+from SmokerLog.EventLoop import EventLoop
+from SmokerLog.DataSources.DataSource import DataSource
+
+
+def readings(*pairs):
+    return collections.OrderedDict(pairs)
+
+
+class DeadbandFilterTests(unittest.TestCase):
+
+    def make(self, enabled = True, threshold = 1., heartbeat = "5 min"):
+        config = PyOptionTree()
+        config.addMapping([("enabled", enabled), ("threshold", threshold), ("heartbeat", heartbeat)])
+        return DeadbandFilter(config)
+
+    def testDisabledByDefault(self):
+        logger = TempLogger(DataSource(), PyOptionTree(), EventLoop())
+        deadband = logger.deadband
+        self.assertFalse(deadband.settings.enabled)
+        for t in xrange(5):
+            self.assertEqual(deadband.filter(t, readings(("a", 80.), ("b", 90.))), readings(("a", 80.), ("b", 90.)))
+        self.assertEqual(deadband.counts["a"], {'received' : 5, 'suppressed' : 0})
+
+    def testFirstSamplePassed(self):
+        deadband = self.make()
+        self.assertEqual(deadband.filter(0, readings(("a", 80.))), readings(("a", 80.)))
+        self.assertEqual(deadband.filter(1, readings(("a", 80.), ("b", 80.))), readings(("b", 80.)))
+
+    def testBand(self):
+        deadband = self.make(threshold = 1.)
+        deadband.filter(0, readings(("a", 80.)))
+        self.assertEqual(deadband.filter(1, readings(("a", 81.))), readings())     # on the edge of the band
+        self.assertEqual(deadband.filter(2, readings(("a", 79.5))), readings())
+        self.assertEqual(deadband.filter(3, readings(("a", 81.5))), readings(("a", 81.5)))
+        # the band moves with the last value passed on
+        self.assertEqual(deadband.filter(4, readings(("a", 80.9))), readings())
+        self.assertEqual(deadband.filter(5, readings(("a", 80.4))), readings(("a", 80.4)))
+        self.assertEqual(deadband.counts["a"], {'received' : 6, 'suppressed' : 3})
+
+    def testHeartbeat(self):
+        deadband = self.make(heartbeat = "1 min")
+        deadband.filter(0, readings(("a", 80.)))
+        self.assertEqual(deadband.filter(59, readings(("a", 80.))), readings())
+        self.assertEqual(deadband.filter(60, readings(("a", 80.))), readings(("a", 80.)))
+        self.assertEqual(deadband.filter(61, readings(("a", 80.))), readings())
+
+    def testEnabledFromCommandLineString(self):
+        deadband = self.make(enabled = "yes")
+        deadband.filter(0, readings(("a", 80.)))
+        self.assertEqual(deadband.filter(1, readings(("a", 80.))), readings())
+
+    def testClear(self):
+        deadband = self.make()
+        deadband.filter(0, readings(("a", 80.)))
+        deadband.clear()
+        self.assertEqual(deadband.filter(1, readings(("a", 80.))), readings(("a", 80.)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import threading, time, unittest
+
+from SmokerLog.EventLoop import Signal, EventLoop, Timer
+
+
+class SignalTests(unittest.TestCase):
+
+    def testConnectEmit(self):
+        signal = Signal()
+        calls = []
+        signal.connect(lambda *args: calls.append(('a',) + args))
+        signal.connect(lambda *args: calls.append(('b',) + args))
+        signal.emit(1, 2)
+        self.assertEqual(calls, [('a', 1, 2), ('b', 1, 2)])
+
+    def testDisconnect(self):
+        signal = Signal()
+        calls = []
+        signal.connect(calls.append)
+        signal.emit(1)
+        signal.disconnect(calls.append)
+        signal.emit(2)
+        self.assertEqual(calls, [1])
+
+    def testDisconnectWhileEmitting(self):
+        signal = Signal()
+        calls = []
+        def once(v):
+            calls.append(v)
+            signal.disconnect(once)
+        signal.connect(once)
+        signal.connect(calls.append)
+        signal.emit(1)
+        signal.emit(2)
+        self.assertEqual(calls, [1, 1, 2])
+
+
+class EventLoopTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = EventLoop()
+        self.calls = []
+        self.loop.call_later(5., self.loop.stop) # never hang the test run
+
+    def run_until(self, n):
+        # runs the loop until n calls have been recorded
+        def record(v):
+            self.calls.append(v)
+            if len(self.calls) >= n:
+                self.loop.stop()
+        return record
+
+    def testOrder(self):
+        record = self.run_until(5)
+        self.loop.call_later(0.03, record, 'late')
+        self.loop.call_later(0.01, record, 'early')
+        self.loop.call_soon(record, 'soon1')
+        self.loop.call_soon(record, 'soon2')
+        self.loop.call_later(0.02, record, 'middle')
+        self.loop.run()
+        self.assertEqual(self.calls, ['soon1', 'soon2', 'early', 'middle', 'late'])
+
+    def testCallFromOtherThread(self):
+        record = self.run_until(1)
+        thread = threading.Thread(target = self.loop.call_soon, args = (record, 'thread'))
+        self.loop.call_soon(thread.start)
+        self.loop.run()
+        thread.join()
+        self.assertEqual(self.calls, ['thread'])
+
+    def testExceptionDoesNotStopLoop(self):
+        def fail():
+            raise ValueError("boom")
+        record = self.run_until(1)
+        self.loop.call_soon(fail)
+        self.loop.call_soon(record, 'after')
+        self.loop.run()
+        self.assertEqual(self.calls, ['after'])
+
+    def testFinished(self):
+        finished = []
+        self.loop.finished.connect(lambda: finished.append(True))
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run()
+        self.assertEqual(finished, [True])
+
+    def testTimers(self):
+        record = self.run_until(6)
+        fast = Timer(self.loop)
+        fast.setInterval(20)
+        fast.timeout.connect(lambda: record('fast'))
+        slow = Timer(self.loop)
+        slow.setInterval(50)
+        slow.timeout.connect(lambda: record('slow'))
+        self.loop.call_soon(fast.start)
+        self.loop.call_soon(slow.start)
+        self.loop.run()
+        self.assertEqual(self.calls, ['fast', 'fast', 'slow', 'fast', 'fast', 'slow'])
+
+    def testTimerStop(self):
+        timer = Timer(self.loop)
+        timer.setInterval(10)
+        def tick():
+            self.calls.append('tick')
+            if len(self.calls) == 2:
+                timer.stop()
+                self.loop.call_later(0.05, self.loop.stop)
+        timer.timeout.connect(tick)
+        self.loop.call_soon(timer.start)
+        self.loop.run()
+        self.assertEqual(self.calls, ['tick', 'tick'])
+        self.assertFalse(timer.isActive())
+
+    def testTimerRestart(self):
+        # changing the interval of a running timer drops the timeout scheduled with the old one
+        record = self.run_until(2)
+        timer = Timer(self.loop)
+        timer.setInterval(1000)
+        btime = time.time()
+        timer.timeout.connect(lambda: record(time.time() - btime))
+        timer.start()
+        timer.setInterval(10)
+        self.loop.run()
+        self.assertTrue(self.calls[-1] < 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
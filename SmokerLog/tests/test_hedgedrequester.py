@@ -0,0 +1,161 @@
+import threading, unittest
+
+import requests
+
+from SmokerLog.DataSources.HedgedRequester import LatencyHistogram, HedgedRequester
+
+
+class LatencyHistogramTests(unittest.TestCase):
+
+    def testPercentile(self):
+        hist = LatencyHistogram()
+        self.assertEqual(hist.percentile(0.5), None)
+        for i in xrange(9):
+            hist.add(0.005)
+        hist.add(0.3)
+        self.assertEqual(hist.total, 10)
+        self.assertEqual(hist.percentile(0.5), 0.01)
+        self.assertEqual(hist.percentile(0.9), 0.01)
+        self.assertEqual(hist.percentile(0.99), 0.5)
+        hist.add(30.)
+        self.assertEqual(hist.percentile(1.), float('inf'))
+
+    def testWindow(self):
+        hist = LatencyHistogram(window = 3)
+        for i in xrange(3):
+            hist.add(0.005)
+        hist.add(1.5)
+        self.assertEqual(hist.total, 3)
+        self.assertEqual(hist.percentile(1.), 2.)
+        self.assertEqual(hist.percentile(0.5), 0.01)
+        hist.add(1.5)
+        hist.add(1.5)
+        self.assertEqual(hist.total, 3)
+        self.assertEqual(hist.percentile(0.01), 2.)
+        self.assertEqual(sum(hist.counts), 3)
+
+    def testTimeout(self):
+        # a timeout is counted above the timeout, even when it is a bucket bound
+        hist = LatencyHistogram()
+        hist.add_timeout(0.5)
+        self.assertEqual(hist.percentile(1.), 1.)
+        hist.add_timeout(0.3)
+        self.assertEqual(hist.percentile(0.5), 0.5)
+
+
+class FakeFetch:
+    '''Stands in for requests.get. The n'th call runs the n'th behaviour, which gets the timeout and returns the page.'''
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.timeouts   = []
+        self.lock       = threading.Lock()
+
+    def __call__(self, url, timeout):
+        with self.lock:
+            n = len(self.timeouts)
+            self.timeouts.append(timeout)
+        return self.behaviours[min(n, len(self.behaviours) - 1)](timeout)
+
+
+class HedgedRequesterTests(unittest.TestCase):
+    url  = "http://stoker/stoker.json"
+    host = "stoker"
+
+    def setUp(self):
+        self.release = threading.Event() # lets blocked fake requests finish
+        self.hedged  = threading.Event() # set when the hedged request is made
+
+    def tearDown(self):
+        self.release.set()
+
+    def blocked(self, page):
+        def behaviour(timeout):
+            self.release.wait(5.)
+            return page
+        return behaviour
+
+    def requester(self, fetch, **kwargs):
+        requester = HedgedRequester(fetch = fetch, **kwargs)
+        # a history of fast responses: hedge after 10 ms
+        hist = requester.host_stats(self.host)[0]
+        for i in xrange(10):
+            hist.add(0.005)
+        return requester
+
+    def testFastResponse(self):
+        fetch = FakeFetch(lambda timeout: "page")
+        requester = self.requester(fetch, max_timeout = 5.)
+        self.assertEqual(requester.get(self.url), "page")
+        self.assertEqual(len(fetch.timeouts), 1)
+        self.assertEqual(fetch.timeouts[0], 0.5) # the min_timeout
+        self.assertEqual(requester.stats[self.host]['hedges'], 0)
+        self.assertEqual(requester.histograms[self.host].total, 11)
+
+    def testNoHedgeWithoutHistory(self):
+        fetch = FakeFetch(lambda timeout: "page")
+        requester = HedgedRequester(fetch = fetch, max_timeout = 5.)
+        self.assertEqual(requester.hedge_delay(self.host), None)
+        self.assertEqual(requester.timeout(self.host), 5.)
+        self.assertEqual(requester.get(self.url), "page")
+        self.assertEqual(fetch.timeouts, [5.])
+
+    def testHedgeWins(self):
+        fetch = FakeFetch(self.blocked("primary"), lambda timeout: "hedge")
+        requester = self.requester(fetch, max_timeout = 5.)
+        self.assertEqual(requester.get(self.url), "hedge")
+        stats = requester.stats[self.host]
+        self.assertEqual((stats['requests'], stats['hedges'], stats['hedge_wins'], stats['timeouts']), (1, 1, 1, 0))
+        self.assertEqual(len(fetch.timeouts), 2)
+        self.assertTrue(fetch.timeouts[1] < fetch.timeouts[0])  # the hedge only gets what is left of the deadline
+        self.assertEqual(requester.histograms[self.host].total, 11)
+
+    def testPrimaryWinsAfterHedge(self):
+        # the primary answers once the hedge has been sent; the hedge answers later and is ignored
+        def primary(timeout):
+            self.hedged.wait(5.)
+            return "primary"
+        def hedge(timeout):
+            self.hedged.set()
+            return self.blocked("hedge")(timeout)
+        fetch = FakeFetch(primary, hedge)
+        requester = self.requester(fetch, max_timeout = 5.)
+        self.assertEqual(requester.get(self.url), "primary")
+        stats = requester.stats[self.host]
+        self.assertEqual((stats['hedges'], stats['hedge_wins']), (1, 0))
+        self.release.set()
+        self.assertEqual(requester.histograms[self.host].total, 11)
+
+    def testTimeout(self):
+        fetch = FakeFetch(self.blocked("late"))
+        requester = HedgedRequester(fetch = fetch, max_timeout = 0.05)
+        self.assertRaises(requests.exceptions.Timeout, requester.get, self.url)
+        stats = requester.stats[self.host]
+        hist  = requester.histograms[self.host]
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertTrue(stats['recovering'])
+        self.assertEqual(hist.total, 1)
+        self.assertEqual(hist.percentile(1.), 0.1)
+
+    def testRecoveryAfterTimeout(self):
+        fetch = FakeFetch(self.blocked("late"), lambda timeout: "page")
+        requester = HedgedRequester(fetch = fetch, max_timeout = 0.2, min_timeout = 0.01)
+        self.assertRaises(requests.exceptions.Timeout, requester.get, self.url)
+        self.release.set()
+        # the full timeout is used until the adaptive one is above the latencies seen since the timeout
+        for i in xrange(8):
+            self.assertEqual(requester.get(self.url), "page")
+            self.assertEqual(requester.timeout(self.host), 0.2)
+            self.assertTrue(requester.stats[self.host]['recovering'])
+        requester.get(self.url)
+        self.assertFalse(requester.stats[self.host]['recovering'])
+
+    def testErrorRaised(self):
+        def fail(timeout):
+            raise ValueError("bad response")
+        requester = HedgedRequester(fetch = FakeFetch(fail), max_timeout = 5.)
+        self.assertRaises(ValueError, requester.get, self.url)
+        self.assertEqual(requester.stats[self.host]['timeouts'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json, subprocess, sys, unittest
+
+from SmokerLog.Units import LazyUnitRegistry, unit, units
+from SmokerLog.DataSources.StokerJSONSource import StokerJSONSource
+
+try:
+    import PySide
+except ImportError:
+    PySide = None
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class LazyImportTests(unittest.TestCase):
+
+    def testStartupDoesNotLoadDeferredModules(self):
+        code = ('import sys\n'
+                'from SmokerLog.Utils import *\n'
+                'from SmokerLog.Units import *\n'
+                'from SmokerLog.EventLoop import *\n'
+                'from SmokerLog.TempLogger import *\n'
+                'from SmokerLog.TempHistory import *\n'
+                'from SmokerLog.DataSources.StokerJSONSource import *\n'
+                'from SmokerLog.DataSources.ReplayDataSource import *\n'
+                'print " ".join([m for m in ["pint", "requests", "yaml", "pyqtgraph", "lxml", "SmokerLog.TempPlotter"] if m in sys.modules])\n')
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', code]).strip(), '')
+
+    def testUnitRegistry(self):
+        registry = LazyUnitRegistry()
+        self.assertTrue(registry.minute is units.minute)
+        self.assertEqual(registry.registry, None)
+        self.assertEqual(str(registry.degR), 'degR')  # not a fast unit
+        self.assertTrue(registry.registry is not None)
+
+        q = unit("2 ft")
+        self.assertEqual(q.to(units.inch).magnitude, 24)
+
+    def testStokerJSONSource(self):
+        source = StokerJSONSource("stoker")
+        page = {'stoker' : {'sensors' : [{'name' : 'pit', 'tc' : 225.5}, {'name' : 'meat', 'tc' : 150.}], 'blowers' : []}}
+        source.requester.fetch = lambda url, timeout: FakePage(json.dumps(page))
+        self.assertEqual(source.get_data().items(), [('pit', 225.5), ('meat', 150.)])
+
+    def testYaml(self):
+        import yaml
+        stats = {'Total' : {'pit' : {'min' : 200., 'max' : 250.}}}
+        self.assertEqual(yaml.safe_load(yaml.dump(stats, default_flow_style = False)), stats)
+
+    @unittest.skipIf(PySide is None, "PySide is not installed")
+    def testTempPlotter(self):
+        from SmokerLog.TempPlotter import TempPlotter
+        self.assertTrue(hasattr(TempPlotter, 'display'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os, shutil, sys, tempfile, unittest, StringIO
+
+from pyoptiontree import PyOptionTree
+from SmokerLog.TempLogger import TempLogger
+from SmokerLog.EventLoop import EventLoop
+from SmokerLog.DataSources.ReplayDataSource import ReplayDataSource
+
+
+class FakeClock:
+    def __init__(self, t = 1000.):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class ReplayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+        # a ten minute session: the pit is read every minute, the meat every two
+        self.write('session-pit.txt', ['2020-06-01 12:%02d:00 %d' % (m, 200 + m) for m in xrange(11)])
+        self.write('session-meat.txt', ['2020-06-01 12:%02d:00 %d' % (m, 40 + m) for m in xrange(0, 11, 2)])
+        self.write('session-eventLog.txt', ["2020-06-01 12:00:00 'start'"])
+        self.clock = FakeClock()
+        self.source = ReplayDataSource('session', speedup = 60., clock = self.clock)
+        self.logger = TempLogger(self.source, PyOptionTree(), EventLoop())
+        self.readings = []
+        self.logger.new_data_read.connect(self.readings.append)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def write(self, name, lines):
+        f = open(name, 'w')
+        f.write('\n'.join(lines) + '\n')
+        f.close()
+
+    def readAt(self, t):
+        self.clock.t = t
+        n = len(self.readings)
+        self.logger.read()
+        return self.readings[n:]
+
+    def testTimestamps(self):
+        self.assertEqual([r['time'] for r in self.readAt(1000.)], ['2020-06-01 12:00:00'])
+        self.assertEqual(self.readings[0]['sensors'], {'pit' : 200., 'meat' : 40.})
+
+        # one wall second is a minute of the session
+        r = self.readAt(1001.)
+        self.assertEqual([(x['time'], dict(x['sensors'])) for x in r], [('2020-06-01 12:01:00', {'pit' : 201.})])
+        r = self.readAt(1005.5)
+        self.assertEqual([(x['time'], dict(x['sensors'])) for x in r], [('2020-06-01 12:05:30', {'pit' : 205., 'meat' : 44.})])
+
+        # the whole session is played back in ten wall seconds
+        r = self.readAt(1010.)
+        self.assertEqual([(x['time'], dict(x['sensors'])) for x in r], [('2020-06-01 12:10:00', {'pit' : 210., 'meat' : 50.})])
+        self.assertTrue(self.source.finished())
+        self.assertEqual(self.readAt(1011.), [])
+
+    def testStatusDoesNotStartClock(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            self.logger.print_status()
+            self.clock.t += 100.
+            self.source.print_status()
+            status = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertTrue('virtual time: 2020-06-01 12:00:00, 0.0%' in status)
+        self.assertEqual(self.source.now().strftime(self.source.timefmt), '2020-06-01 12:00:00')
+
+        self.clock.t += 100.
+        self.assertEqual([r['time'] for r in self.readAt(self.clock.t)], ['2020-06-01 12:00:00'])
+        self.assertEqual([r['time'] for r in self.readAt(self.clock.t + 2.)], ['2020-06-01 12:02:00'])
+
+    def testSpeedupRange(self):
+        self.assertRaises(ValueError, ReplayDataSource, 'session', 0.5)
+        self.assertRaises(ValueError, ReplayDataSource, 'session', 20000.)
+
+
+if __name__ == '__main__':
+    unittest.main()
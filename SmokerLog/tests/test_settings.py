@@ -0,0 +1,87 @@
+import os, shutil, tempfile, unittest
+
+from pyoptiontree import PyOptionTree
+from SmokerLog.TempLogger import TempLogger
+from SmokerLog.EventLoop import EventLoop
+from SmokerLog.DataSources.DataSource import DataSource
+
+
+class SettingsSnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+        self.config = PyOptionTree()
+        self.config.addMapping([("templogger/prefix", "before"), ("templogger/cache_buffer_size", 1)])
+        self.loop = EventLoop()
+        self.logger = TempLogger(DataSource(), self.config("templogger"), self.loop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def lines(self, filename):
+        if not os.path.isfile(filename):
+            return 0
+        f = open(filename)
+        n = len(f.readlines())
+        f.close()
+        return n
+
+    def testRebuiltOnChange(self):
+        self.assertEqual(self.logger.settings.cache_buffer_size, 1)
+        self.config.set("templogger/cache_buffer_size", 3)
+        self.config.set("templogger/read_interval", "2 min")
+        # the snapshot is only rebuilt when the change is announced
+        self.assertEqual(self.logger.settings.cache_buffer_size, 1)
+        self.logger.config_changed("cache_buffer_size")
+        self.assertEqual(self.logger.settings.cache_buffer_size, 3)
+        self.assertEqual(self.logger.read_timer.interval, 60000.)
+        self.logger.config_changed("read_interval")
+        self.assertEqual(self.logger.read_timer.interval, 120000.)
+
+    def testReadersSeeNewValues(self):
+        self.logger.read()
+        self.assertEqual(self.lines("before-sens1.txt"), 1)
+        self.config.set("templogger/cache_buffer_size", 2)
+        self.config.set("templogger/prefix", "after")
+        self.logger.config_changed()
+        self.logger.read()
+        self.assertEqual(self.lines("after-sens1.txt"), 0)
+        self.logger.read()
+        self.assertEqual(self.lines("after-sens1.txt"), 2)
+        self.assertEqual(self.lines("before-sens1.txt"), 1)
+
+    def testDeadbandChange(self):
+        self.assertFalse(self.logger.deadband.settings.enabled)
+        self.config.set("templogger/deadband/enabled", True)
+        self.logger.config_changed("deadband/enabled")
+        self.assertTrue(self.logger.deadband.settings.enabled)
+        emitted = []
+        self.logger.new_data_read.connect(emitted.append)
+        self.logger.read()
+        self.logger.read()
+        self.assertEqual(len(emitted), 1)
+
+    def testChangeInEventLoop(self):
+        # a change queued from another component is picked up by the next read in the loop's thread
+        self.config.set("templogger/read_interval", "0.01 s")
+        self.logger.config_changed("read_interval")
+        ticks = []
+        def tick():
+            ticks.append(True)
+            if len(ticks) == 2:
+                self.config.set("templogger/prefix", "after")
+                self.loop.call_soon(self.logger.config_changed, "prefix")
+            if len(ticks) == 4:
+                self.loop.stop()
+        self.logger.read_timer.timeout.connect(tick)
+        self.loop.call_later(5., self.loop.stop)
+        self.loop.call_soon(self.logger.start_reading)
+        self.loop.run()
+        self.assertEqual((self.lines("before-sens1.txt"), self.lines("after-sens1.txt")), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os, shutil, tempfile, time, unittest
+
+from pyoptiontree import PyOptionTree
+from SmokerLog.TempHistory import TempHistory
+
+
+def reading(t, **sensors):
+    return {"time" : "2020-06-01 12:%02d:00" % t, "sensors" : sensors}
+
+def epoch(t):
+    return time.mktime(time.strptime("2020-06-01 12:%02d:00" % t, "%Y-%m-%d %H:%M:%S"))
+
+
+class TempHistoryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def history(self, **options):
+        config = PyOptionTree()
+        config.addMapping(options.items())
+        return TempHistory(config)
+
+    def testAppend(self):
+        history = self.history()
+        changes = []
+        history.data_changed.connect(lambda: changes.append(True))
+        history.append_to_data(reading(0, pit = 200., meat = 40.))
+        history.append_to_data(reading(1, pit = 210.))
+        data = history.get_data()
+        self.assertEqual(sorted(data.keys()), ['meat', 'pit'])
+        self.assertEqual(list(data['pit']['t']), [epoch(0), epoch(1)])
+        self.assertEqual(list(data['pit']['T']), [200., 210.])
+        self.assertEqual(list(data['meat']['T']), [40.])
+        self.assertEqual(len(changes), 2)
+        self.assertEqual((history.getMinTime(), history.getMaxTime()), (epoch(0), epoch(1)))
+
+    def testRegion(self):
+        history = self.history()
+        for m in xrange(10):
+            history.append_to_data(reading(m, pit = 200. + m))
+        region = history.get_region_data(epoch(3), epoch(6))
+        self.assertEqual(list(region['pit']['t']), [epoch(3), epoch(4), epoch(5)])
+        self.assertEqual(list(region['pit']['T']), [203., 204., 205.])
+        stats = history.calc_stats(region)
+        self.assertEqual((stats['pit']['min'], stats['pit']['max'], stats['pit']['avg'], stats['pit']['current']), (203., 205., 204., 205.))
+
+    def testPickle(self):
+        history = self.history()
+        history.append_to_data(reading(0, pit = 200.))
+        self.assertTrue(os.path.isfile(".TempPlotter.data.pickle"))
+        restored = self.history()
+        self.assertEqual(list(restored.get_data()['pit']['T']), [200.])
+        restored.clear()
+        self.assertEqual(len(restored.get_data()), 0)
+        self.assertFalse(os.path.isfile(".TempPlotter.data.pickle"))
+
+    def testPickleDisabled(self):
+        history = self.history(**{"pickle/enabled" : False})
+        history.append_to_data(reading(0, pit = 200.))
+        self.assertFalse(os.path.isfile(".TempPlotter.data.pickle"))
+        history.config.set("pickle/enabled", True)
+        history.config_changed("pickle/enabled")
+        history.append_to_data(reading(1, pit = 200.))
+        self.assertTrue(os.path.isfile(".TempPlotter.data.pickle"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+import pint
+
+from SmokerLog import Units
+from SmokerLog.Units import FastQuantity, FastUnit, fast_units, parse_quantity, unit, units
+
+
+class FastUnitTests(unittest.TestCase):
+
+    def assertSameAsPint(self, magnitude, frm, to):
+        fast = FastQuantity(magnitude, fast_units[frm]).to(fast_units[to])
+        slow = units.Quantity(magnitude, fast_units[frm].name).to(fast_units[to].name)
+        self.assertTrue(isinstance(fast, FastQuantity))
+        # pint rounds the fahrenheit offset, so they only agree to about 1e-6
+        self.assertAlmostEqual(fast.magnitude, slow.magnitude, places = 5)
+
+    def testConversionsMatchPint(self):
+        for dimension in ["[time]", "[temperature]"]:
+            names = sorted(set([u.name for u in fast_units.values() if u.dimensionality == dimension]))
+            for frm in names:
+                for to in names:
+                    for magnitude in [-40, 0, 1.5, 225]:
+                        self.assertSameAsPint(magnitude, frm, to)
+
+    def testAliases(self):
+        self.assertTrue(fast_units["min"] is fast_units["minute"] is units.minute)
+        self.assertEqual(parse_quantity("1.5 hr").to("s").magnitude, 5400.)
+        self.assertEqual(unit("90 s", units.minute).to(units.minute).magnitude, 1.5)
+        self.assertAlmostEqual(unit("212 fahrenheit").to(units.degC).magnitude, 100.)
+
+    def testUnitsOfOtherDimension(self):
+        # the magnitude is kept and the given unit assumed, as with pint quantities
+        self.assertEqual(unit("5 degC", units.minute).to(units.second).magnitude, 300.)
+        self.assertEqual(unit("5", units.minute).to(units.second).magnitude, 300.)
+
+    def testPlainNumbers(self):
+        self.assertEqual(parse_quantity("10"), 10)
+        self.assertEqual(parse_quantity("-2.5e1"), -25.)
+
+
+class FallbackTests(unittest.TestCase):
+
+    def testUnknownUnits(self):
+        q = parse_quantity("3 ft")
+        self.assertTrue(isinstance(q, pint.quantity._Quantity))
+        self.assertEqual(q.to("inch").magnitude, 36)
+        # F is farad to pint, not fahrenheit
+        self.assertFalse(isinstance(parse_quantity("5 F"), FastQuantity))
+        q = unit("2 day", units.minute)
+        self.assertTrue(isinstance(q, FastQuantity))
+        self.assertEqual(q.to(units.hour).magnitude, 48)
+
+    def testConversionToOtherUnits(self):
+        q = FastQuantity(90, fast_units["minute"]).to("day")
+        self.assertAlmostEqual(q.magnitude, 90 / 1440.)
+        q = FastQuantity(1, fast_units["hour"]).to(units.day)
+        self.assertAlmostEqual(q.magnitude, 1 / 24.)
+
+    def testExpressions(self):
+        self.assertEqual(unit("1 min + 30 s").to("second").magnitude, 90)
+
+
+class MemoTests(unittest.TestCase):
+
+    def setUp(self):
+        self.size = Units._memo_size
+        Units._memo_size = 4
+        Units._memo.clear()
+
+    def tearDown(self):
+        Units._memo_size = self.size
+        Units._memo.clear()
+
+    def testHit(self):
+        q = unit("5 min", units.second)
+        self.assertTrue(unit("5 min", units.second) is q)
+        self.assertFalse(unit("5 min") is q)
+
+    def testEviction(self):
+        quantities = [unit("%d min" % i) for i in xrange(6)]
+        self.assertEqual(len(Units._memo), 4)
+        self.assertEqual([key[0] for key in Units._memo], ["2 min", "3 min", "4 min", "5 min"])
+        self.assertTrue(unit("5 min") is quantities[5])
+        self.assertFalse(unit("0 min") is quantities[0])
+        self.assertEqual([key[0] for key in Units._memo], ["3 min", "4 min", "5 min", "0 min"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#! /bin/env python
+
+# headless version of SmokerLog. this does not import Qt (or pyqtgraph), so it can
+# run on a box without a display. data is logged to the same files as SmokerLog.py,
+# so the recorded data can be plotted later (see SmokerLog.py's --replay option).
+
+from SmokerLog.Utils import *
+from SmokerLog.Units import *
+from SmokerLog.EventLoop import *
+from SmokerLog.TempLogger import *
+from SmokerLog.TempHistory import *
+from SmokerLog.DataSources.StokerJSONSource import *
+from SmokerLog.DataSources.ReplayDataSource import *
+
+import sys
+import argparse
+import signal
+import logging
+
+
+class Daemon:
+
+  def __init__(self,argv):
+    # parse the command line
+    mainargparser = argparse.ArgumentParser()
+    mainargparser.add_argument("--host"           ,default="192.168.1.3" )
+    mainargparser.add_argument("--read_interval"  ,default="1. min")
+    mainargparser.add_argument("--stats_interval" ,default="10. min", help="how often to write temperature statistics to the log")
+    mainargparser.add_argument("--prefix"         ,default="default", help="prefix of the files that data is written to")
+    mainargparser.add_argument("--debug"          ,default=False, action='store_true')
+    mainargparser.add_argument("--replay"         ,default=None, help="replay a recorded session (a sensor file prefix or a plot data pickle) instead of reading from the host")
+    mainargparser.add_argument("--speedup"        ,default=1., type=float, help="how many times faster than real time a replay runs (1 to 10000)")
+
+    args = mainargparser.parse_args(args = argv[1:])
+
+    # set configuration options
+    self.config = PyOptionTree()
+
+    self.config.addMapping( [ ( "data/source"                  , args.host                                                    )
+                            , ( "templogger/prefix"            , args.prefix                                                  )
+                            , ( "templogger/read_interval"     , args.read_interval                                           )
+                            , ( "templogger/cache_buffer_size" , 10                                                           )
+                            , ( "history/pickle/filename"      , ".TempPlotter.data.pickle"                                   )
+                            , ( "app/stats_interval"           , args.stats_interval                                          )
+                            , ( "app/log/filename"             , "SmokerLogDaemon.log"                                        )
+                            , ( "app/log/level"                , logging.DEBUG if args.debug else logging.INFO                )
+                            , ( "app/log/format"               , '[%(levelname)s] (%(threadName)s) %(asctime)s - %(message)s' )
+                            ] )
+
+    # configure logger
+    logging.basicConfig(filename=self.config.get("app/log/filename")
+                       ,level   =self.config.get("app/log/level"   )
+                       , format =self.config.get("app/log/format"  )
+                       )
+
+    # create the data source
+    if args.replay is not None:
+      datasource = ReplayDataSource( args.replay, args.speedup )
+    elif args.debug:
+      datasource = IntermittentDataSource( )
+    else:
+      datasource = StokerJSONSource( self.config.get("data/source") )
+
+    # everything runs on a single event loop in the main thread
+    self.loop = EventLoop()
+
+    self.templogger = TempLogger( datasource, self.config( "templogger" ), self.loop )
+    self.history = TempHistory( self.config( "history" ) )
+    self.templogger.new_data_read.connect( self.history.append_to_data )
+
+    # periodically write stats to the log so a headless run can be checked on
+    self.stats_timer = Timer( self.loop )
+    self.stats_timer.setInterval( unit(self.config.get("app/stats_interval"),units.minute).to( units.millisecond ).magnitude / datasource.speedup )
+    self.stats_timer.timeout.connect( self.log_stats )
+
+    # make sure data in the cache gets written when we are shut down
+    self.loop.finished.connect( self.templogger.write )
+
+
+  def run(self):
+    signal.signal( signal.SIGINT , self.handle_signal )
+    signal.signal( signal.SIGTERM, self.handle_signal )
+
+    logging.info( "starting headless logger (source: %s)" % self.templogger.data_source )
+    self.loop.call_soon( self.templogger.start_reading )
+    self.loop.call_soon( self.stats_timer.start )
+    self.loop.run()
+    logging.info( "shutting down..." )
+
+  def handle_signal(self, signum, frame):
+    logging.info( "recieved signal %d" % signum )
+    self.loop.stop()
+
+  def log_stats(self):
+    stats = self.history.calc_stats()
+    for sensor in stats:
+      logging.info( "%(sensor)s: current %(current).1f, min %(min).1f, max %(max).1f, avg %(avg).1f (%(domain)s)" % dict( stats[sensor], sensor = sensor ) )
+
+
+
+
+
+if __name__ == '__main__':
+
+  daemon = Daemon(sys.argv)
+  daemon.run()
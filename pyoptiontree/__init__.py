@@ -1,2 +1,3 @@
 from pyoptiontree import PyOptionTree
 from pyoptiontreeexceptions import *
+from otparsecache import OTParseCache
@@ -0,0 +1,36 @@
+"""
+Times copying trees of increasing size with copy() and the copy()
+config function, and then writing one key of the copy.  Run from the
+repository root:
+
+  python2 -m pyoptiontree.benchmarks.bench_copy
+"""
+
+import time
+
+from pyoptiontree import PyOptionTree
+
+def build(n):
+    ot = PyOptionTree()
+    ot.addMapping([('base/g%d/k%d' % (i % 100, i), i) for i in xrange(n)])
+    return ot
+
+def best(f, repeat = 5):
+    times = []
+    for i in xrange(repeat):
+        btime = time.time()
+        f()
+        times.append(time.time() - btime)
+    return min(times)
+
+def main():
+    for n in [100, 1000, 10000]:
+        ot = build(n)
+        copy = best(lambda: ot.copy())
+        write = best(lambda: ot.copy().set('base/g0/k0', -1))
+        func = best(lambda: ot.addString('c = copy(base)'))
+        print '%6d keys: copy() %8.1f us, copy() + set %8.1f us, copy(base) in a file %8.1f us' % (
+            n, copy*1e6, write*1e6, func*1e6)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Times default-heavy access: get() with a default and isValid() on
+names that are mostly missing (including misses under existing
+branches and through softlinks), and a set_config_defaults-style loop
+that reads every option with a default and sets it again.  Run from
+the repository root:
+
+  python2 -m pyoptiontree.benchmarks.bench_defaults
+"""
+
+import timeit
+
+from pyoptiontree import PyOptionTree
+
+def build():
+    ot = PyOptionTree()
+    ot.addString('a = 1; b = "x"; t = {u = {v = 2}; w = ../b}; lnk = nothere; l = [a, t/u/v]')
+    names = (['a', 'b', 't/u/v', 't/w', 'l']
+             + ['m%d' % i for i in xrange(15)]
+             + ['t/m%d' % i for i in xrange(5)]
+             + ['t/u/m/n', 'lnk', 'nothere/x', 'a/b'])
+    return ot, names
+
+def main(n = 3000):
+    ot, names = build()
+    print '%d names, %d missing' % (len(names), len([k for k in names if not ot.isValid(k)]))
+
+    t = min(timeit.repeat(lambda: [ot.get(k, None) for k in names], number = n, repeat = 3))
+    print 'get(name, default)  %.3f s' % t
+    t = min(timeit.repeat(lambda: [ot.isValid(k) for k in names], number = n, repeat = 3))
+    print 'isValid(name)       %.3f s' % t
+
+    defaults = dict(('opt%d' % i, i) for i in xrange(20))
+    defaults.update({'prefix' : 'default', 'deadband/enabled' : False})
+    def setdefaults():
+        config = PyOptionTree()
+        config.addMapping([(opt, config.get(opt, defaults[opt])) for opt in defaults])
+        return [config.get(opt) for opt in defaults]
+    t = min(timeit.repeat(setdefaults, number = n / 10, repeat = 3))
+    print 'set defaults x%d    %.3f s' % (n / 10, t)
+
+if __name__ == '__main__':
+    main()
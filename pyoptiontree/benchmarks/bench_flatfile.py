@@ -0,0 +1,40 @@
+"""
+Times saving and reloading a large tree with saveTree() and
+addOptionsFile() against saveJSON()/addJSONFile() and
+saveYAML()/addYAMLFile().  Run from the repository root:
+
+  python2 -m pyoptiontree.benchmarks.bench_flatfile [number of keys]
+"""
+
+import os, sys, time, shutil, tempfile
+
+from pyoptiontree import PyOptionTree
+
+def build(n):
+    ot = PyOptionTree()
+    ot.addMapping([('g%d/s%d/k%d' % (i % 50, i % 7, i), (i, 'value %d' % i, [i, i*0.5][i % 2])[i % 3])
+                   for i in xrange(n)])
+    return ot
+
+def timed(f):
+    btime = time.time()
+    f()
+    return time.time() - btime
+
+def main(n = 20000):
+    d = tempfile.mkdtemp()
+    try:
+        for name, save, add in [('saveTree/addOptionsFile', PyOptionTree.saveTree, PyOptionTree.addOptionsFile),
+                                ('saveJSON/addJSONFile', PyOptionTree.saveJSON, PyOptionTree.addJSONFile),
+                                ('saveYAML/addYAMLFile', PyOptionTree.saveYAML, PyOptionTree.addYAMLFile)]:
+            fn = os.path.join(d, 'tree')
+            ot = build(n)       # a fresh tree, so saving includes building the flat index
+            tsave = timed(lambda: save(ot, fn))
+            loaded = PyOptionTree()
+            tload = timed(lambda: add(loaded, fn))
+            print '%-24s %d keys: save %.3f s, load %.3f s' % (name, n, tsave, tload)
+    finally:
+        shutil.rmtree(d)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
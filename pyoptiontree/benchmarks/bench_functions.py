@@ -0,0 +1,32 @@
+"""
+Times evaluating stored functions (range, dict, cat, rep and a user
+function) on every get(); a non-empty vardict bypasses the resolution
+cache so each call really evaluates them.  Run from the repository
+root:
+
+  python2 -m pyoptiontree.benchmarks.bench_functions
+"""
+
+import timeit
+
+from pyoptiontree import PyOptionTree
+
+OPTIONS = ('n = 5; name = "probe"; '
+           'r = range(n); '
+           'd = dict([("a", n), ("b", 2)]); '
+           'c = cat(name, "-", "1"); '
+           'p = rep("${name}-${n}"); '
+           'u = scale(n, 3); '
+           'all = [range(n), cat(name, "x"), scale(n), dict([("k", n)])]')
+
+def main(n = 20000):
+    ot = PyOptionTree(userfunclist = [('scale', lambda x, f = 2: x*f)])
+    ot.addString(OPTIONS)
+    vardict = {'_' : 0}
+
+    for key in ['r', 'd', 'c', 'p', 'u', 'all']:
+        t = min(timeit.repeat(lambda: ot.get(key, vardict = vardict), number = n, repeat = 3)) / n
+        print '%-4s %8.2f us per evaluation' % (key, t*1e6)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Times repeated get() calls on deep paths that go through softlinks,
+eval statements and functions, with and without the resolution cache
+(a non-empty vardict bypasses it).  Run from the repository root:
+
+  python2 -m pyoptiontree.benchmarks.bench_get
+"""
+
+import timeit
+
+from pyoptiontree import PyOptionTree
+
+def build(depth = 8):
+    s = 'base = 1.5; '
+    path = []
+    for i in xrange(depth):
+        s += '/'.join(path + ['b%d' % i]) + ' = {}; '
+        path.append('b%d' % i)
+    leaf = '/'.join(path)
+    s += leaf + '/link = /base; '
+    s += leaf + '/expr = @(${link} * 2 + 1); '
+    s += leaf + '/seq = range(0, 20); '
+    ot = PyOptionTree()
+    ot.addString(s)
+    return ot, leaf
+
+def main(n = 20000):
+    ot, leaf = build()
+    print 'path: %s (%d components)' % (leaf, leaf.count('/') + 2)
+    for key in ['link', 'expr', 'seq']:
+        name = leaf + '/' + key
+        cached = min(timeit.repeat(lambda: ot.get(name), number = n, repeat = 3)) / n
+        uncached = min(timeit.repeat(lambda: ot.get(name, vardict = {'_' : 0}), number = n, repeat = 3)) / n
+        print '%-5s cached %8.2f us   uncached %8.2f us   (%.0fx)' % (key, cached*1e6, uncached*1e6, uncached/cached)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Times loading a file that includes many others with optfile() and
+with lazyoptfile(), then reading an option from one of them.  Run from
+the repository root:
+
+  python2 -m pyoptiontree.benchmarks.bench_optfile [files] [keys per file]
+"""
+
+import os, sys, time, shutil, tempfile
+
+from pyoptiontree import PyOptionTree
+
+def write(fn, s):
+    f = open(fn, 'w')
+    f.write(s)
+    f.close()
+
+def main(nfiles = 100, nkeys = 100):
+    d = tempfile.mkdtemp()
+    try:
+        for i in xrange(nfiles):
+            write(os.path.join(d, 'inc%d.opt' % i),
+                  ''.join(['k%d = [%d, "v%d"]  // option %d\n' % (j, j, j, j) for j in xrange(nkeys)]))
+
+        for func in ['optfile', 'lazyoptfile']:
+            fn = os.path.join(d, 'main_%s.opt' % func)
+            write(fn, ''.join(['inc%d = %s("inc%d.opt")\n' % (i, func, i) for i in xrange(nfiles)]))
+
+            ot = PyOptionTree()
+            btime = time.time()
+            ot.addOptionsFile(fn)
+            tload = time.time() - btime
+            ot.get('inc0/k0')
+            tfirst = time.time() - btime - tload
+            print '%-12s %d files of %d keys: load %.3f s, first get %.3f s' % (func, nfiles, nkeys, tload, tfirst)
+    finally:
+        shutil.rmtree(d)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,72 @@
+"""
+Times parsing generated option files, one of plain options and one
+made mostly of builtin and user function calls, and reports the peak
+memory of the process after parsing the first.  Run from the repository root:
+
+  python2 -m pyoptiontree.benchmarks.bench_parse [size in KB]
+"""
+
+import sys, time, resource
+
+from pyoptiontree import PyOptionTree
+
+def large_file(size):
+    # Plain options with comments, strings, lists and branches
+    lines = []
+    length = 0
+    i = 0
+    while length < size:
+        if i % 50 == 0:
+            line = '/* block %d\n   of options */ b%d = {\n  x = %d\n  s = "str\\"ing %d"\n}' % (i, i, i, i)
+        elif i % 3 == 0:
+            line = 'l%d = [%d, %d.5, "e%d"]  // a list' % (i, i, i, i)
+        else:
+            line = 'k%d = %d  # a number' % (i, i)
+        lines.append(line)
+        length += len(line) + 1
+        i += 1
+    return '\n'.join(lines) + '\n'
+
+def function_file(size):
+    # Function calls whose names share first characters with each
+    # other and with the builtins, nested and mixed with plain values
+    lines = ['n = 3']
+    length = 0
+    i = 0
+    while length < size:
+        if i % 4 == 0:
+            line = 'f%d = cat(range(n), [%d, scale(%d, 2.5)])' % (i, i, i)
+        elif i % 4 == 1:
+            line = 'f%d = seqrep(range(4), (1, shift(%d)))' % (i, i)
+        elif i % 4 == 2:
+            line = 'f%d = dict([("a", sum(%d, n)), ("b", sq(%d))])' % (i, i, i)
+        else:
+            line = 'f%d = rep("${n}-%d"); g%d = copy(f%d)' % (i, i, i, i - 1)
+        lines.append(line)
+        length += len(line) + 1
+        i += 1
+    return '\n'.join(lines) + '\n'
+
+userfunctions = [('scale', lambda x, y: x * y), ('shift', lambda x: x + 1), ('sq', lambda x: x * x)]
+
+def timeparse(s, repeat = 3, **kwargs):
+    best = None
+    for i in xrange(repeat):
+        ot = PyOptionTree(**kwargs)
+        btime = time.time()
+        ot.addString(s)
+        t = time.time() - btime
+        best = t if best is None else min(best, t)
+    return best
+
+def main(size = 1024):
+    s = large_file(size*1024)
+    t = timeparse(s)
+    print 'large file: %d KB parsed in %.3f s (%.0f KB/s)' % (len(s)/1024, t, len(s)/1024/t)
+    print 'peak RSS: %.1f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.)
+    s = function_file(size*1024/4)
+    t = timeparse(s, userfunclist = userfunctions)
+    print 'function calls: %d KB parsed in %.3f s (%.0f KB/s)' % (len(s)/1024, t, len(s)/1024/t)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Soak test for escaped characters: calls addString() with strings full
+of escapes over and over, as the `set` command does, and prints the
+peak RSS and parse time of each round.  The RSS should stay flat.  Run
+from the repository root:
+
+  python2 -m pyoptiontree.benchmarks.soak_escapes [rounds] [calls per round]
+"""
+
+import sys, time, resource
+
+from pyoptiontree import PyOptionTree
+
+def main(rounds = 6, calls = 50):
+    s = u'; '.join([u'k%d = "v\\"%d\\\\ \\#%d \\%% \\中"' % (i, i, i) for i in xrange(200)])
+    ot = PyOptionTree()
+
+    for r in xrange(rounds):
+        btime = time.time()
+        for i in xrange(calls):
+            ot.addString(s)
+            PyOptionTree().addString(s)
+        print 'round %d: %.2f s, peak RSS %.1f MB' % (r, time.time() - btime,
+                                                      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
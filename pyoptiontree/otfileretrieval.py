@@ -1,5 +1,22 @@
-import hashlib, commands, base64
-from pyoptiontreeexceptions import PyOptionTreeRetrievalError
+import hashlib, commands, base64, os, os.path, time, json, tempfile, threading, urllib2, urlparse, shutil
+from pyoptiontreeexceptions import PyOptionTreeParseError, PyOptionTreeRetrievalError
+
+# Retrieved files are kept in a local cache; see OTConfigureRetrieval()
+OTRetrievalSettings = {
+    'cachedir'  : os.path.join(tempfile.gettempdir(), '_PyOpT_cache'),
+    'ttl'       : 300,      # seconds a retrieved file is used before it's checked again
+    'offline'   : False,    # never fetch; use the cache (however old) or 'directory'
+    'directory' : None,     # a local mirror of the remote files, used when offline
+    'workers'   : 4,        # files retrieve_files() fetches at once
+    'maxobjects': 256,      # retrieved files kept in the cache; the oldest are removed beyond this
+    }
+
+# How each retrieval was satisfied, for profiling
+OTRetrievalStats = {'cached' : 0, 'unchanged' : 0, 'fetched' : 0, 'commands' : 0}
+
+OTretrievallock = threading.Lock()
+OTretrievalkeylocks = {}
+OTretrievalstatslock = threading.Lock()
 
 def OTFileRetrievalFunctions():
     """
@@ -8,7 +25,74 @@ def OTFileRetrievalFunctions():
 
     """
     return [('retrieve_file', OT_retrieve_file),
-            ('retrieve_optfile', OT_retrieve_optfile)]
+            ('retrieve_optfile', OT_retrieve_optfile),
+            ('retrieve_files', OT_retrieve_files),
+            ('retrieve_optfiles', OT_retrieve_optfiles)]
+
+def OTConfigureRetrieval(**settings):
+    """
+    Changes the settings used by the retrieval functions, given as
+    keyword arguments:
+
+    ``cachedir``
+      The directory retrieved files are stored in.  Each file is
+      stored under a hash of its contents, so unchanged files are
+      stored once.
+
+    ``ttl``
+      The number of seconds a retrieved file is used without checking
+      the original again (default 300).  Once it has expired, local
+      files are checked by modification time and size, urls with
+      ETag/Last-Modified headers, and the rsync modes by rsync itself,
+      which only copies differences.
+
+    ``offline``
+      If True, nothing is fetched; files already in the cache are
+      used regardless of their age, and anything else must be in
+      ``directory``.
+
+    ``directory``
+      A local directory mirroring the remote files, used when
+      ``offline`` is True so configurations can be used without a
+      network.  A remote file is looked for under its server and
+      path, e.g. ``hoytak@cs.ubc.ca:/home/hoytak/myfile.opt`` as
+      ``<directory>/cs.ubc.ca/home/hoytak/myfile.opt`` and
+      ``http://www.cs.ubc.ca/~hoytak/myfile.opt`` as
+      ``<directory>/www.cs.ubc.ca/~hoytak/myfile.opt``.
+
+    ``workers``
+      The number of files retrieve_files() fetches at once.
+
+    ``maxobjects``
+      The number of retrieved files kept in the cache (default 256).
+      When more are stored, the oldest (other than those stored within
+      ``ttl``) are removed and fetched again if they are needed.  OTClearRetrievalCache() removes everything.
+    """
+
+    for k, v in settings.items():
+        if k not in OTRetrievalSettings:
+            raise PyOptionTreeParseError('Configuring file retrieval', 'Unknown setting \'' + k + '\'.')
+        OTRetrievalSettings[k] = v
+
+def OTClearRetrievalCache():
+    """
+    Removes every retrieved file from the cache, so each is fetched
+    again the next time it is asked for.
+    """
+
+    OTretrievallock.acquire()
+    try:
+        shutil.rmtree(OTRetrievalSettings['cachedir'], ignore_errors = True)
+    finally:
+        OTretrievallock.release()
+
+def OTCountRetrieval(kind):
+    # The retrieval functions run in several threads at once
+    OTretrievalstatslock.acquire()
+    try:
+        OTRetrievalStats[kind] += 1
+    finally:
+        OTretrievalstatslock.release()
 
 def OT_retrieve_file(filename, mode='rsync-ssh', keyfile='', args='', sshargs=''):
     """
@@ -73,10 +157,13 @@ def OT_retrieve_file(filename, mode='rsync-ssh', keyfile='', args='', sshargs=''
     If ``mode`` is not in the above list, it raises a
     PyOptionTreeParseError exception.
 
-    retrieve_file() returns the name of a temporary file in /tmp/ that
-    the remote file is copied to.  The name of the temporary file is
-    '_PyOpT_' plus a hash of the filename and is thus identical as
-    long as filename remains the same.
+    ``mode`` may also be \'file\', in which case ``filename`` is a local
+    path or a file:// url.
+
+    retrieve_file() returns the name of a local copy of the file in
+    the retrieval cache (see OTConfigureRetrieval()).  Within the
+    cache's time to live, the copy is returned without running any
+    commands or going to the network.
 
     For example, in an option tree file,::
 
@@ -93,7 +180,103 @@ def OT_retrieve_file(filename, mode='rsync-ssh', keyfile='', args='', sshargs=''
     
     """
 
-    tmpname =  ' /tmp/_PyOpT_' + base64.urlsafe_b64encode(hashlib.sha256(filename).digest()).replace('-', '').replace('_', '')[:8]
+    if mode not in ['url', 'scp', 'ssh', 'rsync', 'rsync-ssh', 'file']:
+        raise PyOptionTreeParseError('', 'mode invalid.  See documentation for valid modes.')
+
+    key = OTHash('\0'.join([filename, mode, str(keyfile), args, sshargs]))
+
+    OTretrievallock.acquire()
+    try:
+        keylock = OTretrievalkeylocks.setdefault(key, threading.Lock())
+    finally:
+        OTretrievallock.release()
+
+    # Only one thread fetches a given file; the others then find it cached
+    keylock.acquire()
+    try:
+        return OTRetrieveCached(key, filename, mode, keyfile, args, sshargs)
+    finally:
+        keylock.release()
+
+def OTHash(s):
+    return hashlib.sha256(s).hexdigest()
+
+def OTRetrieveCached(key, filename, mode, keyfile, args, sshargs):
+    cachedir = OTRetrievalSettings['cachedir']
+    for d in ['index', 'objects', 'work']:
+        if not os.path.isdir(os.path.join(cachedir, d)):
+            try:
+                os.makedirs(os.path.join(cachedir, d))
+            except OSError:
+                pass        # made by another thread or process
+
+    indexname = os.path.join(cachedir, 'index', key)
+    entry = OTReadIndex(indexname)
+
+    if entry != None:
+        objname = os.path.join(cachedir, 'objects', str(entry['object']))
+        if not os.path.isfile(objname):
+            entry = None
+        elif OTRetrievalSettings['offline'] or time.time() - entry['time'] < OTRetrievalSettings['ttl']:
+            OTCountRetrieval('cached')
+            return objname
+
+    localname = OTLocalSource(filename, mode)
+
+    if localname != None:
+        # Revalidated by modification time and size
+        try:
+            st = os.stat(localname)
+        except OSError, e:
+            raise PyOptionTreeRetrievalError("Retrieving file '" + filename + "'", str(e))
+        tag = [st.st_mtime, st.st_size]
+
+        if entry != None and entry.get('tag') == tag:
+            return OTTouchIndex(indexname, entry, objname)
+
+        f = open(localname, 'rb')
+        try:
+            content = f.read()
+        finally:
+            f.close()
+
+        return OTStoreRetrieved(indexname, content, {'tag' : tag})
+
+    if OTRetrievalSettings['offline']:
+        raise PyOptionTreeRetrievalError("Retrieving file '" + filename + "'",
+                                         'Not in the retrieval cache, and retrieval is offline.')
+
+    if mode == 'url' and args == '':
+        # Fetched here so ETag/Last-Modified can be used to revalidate
+        request = urllib2.Request((filename, 'http://' + filename)[filename.find('://') == -1])
+        if entry != None:
+            if entry.get('etag') != None:
+                request.add_header('If-None-Match', str(entry['etag']))
+            if entry.get('lastmodified') != None:
+                request.add_header('If-Modified-Since', str(entry['lastmodified']))
+
+        print 'Retrieving file ', filename
+
+        try:
+            response = urllib2.urlopen(request)
+            try:
+                content = response.read()
+                headers = {'etag' : response.info().getheader('ETag'),
+                           'lastmodified' : response.info().getheader('Last-Modified')}
+            finally:
+                response.close()
+        except urllib2.HTTPError, e:
+            if e.code == 304 and entry != None:
+                return OTTouchIndex(indexname, entry, objname)
+            raise PyOptionTreeRetrievalError("Retrieving url '" + filename + "'", str(e))
+        except Exception, e:
+            raise PyOptionTreeRetrievalError("Retrieving url '" + filename + "'", str(e))
+
+        return OTStoreRetrieved(indexname, content, headers)
+
+    # The working copy keeps its name across runs, so rsync only
+    # copies the differences
+    tmpname = ' ' + os.path.join(cachedir, 'work', key)
     filename = '\'' + filename + '\''
 
     if mode=='url':
@@ -101,7 +284,7 @@ def OT_retrieve_file(filename, mode='rsync-ssh', keyfile='', args='', sshargs=''
     elif mode=='scp' or mode=='ssh':
         command = 'scp '
         if type(keyfile) == str and len(keyfile) != 0: command += '-i ' + keyfile
-        comand += ' ' + args + ' ' + sshargs + ' ' + filename + ' ' + tmpname 
+        command += ' ' + args + ' ' + sshargs + ' ' + filename + ' ' + tmpname 
     elif mode == 'rsync':
         command = 'rsync ' + args + ' ' + filename + ' ' + tmpname
     elif mode == 'rsync-ssh':
@@ -109,19 +292,170 @@ def OT_retrieve_file(filename, mode='rsync-ssh', keyfile='', args='', sshargs=''
                    + (' ', '-i ' + keyfile)[type(keyfile) == str and len(keyfile.strip()) != 0]
                    + ' -ax -o ClearAllForwardings=yes ' + sshargs + '\' ' + args + ' '
                    + filename + ' ' + tmpname)
-    else:
-        raise PyOptionTreeParseError('', 'mode invalid.  See documentation for valid modes.')
 
     print 'Retrieving file ', filename, ', temp file = ' + tmpname
     
     cstr = command.replace('   ', ' ').replace('  ', ' ')
+    OTCountRetrieval('commands')
     (errcode, result) = commands.getstatusoutput(cstr)
     
     if errcode != 0:
         raise PyOptionTreeRetrievalError("Evaluating command '" + cstr + "'", result)
+
+    f = open(tmpname.strip(), 'rb')
+    try:
+        content = f.read()
+    finally:
+        f.close()
+
+    return OTStoreRetrieved(indexname, content, {})
+
+def OTLocalSource(filename, mode):
+    # The local file standing in for filename, if there is one
+
+    if mode == 'file':
+        if filename.startswith('file://'):
+            return urllib2.url2pathname(filename[len('file://'):])
+        return os.path.expanduser(filename)
+
+    directory = OTRetrievalSettings['directory']
+    if directory != None and OTRetrievalSettings['offline']:
+        # The mirror is laid out by server and path, so files with the
+        # same name on different servers or directories are kept apart
+        if mode == 'url':
+            url = urlparse.urlparse((filename, 'http://' + filename)[filename.find('://') == -1])
+            host, path = url.netloc.split('@')[-1], url.path
+        elif filename.find(':') != -1:
+            host, path = filename.split(':', 1)
+            host = host.split('@')[-1]
+        else:
+            host, path = '', filename
+
+        path = os.path.normpath(path.lstrip('/'))
+        if path.startswith('..') or path == '.':
+            return None
+
+        localname = os.path.join(os.path.expanduser(directory), host, path)
+        if os.path.isfile(localname):
+            print 'Using local copy ', localname, ' of ', filename
+            return localname
+
+    return None
+
+def OTReadIndex(indexname):
+    try:
+        f = open(indexname, 'r')
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return None
+
+def OTWriteIndex(indexname, entry):
+    tmpname = indexname + '.%d.%d.tmp' % (os.getpid(), threading.current_thread().ident)
+    f = open(tmpname, 'w')
+    try:
+        json.dump(entry, f)
+    finally:
+        f.close()
+    os.rename(tmpname, indexname)
+
+def OTTouchIndex(indexname, entry, objname):
+    # The original hasn't changed; start its time to live again
+    OTCountRetrieval('unchanged')
+    entry['time'] = time.time()
+    OTWriteIndex(indexname, entry)
+    return objname
+
+def OTStoreRetrieved(indexname, content, entry):
+    OTCountRetrieval('fetched')
+    h = OTHash(content)
+    objname = os.path.join(OTRetrievalSettings['cachedir'], 'objects', h)
+
+    if not os.path.isfile(objname):
+        tmpname = objname + '.%d.%d.tmp' % (os.getpid(), threading.current_thread().ident)
+        f = open(tmpname, 'wb')
+        try:
+            f.write(content)
+        finally:
+            f.close()
+        os.rename(tmpname, objname)
     else:
-        return tmpname.strip()
+        os.utime(objname, None)     # it's the newest again as far as pruning goes
 
+    entry['object'] = h
+    entry['time'] = time.time()
+    OTWriteIndex(indexname, entry)
+
+    OTPruneObjects(h)
+
+    return objname
+
+def OTPruneObjects(keep):
+    # Removes the oldest stored files beyond 'maxobjects'; the index
+    # entries pointing at them are then treated as missing.  Files
+    # stored within the time to live may have just been handed out
+    # (by another thread, too), so they are left alone.
+    objdir = os.path.join(OTRetrievalSettings['cachedir'], 'objects')
+    objects = []
+    for name in os.listdir(objdir):
+        if name.endswith('.tmp'):
+            continue    # being written
+        try:
+            objects.append((os.path.getmtime(os.path.join(objdir, name)), name))
+        except OSError:
+            pass    # removed by another thread or process
+
+    objects.sort()
+    for mtime, name in objects[:max(0, len(objects) - OTRetrievalSettings['maxobjects'])]:
+        if name != keep and time.time() - mtime >= OTRetrievalSettings['ttl']:
+            try:
+                os.remove(os.path.join(objdir, name))
+            except OSError:
+                pass
+
+def OT_retrieve_files(filenames, mode='rsync-ssh', keyfile='', args='', sshargs=''):
+    """
+    Retrieves each file in the list ``filenames`` as retrieve_file()
+    does and returns the list of local copies.  Up to ``workers``
+    files (see OTConfigureRetrieval()) are fetched at once.  If any
+    retrievals fail, the error from the first of them is raised once
+    all have finished.
+    """
+
+    results = [None]*len(filenames)
+    errors = [None]*len(filenames)
+    queue = range(len(filenames))
+    queuelock = threading.Lock()
+
+    def worker():
+        while True:
+            queuelock.acquire()
+            try:
+                if len(queue) == 0:
+                    return
+                i = queue.pop(0)
+            finally:
+                queuelock.release()
+
+            try:
+                results[i] = OT_retrieve_file(filenames[i], mode, keyfile, args, sshargs)
+            except Exception, e:
+                errors[i] = e
+
+    threads = [threading.Thread(target = worker)
+               for i in xrange(max(1, min(OTRetrievalSettings['workers'], len(filenames))))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for e in errors:
+        if e != None:
+            raise e
+
+    return results
 
 def OT_retrieve_optfile(filename, mode='rsync-ssh', keyfile='', args='', sshargs=''):
 
@@ -133,3 +467,12 @@ def OT_retrieve_optfile(filename, mode='rsync-ssh', keyfile='', args='', sshargs
     """
     
     return (OT_retrieve_file(filename, mode, keyfile, args, sshargs), filename)
+
+def OT_retrieve_optfiles(filenames, mode='rsync-ssh', keyfile='', args='', sshargs=''):
+    """
+    retrieve_optfiles(...) is to retrieve_files(...) as
+    retrieve_optfile(...) is to retrieve_file(...); it returns a list
+    of (local copy, filename) tuples.
+    """
+
+    return zip(OT_retrieve_files(filenames, mode, keyfile, args, sshargs), filenames)
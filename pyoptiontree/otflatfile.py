@@ -0,0 +1,111 @@
+import json
+
+# Reading and writing the flat (full name -> value) form of a tree as
+# JSON or YAML; see PyOptionTree.saveJSON() and friends.  Names are
+# fully qualified, so an object (mapping) value is a dictionary value,
+# not a branch.
+
+def OTFromJSON(v):
+    # json gives back unicode; the trees use str
+    if type(v) == unicode:
+        return v.encode('utf-8')
+    elif type(v) == list:
+        return [OTFromJSON(e) for e in v]
+    elif type(v) == dict:
+        return dict([(OTFromJSON(k), OTFromJSON(e)) for k, e in v.items()])
+    else:
+        return v
+
+def OTEncodeFlat(pairs):
+    # Yields (json name, json value) for each pair, one at a time
+    encoder = json.JSONEncoder(check_circular = False)
+
+    for n, v in pairs:
+        try:
+            yield (encoder.encode(n), encoder.encode(v))
+        except (TypeError, ValueError), e:
+            raise ValueError('Key \"' + n + '\": ' + str(e))
+
+def OTWriteJSON(f, pairs):
+    sep = '{\n'
+    for n, v in OTEncodeFlat(pairs):
+        f.write(sep + '  ' + n + ': ' + v)
+        sep = ',\n'
+
+    if sep == '{\n':
+        f.write('{}\n')
+    else:
+        f.write('\n}\n')
+
+def OTWriteYAML(f, pairs):
+    # JSON scalars, lists and objects are valid YAML flow values, so
+    # each option is one line that OTReadYAML can read without PyYAML.
+    empty = True
+    for n, v in OTEncodeFlat(pairs):
+        f.write(n + ': ' + v + '\n')
+        empty = False
+
+    if empty:
+        f.write('{}\n')
+
+class OTJSONObject(list):
+    # The (name, value) pairs of a JSON object, in order
+    pass
+
+def OTReadJSON(s):
+    pairs = json.loads(s, object_pairs_hook = OTJSONObject)
+
+    if type(pairs) != OTJSONObject:
+        raise ValueError('Expected an object of names and values.')
+
+    return [(OTFromJSON(n), OTFromJSONObjects(v)) for n, v in pairs]
+
+def OTFromJSONObjects(v):
+    # Below the top level, objects are dictionaries
+    if type(v) == OTJSONObject:
+        return dict([(OTFromJSON(k), OTFromJSONObjects(e)) for k, e in v])
+    elif type(v) == list:
+        return [OTFromJSONObjects(e) for e in v]
+    else:
+        return OTFromJSON(v)
+
+def OTReadYAML(s):
+    decoder = json.JSONDecoder()
+    pairs = []
+
+    for line in s.splitlines():
+        line = line.strip()
+        if len(line) == 0 or line[0] == '#' or line == '{}':
+            continue
+
+        try:
+            n, pos = decoder.raw_decode(line)
+            while line[pos] == ' ': pos += 1
+            if line[pos] != ':' or type(n) != unicode:
+                raise ValueError
+            pos += 1
+            while line[pos] == ' ': pos += 1
+            v, pos = decoder.raw_decode(line, pos)
+            if len(line[pos:].strip()) != 0:
+                raise ValueError
+        except (ValueError, IndexError):
+            # Not written by OTWriteYAML
+            return OTReadGeneralYAML(s)
+
+        pairs.append((OTFromJSON(n), OTFromJSON(v)))
+
+    return pairs
+
+def OTReadGeneralYAML(s):
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError('File is not in the form written by saveYAML(), and PyYAML is not installed to read it.')
+
+    d = yaml.safe_load(s)
+    if d == None:
+        return []
+    if type(d) != dict:
+        raise ValueError('Expected a mapping of names and values.')
+
+    return [(str(n), OTFromJSON(v)) for n, v in d.items()]
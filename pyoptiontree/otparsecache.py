@@ -0,0 +1,128 @@
+import os, os.path, cPickle, zlib
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+# Bump this when the layout of the cache entries changes
+OTPARSECACHE_FORMAT = 1
+
+def OTContentHash(s):
+    """
+    Returns the hash used to key and validate cached files.
+    """
+    return md5(s).hexdigest()
+
+class OTParseCache:
+    """
+    Stores the parsed structure of option files on disk so that an
+    unchanged file can be added to a tree without tokenizing it
+    again.  Pass an instance to PyOptionTree.setParseCache().
+
+    Each entry is a file in ``directory`` named by a hash of the
+    file's contents (plus the directory it was read from and the
+    functions the tree knows about).  An entry also records the
+    content hash of every file pulled in with optfile(); if any of
+    those have changed, the entry is stale and is discarded.  At most
+    ``maxentries`` entries are kept; the least recently used ones are
+    removed first.
+    """
+
+    def __init__(self, directory, maxentries = 64):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.maxentries = maxentries
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def key(self, *parts):
+        return OTContentHash('\0'.join([str(OTPARSECACHE_FORMAT)] + [str(p) for p in parts]))
+
+    def load(self, key):
+        """
+        Returns the (includes, entry) stored under key, or None if
+        there isn't one or it is stale.
+        """
+        fn = self.__FileName(key)
+
+        try:
+            f = open(fn, 'rb')
+            try:
+                includes, entry = cPickle.loads(zlib.decompress(f.read()))
+            finally:
+                f.close()
+        except Exception:
+            # Missing, unreadable or from an older version
+            self.discard(key)
+            return None
+
+        for path, h in includes:
+            try:
+                f = open(path, 'r')
+                try:
+                    current = OTContentHash(f.read())
+                finally:
+                    f.close()
+            except IOError:
+                current = None
+
+            if current != h:
+                self.discard(key)
+                return None
+
+        # Mark it as recently used
+        try:
+            os.utime(fn, None)
+        except OSError:
+            pass
+
+        return (includes, entry)
+
+    def store(self, key, includes, entry):
+        fn = self.__FileName(key)
+        tmpfn = fn + '.%d.tmp' % os.getpid()
+
+        f = open(tmpfn, 'wb')
+        try:
+            f.write(zlib.compress(cPickle.dumps((includes, entry), cPickle.HIGHEST_PROTOCOL)))
+        finally:
+            f.close()
+        os.rename(tmpfn, fn)
+
+        self.__Evict()
+
+    def discard(self, key):
+        try:
+            os.remove(self.__FileName(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for fn in self.__EntryFiles():
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
+
+    def __FileName(self, key):
+        return os.path.join(self.directory, key + '.otc')
+
+    def __EntryFiles(self):
+        return [os.path.join(self.directory, fn) for fn in os.listdir(self.directory)
+                if fn.endswith('.otc')]
+
+    def __Evict(self):
+        entries = []
+        for fn in self.__EntryFiles():
+            try:
+                entries.append((os.path.getmtime(fn), fn))
+            except OSError:
+                pass
+
+        entries.sort()
+        for mtime, fn in entries[:max(len(entries) - self.maxentries, 0)]:
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
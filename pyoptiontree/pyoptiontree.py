@@ -1,5 +1,7 @@
-import random, inspect, time, cPickle
+import random, inspect, time, cPickle, threading, re, bisect, weakref
 from pyoptiontreeexceptions import *
+from otparsecache import OTContentHash
+from otflatfile import OTWriteJSON, OTWriteYAML, OTReadJSON, OTReadYAML
 from operator import itemgetter
 import base64
 import os, os.path
@@ -29,6 +31,28 @@ def OTRandTag():
 
 OPTTREE_NONNONEXISTANTQUERY = '__' + OTRandTag()
 
+class OTMissingValue:
+    """
+    What a lookup gives when the key isn't there; compared by
+    identity, so it can't be confused with any real value.
+    """
+    pass
+
+OPTTREE_MISSING = OTMissingValue()
+
+class OTCreateBranch:
+    """
+    What an empty dictionary in addMapping() is flattened to; it only
+    creates the branch.  Compared by identity, so None can still be
+    stored as a value.
+    """
+    pass
+
+OPTTREE_CREATEBRANCH = OTCreateBranch()
+OPTTREE_STRHASHKEY = '__strhash_' + OTRandTag()       # cache entry for strhash()
+OPTTREE_STRUCTUREKEY = '__structure_' + OTRandTag()   # invalidated when a key is added to a tree
+OPTTREE_FLATKEY = '__flat_' + OTRandTag()             # cache entry for flatItems()
+
 def OTIsNameChar(s):
     return s.isalnum() or s == '[' or s == ']' or s == '_' or s == '/' or s == '.'
 
@@ -41,12 +65,17 @@ class OTTypeInfo:
     """
 
     def __init__(self, matchkey, endmarker, getvalue, description, matchlength=-1):
+        # The character a match has to start with, if known; used to
+        # pick out the types worth trying (see __TypesFor)
+        self.firstchar = None
+
         if type(matchkey) == str:
+            self.firstchar = matchkey[0]
             if matchkey[-1].isalnum():
-                self.matchfunc = lambda s: (s.startswith(matchkey) and
-                                            (len(s) <= len(matchkey) or not s[len(matchkey)].isalnum()))
+                self.matchfunc = lambda s, pos, end: (s.startswith(matchkey, pos, end) and
+                                                      (end - pos <= len(matchkey) or not s[pos + len(matchkey)].isalnum()))
             else:
-                self.matchfunc = lambda s: s.startswith(matchkey)
+                self.matchfunc = lambda s, pos, end: s.startswith(matchkey, pos, end)
                 
             if matchlength == -1:
                 self.matchlength = len(matchkey)
@@ -63,10 +92,17 @@ class OTTypeInfo:
         self.endmarker = endmarker
         self.getvalue = getvalue
         self.description = description
-        self.passname = ('name' in inspect.getargspec(getvalue)[0])
+        self.argnames = inspect.getargspec(getvalue)[0]
+        self.passname = ('name' in self.argnames)
+
+    def Matches(self, s, pos = 0, end = None):
+        # Tests s[pos:end] without copying it
+        if end == None:
+            end = len(s)
+        return self.matchfunc(s, pos, end)
 
-    def Matches(self, s):
-        return self.matchfunc(s)
+# What a builtin function may ask for by naming an argument
+OTFUNCTIONCALLARGS = ('branch', 'loc', 'rawvaluelist', 'valuelist', 'name', 'readyfunc')
 
 class OTFuncInfo(OTTypeInfo):
     """
@@ -96,6 +132,12 @@ class OTFuncInfo(OTTypeInfo):
             
         OTTypeInfo.__init__(self, self.name + '(', ')', function, description)
 
+        # The arguments __EvaluateStoredFunction passes, worked out once
+        # here instead of on every evaluation, and the callable that
+        # passes them (see __CallPlan)
+        self.callargs = tuple([a for a in OTFUNCTIONCALLARGS if a in self.argnames])
+        self.call = None
+
 class OTUserFunc(OTFuncInfo):
     """
     What holds information about a user function, used internally.
@@ -107,17 +149,176 @@ class OTUserFunc(OTFuncInfo):
                     
 class OTSearchFunc:
     def __init__(self, matchfunc, matchlength):
-        self.matchfunc = matchfunc
+        self.matchfunc = matchfunc      # called as matchfunc(s, pos)
         self.matchlength = matchlength
 
-class OTChInfo:
+class OTScanner(object):
     """
-    Keeps track of information important to error parsing; used internally
+    Finds the next instance of a search marker in a string, skipping
+    over nested pairs; used internally.  The end of each pair is found
+    the first time it is needed and remembered, so later searches in
+    the same string jump straight over it.
     """
-    def __init__(self, ch, line, column):
-        self.ch = ch
-        self.line = line
-        self.column = column
+
+    def __init__(self, st, nestchars):
+        self.st = st
+        self.nestchars = nestchars
+        self.firstchars = set([k[0] for k,r,im in nestchars])
+        self.closing = {}       # start of pair -> start of its end marker, or -1 if not terminated
+
+    def Find(self, pos, searchmarker, endpos):
+        while pos < endpos:
+            if self.Matches(searchmarker, pos):
+                return pos
+
+            nc = self.Opening(pos)
+            if nc == None:
+                pos += 1
+            else:
+                c = self.Closing(pos, nc)
+                if c == -1:
+                    return endpos
+                pos = c + len(nc[1])
+
+        return endpos
+
+    def Matches(self, searchmarker, pos):
+        if type(searchmarker) == str:
+            return self.st.startswith(searchmarker, pos)
+        elif isinstance(searchmarker, OTSearchFunc):
+            return searchmarker.matchfunc(self.st, pos)
+        return False
+
+    def Opening(self, pos):
+        if pos >= len(self.st) or self.st[pos] not in self.firstchars:
+            return None
+        for nc in self.nestchars:
+            if self.st.startswith(nc[0], pos):
+                return nc
+        return None
+
+    def Closing(self, pos, nc):
+        if pos in self.closing:
+            return self.closing[pos]
+
+        st = self.st
+        stack = [(pos, nc[1], nc[2])]
+        p = pos + len(nc[0])
+
+        while len(stack) != 0:
+            start, end, immune = stack[-1]
+
+            if p >= len(st):
+                # Not terminated; neither is anything it is nested in
+                for start, end, immune in stack:
+                    self.closing[start] = -1
+                break
+
+            if st.startswith(end, p):
+                self.closing[start] = p
+                stack.pop()
+                p += len(end)
+                continue
+
+            inner = None
+            if not immune:
+                inner = self.Opening(p)
+
+            if inner == None:
+                p += 1
+            elif p in self.closing:
+                if self.closing[p] == -1:
+                    for start, end, immune in stack:
+                        self.closing[start] = -1
+                    break
+                p = self.closing[p] + len(inner[1])
+            else:
+                stack.append((p, inner[1], inner[2]))
+                p += len(inner[0])
+
+        return self.closing[pos]
+
+class OTChInfo(object):
+    """
+    Keeps track of information important to error parsing; used
+    internally.  The line and column are looked up in the location
+    table only when they are asked for.
+    """
+    __slots__ = ['table', 'pos']
+
+    def __init__(self, table, pos):
+        self.table = table
+        self.pos = pos
+
+    line = property(lambda self: self.table.Lookup(self.pos)[0])
+    column = property(lambda self: self.table.Lookup(self.pos)[1])
+
+class OTLocTable(object):
+    """
+    Maps positions in a parsed string to line and column numbers in
+    the source; used internally.  Positions are stored as runs
+    starting at starts[k]: in a run, either each character advances
+    the column by one (step 1) or all of the characters share one
+    location (step 0, used for the newline and escape tags).  Slicing
+    returns a view on the same runs.
+    """
+
+    def __init__(self, starts, lines, columns, steps, length, offset=0):
+        self.starts = starts
+        self.lines = lines
+        self.columns = columns
+        self.steps = steps
+        self.offset = offset
+        self.length = length
+
+    def Lookup(self, i):
+        p = self.offset + i
+        k = bisect.bisect_right(self.starts, p) - 1
+        return (self.lines[k], self.columns[k] + (p - self.starts[k])*self.steps[k])
+
+    def Cut(self, ranges):
+        # Returns a new table with the (sorted, non-overlapping) ranges removed
+        starts, lines, columns, steps = [], [], [], []
+
+        kept = []
+        p = self.offset
+        for a, b in ranges:
+            if a > p - self.offset: kept.append((p, self.offset + a))
+            p = self.offset + b
+        if p < self.offset + self.length: kept.append((p, self.offset + self.length))
+
+        newpos = 0
+        for a, b in kept:
+            k = bisect.bisect_right(self.starts, a) - 1
+            while k < len(self.starts) and self.starts[k] < b:
+                rs = max(self.starts[k], a)
+                if k + 1 < len(self.starts):
+                    re_ = min(self.starts[k+1], b)
+                else:
+                    re_ = b
+                if rs < re_:
+                    starts.append(newpos + rs - a)
+                    lines.append(self.lines[k])
+                    columns.append(self.columns[k] + (rs - self.starts[k])*self.steps[k])
+                    steps.append(self.steps[k])
+                k += 1
+            newpos += b - a
+
+        return OTLocTable(starts, lines, columns, steps, newpos)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if type(i) == slice:
+            start, stop, step = i.indices(self.length)
+            return OTLocTable(self.starts, self.lines, self.columns, self.steps,
+                              max(stop - start, 0), self.offset + start)
+        if i < 0:
+            i += self.length
+        if i < 0 or i >= self.length:
+            raise IndexError('location table index out of range')
+        return OTChInfo(self, i)
 
 # These are for linking stuff up
 class LinkupBase:
@@ -131,7 +332,45 @@ class OTSoftLink(LinkupBase):
     pass
 
 class OTEvalStatement(LinkupBase):
-    pass
+    def __getstate__(self):
+        # code objects can't be pickled; they are recompiled when needed
+        d = self.__dict__.copy()
+        d.pop('code', None)
+        d.pop('pure', None)
+        return d
+
+# Names an eval statement can use and still be memoized.  Anything else
+# (e.g. time, random, os or an unknown method) might give a different
+# answer each time.
+OTPUREBUILTINS = set(['True', 'False', 'None', 'abs', 'all', 'any', 'bool', 'chr', 'cmp', 'dict',
+                      'divmod', 'enumerate', 'filter', 'float', 'frozenset', 'hex', 'int', 'len',
+                      'list', 'long', 'map', 'max', 'min', 'oct', 'ord', 'pow', 'range', 'reduce',
+                      'repr', 'reversed', 'round', 'set', 'sorted', 'str', 'sum', 'tuple', 'unichr',
+                      'unicode', 'xrange', 'zip'])
+OTPUREATTRIBUTES = set(['capitalize', 'center', 'conjugate', 'count', 'endswith', 'find', 'format',
+                        'get', 'imag', 'index', 'items', 'join', 'keys', 'ljust', 'lower', 'lstrip',
+                        'real', 'replace', 'rjust', 'rstrip', 'split', 'splitlines', 'startswith',
+                        'strip', 'title', 'upper', 'values', 'zfill'])
+
+def OTIsPureCode(code, varnames):
+    for n in code.co_names:
+        if n not in varnames and n not in OTPUREBUILTINS and n not in OTPUREATTRIBUTES:
+            return False
+    for c in code.co_consts:
+        if type(c) == type(code) and not OTIsPureCode(c, varnames):
+            return False
+    return True
+
+def OTEvalCode(evs):
+    # Compiles evs the first time it's needed.  The code is None if it
+    # doesn't compile; eval() then raises the error when it's evaluated.
+    if 'code' not in evs.__dict__:
+        try:
+            evs.code = compile(evs.string, '<string>', 'eval')
+        except Exception:
+            evs.code = None
+        evs.pure = evs.code is not None and OTIsPureCode(evs.code, evs.sldict)
+    return evs.code
 
 
 ######################################################################
@@ -146,6 +385,121 @@ class OTFunctionEval:
         self.name = name
 
 
+######################################################################
+# Dependency tracking for the resolution cache; used internally.
+
+class OTDependencyFrame:
+    """
+    The keys read while resolving one value.  deps maps (id(tree),
+    key) to tree.  If volatile is set, the value may change without
+    any of the keys changing (e.g. it came from an eval statement) and
+    can't be cached.
+    """
+    def __init__(self):
+        self.deps = {}
+        self.volatile = False
+
+class OTDependencyTracker(threading.local):
+    """
+    A stack of OTDependencyFrame instances, one for each get() in
+    progress in the current thread.  When a frame is popped, its
+    dependencies are added to the frame below it, as the outer value
+    depends on everything the inner one did.
+    """
+    def __init__(self):
+        self.frames = []
+
+    def push(self):
+        f = OTDependencyFrame()
+        self.frames.append(f)
+        return f
+
+    def pop(self):
+        f = self.frames.pop()
+        if len(self.frames) != 0:
+            self.frames[-1].deps.update(f.deps)
+            self.frames[-1].volatile = self.frames[-1].volatile or f.volatile
+        return f
+
+    def active(self):
+        return len(self.frames) != 0
+
+    def record(self, tree, key):
+        if len(self.frames) != 0:
+            self.frames[-1].deps[(id(tree), key)] = tree
+
+    def extend(self, deps):
+        if len(self.frames) != 0:
+            self.frames[-1].deps.update(deps)
+
+    def markVolatile(self):
+        if len(self.frames) != 0:
+            self.frames[-1].volatile = True
+
+OTtracker = OTDependencyTracker()
+OTcachelock = threading.Lock()
+OTcacheversion = [0]    # incremented on every invalidation; guards against caching a value that changed while it was being resolved
+
+def OTHasMissing(v):
+    # True if a value that fell back to OPTTREE_MISSING somewhere inside
+    if v is OPTTREE_MISSING:
+        return True
+    elif type(v) == list or type(v) == tuple:
+        for e in v:
+            if OTHasMissing(e): return True
+    elif type(v) == dict:
+        for k, e in v.items():
+            if OTHasMissing(k) or OTHasMissing(e): return True
+    return False
+
+def OTCopyValue(v):
+    # Copies the containers in v so cached values can't be changed through returned ones
+    if type(v) == list:
+        return [OTCopyValue(e) for e in v]
+    elif type(v) == tuple:
+        return tuple([OTCopyValue(e) for e in v])
+    elif type(v) == dict:
+        return dict([(OTCopyValue(k), OTCopyValue(e)) for k, e in v.items()])
+    elif type(v) == set:
+        return set(v)
+    else:
+        return v
+
+
+######################################################################
+# Recording parses for the parse cache; used internally.
+
+class OTUncacheable(Exception):
+    pass
+
+class OTParseRecord:
+    """
+    What parsing a file did to a tree, recorded so it can be stored in
+    an OTParseCache and replayed later.  events holds ('src', path,
+    sourcename) and ('set', path, name, encoded value) in the order
+    they happened; path is the list of branch names from the tree the
+    file was added to.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.includes = []      # (path, content hash) of the files read by optfile()
+        self.funcs = set()      # names of the functions the encoded values call
+        self.events = []
+        self.cacheable = True
+
+def OTEncodeLoc(loc):
+    if loc == None:
+        return None
+    return tuple([(ci.line, ci.column) for ci in loc])
+
+def OTDecodeLoc(loc):
+    if loc == None:
+        return None
+    n = len(loc)
+    table = OTLocTable(range(n), [l for l, c in loc], [c for l, c in loc], [0]*n, n)
+    return tuple([table[i] for i in xrange(n)])
+
+
 class PyOptionTree:
     """
     PyOptionTree Description
@@ -526,7 +880,21 @@ class PyOptionTree:
       they were continuations of the first file.  In other words, it
       loads all the parameters into the same option tree, with
       conflicts being resolved in favor of the last name specified.
-      
+
+    lazyoptfile(arg1, ...)
+      Takes the same arguments as optfile(), but the files are not
+      read until something in the returned tree is first used, so
+      large libraries of options cost nothing unless they are needed.
+      The files are checked for unterminated comments, strings and
+      brackets when lazyoptfile() is called; any other errors in them
+      are reported on first use, along with where lazyoptfile() was
+      called, and are raised even by get() with a default.
+
+      Functions evaluated during parsing (copy(), reref(), now(), ...)
+      in the files run when the files are read, so links in them to
+      items outside the files see the values at that time, not at the
+      point lazyoptfile() was called.  Use optfile() for such files.
+
     now(arg1)
       Forces evaluation of any contained functions (including those
       pointed to by links) at parse time instead of at retrieval time.
@@ -705,9 +1073,18 @@ class PyOptionTree:
         ('\"','\"',True),
         ('\'','\'',True)]
 
+    # matches the start of anything the comment removal needs to look at
+    __commentstart = re.compile('|'.join([re.escape(sc) for sc,ec,im in __nestchars if im]
+                                         +[re.escape(sc) for sc,ec in __commenttags]))
+
+    # matches the start of any nested pair
+    __nestopen = re.compile('|'.join([re.escape(sc) for sc,ec,im in __nestchars]))
+
     __escapechar = '\\'
-    __escaped_chars = {}
-    __escaped_tag_prefix = '_EC_'
+    __specialchars = re.compile(r'[\\\n]')
+    __escaped_tag_prefix = '_EC' + OTRandTag() + '_'      # followed by the character in two hex digits
+    __escapedtag = re.compile(re.escape(__escaped_tag_prefix) + '([0-9a-f]{2})')
+    __maxtaglength = max(len(__newlinetag), len(__escaped_tag_prefix) + 2)
     __listsepchar = ','
     __equalchar   = '='
 
@@ -731,8 +1108,20 @@ class PyOptionTree:
         # Handle the defaults
 
         self.__opts = {}
+        self.__optsshared = False   # True if a copy shares __opts; it is copied before we write to it
+        self.__cowsource = None     # if we are a copy, the tree whose (frozen) __opts we share
+        self.__cowopts = None       # if we are a copy, the options copied in or set since
+        self.__cowargs = None       # (rerefsl, depth) for copying in the shared options
+        self.__cowcopies = []       # weak references to the copies sharing our __opts
+        self.__pending = None       # files lazyoptfile() left to be read when we're first used; see __LoadPending
+        self.__cache = {}           # name -> (value, dependencies) of values resolved by get()
+        self.__dependents = {}      # key -> {(id(tree), name) : tree} of cache entries that depend on the key
         self.__cilist= []
         self.__chstr = []
+        self.__scanners = []
+        self.__evalstats = None         # only used at the root, and only when profiling; see evalProfile()
+        self.__parsecache = None        # only used at the root
+        self.__parserecord = None       # only used at the root
         self.__setvarrank = 0
 
         # Test to see if we're a branch of a parent tree
@@ -751,7 +1140,9 @@ class PyOptionTree:
             self.__sources = copyot.__sources
             self.__cilist = copyot.__cilist
             self.__chstr = copyot.__chstr
+            self.__scanners = copyot.__scanners
             self.__types = copyot.__types
+            self.__typedispatch = copyot.__typedispatch
             self.__userfunclist = copyot.__userfunclist
             if userfunclist != []:
                 self.addUserFunctions(userfunclist)
@@ -803,11 +1194,209 @@ class PyOptionTree:
                 os.chdir(cwd)
                 
             elif type(infile) == file:
-                self.addString(''.join([s.replace('\n', ' \n') for s in infile.readlines()]),
-                               sourcename = (sourcename, infile.name)[sourcename == ''])
+                self.__AddFileContents(infile.read(), (sourcename, infile.name)[sourcename == ''],
+                                       os.path.abspath(infile.name))
         except PyOptionTreeException, ote:
             raise ote                      
         
+    def addJSONFile(self, infile):
+        """
+        Adds the options in a JSON file written by saveJSON(), or any
+        JSON object of full option names (e.g.
+        \"templogger/read_interval\") and values.  infile may be a
+        file name or an open file.  Objects in the values become
+        dictionaries.
+        """
+
+        self.__AddFlatFile(infile, OTReadJSON, 'Reading JSON')
+
+    def addYAMLFile(self, infile):
+        """
+        Adds the options in a YAML file written by saveYAML().  Other
+        YAML mappings of full option names and values can be read too
+        if PyYAML is installed.  infile may be a file name or an open
+        file.
+        """
+
+        self.__AddFlatFile(infile, OTReadYAML, 'Reading YAML')
+
+    def __AddFlatFile(self, infile, reader, action):
+        if type(infile) == str:
+            f = open(infile, 'r')
+            try:
+                content = f.read()
+            finally:
+                f.close()
+            name = infile
+        else:
+            content = infile.read()
+            name = infile.name
+
+        try:
+            pairs = reader(content)
+        except ValueError, e:
+            raise PyOptionTreeParseError(self.__LocString(action = action + ' (' + name + ')'), str(e))
+
+        self.__SetMany(pairs)
+
+    def setParseCache(self, cache):
+        """
+        Sets the cache (an otparsecache.OTParseCache) used by
+        addOptionsFile() for this tree and all its branches.  A file
+        whose contents (and optfile() includes) haven't changed since
+        it was cached is added without being parsed.  Links,
+        evaluation statements and functions are stored unevaluated, so
+        they behave just as if the file had been parsed.  Files that
+        call functions evaluated during parsing (other than optfile
+        and lazyoptfile) are never cached.  Pass None to turn caching
+        off.
+        """
+
+        self.root().__parsecache = cache
+
+    def __AddFileContents(self, content, sourcename, path):
+        root = self.root()
+        s = content.replace('\n', ' \n')
+
+        if root.__parserecord != None:
+            # An optfile() include of a file being recorded; the cache entry depends on it
+            root.__parserecord.includes.append( (path, OTContentHash(content)) )
+            self.addString(s, sourcename)
+            return
+
+        cache = root.__parsecache
+        if cache == None:
+            self.addString(s, sourcename)
+            return
+
+        key = cache.key(OTContentHash(content), os.path.dirname(path), sourcename, self.__CacheSignature())
+
+        cached = cache.load(key)
+        if cached != None and self.__ReplayParse(cached[1]):
+            return
+
+        record = OTParseRecord(self)
+        root.__parserecord = record
+        try:
+            self.addString(s, sourcename)
+        finally:
+            root.__parserecord = None
+
+        if record.cacheable:
+            try:
+                cache.store(key, record.includes, (record.funcs, record.events))
+            except (IOError, OSError):
+                pass   # the cache is only an optimization
+
+    def __CacheSignature(self):
+        # Which functions are defined changes how a file parses
+        return ','.join(sorted([t.name + ('', '!')[t.evalimmediately]
+                                for t in self.__TypeList() if isinstance(t, OTFuncInfo)]))
+
+    def __RecordParse(self, branch, *event):
+        record = self.root().__parserecord
+        if record == None or not record.cacheable:
+            return
+
+        try:
+            path = []
+            b = branch
+            while b is not record.tree:
+                if b.__parent == None:
+                    raise OTUncacheable()    # set something outside of the tree the file was added to
+                path.insert(0, b.__treename)
+                b = b.__parent
+
+            if event[0] == 'set':
+                name, value = event[1:]
+                if isinstance(value, PyOptionTree):
+                    if value.__parent is not branch or value.__treename != name:
+                        raise OTUncacheable()
+                    ev = ('b',)
+                else:
+                    ev = self.__EncodeParsed(value, branch, record)
+                record.events.append( ('set', path, name, ev) )
+            else:
+                record.events.append( ('src', path, event[1]) )
+
+        except OTUncacheable:
+            record.cacheable = False
+
+    def __RecordImmediate(self, funcinfo, rawvaluelist):
+        # optfile() only depends on its arguments (and the included files, which are recorded)
+        record = self.root().__parserecord
+        if record == None:
+            return
+
+        if funcinfo.name not in ('optfile', 'lazyoptfile'):
+            record.cacheable = False
+        else:
+            try:
+                self.__EncodeParsed(rawvaluelist, None, OTParseRecord(None), primitiveonly = True)
+            except OTUncacheable:
+                record.cacheable = False
+
+    def __EncodeParsed(self, v, branch, record, primitiveonly = False):
+        if v is None or type(v) in [bool, int, long, float, str, unicode]:
+            return ('v', v)
+        elif type(v) == list:
+            return ('l', [self.__EncodeParsed(e, branch, record, primitiveonly) for e in v])
+        elif type(v) == tuple:
+            return ('t', [self.__EncodeParsed(e, branch, record, primitiveonly) for e in v])
+        elif primitiveonly:
+            raise OTUncacheable()
+        elif isinstance(v, OTSoftLink):
+            return ('s', v.string, OTEncodeLoc(v.loc), v.origsource)
+        elif isinstance(v, OTEvalStatement):
+            return ('e', v.string, OTEncodeLoc(v.loc), v.origsource,
+                    [(k, self.__EncodeParsed(e, branch, record)) for k, e in v.sldict.items()],
+                    v.origstring)
+        elif isinstance(v, OTFunctionEval) and v.branch is branch:
+            record.funcs.add(v.funcinfo.name)
+            return ('f', v.funcinfo.name, OTEncodeLoc(v.loc),
+                    [self.__EncodeParsed(e, branch, record) for e in v.rawvaluelist], v.name)
+        else:
+            raise OTUncacheable()
+
+    def __DecodeParsed(self, ev, name, funcinfos):
+        tag = ev[0]
+        if tag == 'v':
+            return ev[1]
+        elif tag == 'l':
+            return [self.__DecodeParsed(e, name, funcinfos) for e in ev[1]]
+        elif tag == 't':
+            return tuple([self.__DecodeParsed(e, name, funcinfos) for e in ev[1]])
+        elif tag == 'b':
+            return self.__GetOrCreateBranch([name])
+        elif tag == 's':
+            return OTSoftLink(ev[1], OTDecodeLoc(ev[2]), ev[3])
+        elif tag == 'e':
+            return OTEvalStatement(ev[1], loc=OTDecodeLoc(ev[2]), origsource=ev[3],
+                                   sldict=dict([(k, self.__DecodeParsed(e, name, funcinfos)) for k, e in ev[4]]),
+                                   origstring=ev[5])
+        elif tag == 'f':
+            return OTFunctionEval(branch=self, funcinfo=funcinfos[ev[1]], loc=OTDecodeLoc(ev[2]),
+                                  rawvaluelist=[self.__DecodeParsed(e, name, funcinfos) for e in ev[3]],
+                                  name=ev[4])
+
+    def __ReplayParse(self, entry):
+        # Applies a cached parse; returns False if it can't be used
+        funcs, events = entry
+
+        funcinfos = dict([(t.name, t) for t in self.__TypeList() if isinstance(t, OTFuncInfo)])
+        for f in funcs:
+            if f not in funcinfos:
+                return False
+
+        for event in events:
+            branch = self.__GetOrCreateBranch(list(event[1]))
+            if event[0] == 'src':
+                branch.__RecordSource(event[2])
+            else:
+                branch.__SetValue(event[2], branch.__DecodeParsed(event[3], event[2], funcinfos))
+
+        return True
+
     def addCommandLineArgs(self, arglist, lookforfiles=True):
         """
         Takes a list of parameters given on the command line, usually
@@ -908,73 +1497,109 @@ class PyOptionTree:
         Adds options located in a string s.  Optionally, the source
         may be provided with a sourcename used by the description()
         and fullName() methods and the error reporting functions.
+
+        A unicode string is encoded as UTF-8 first, so its strings
+        come back UTF-8 encoded, as they do from an option file.
         """
 
         if sourcename == '':
             sourcename = '<string input>'
 
-        cilist = []
-        
-        linenum, colnum = 1, 0
-        escapeflag = False
+        chstr, cilist = self.__PrepareString(s)
+
+        # Now process the list
+        try:
+            self.__ParseCharList(chstr, cilist, sourcename)
+        except PyOptionTreeException, ote:
+            raise ote
+
+    def __PrepareString(self, s):
+        # Returns the string ready to parse and the table of where
+        # each character came from.
+
+        # Work on bytes, so every escaped character fits in the two
+        # hex digits of its tag (see __NewEscapedCharTag)
+        if type(s) == unicode:
+            s = s.encode('utf-8')
 
         # Translate newline characters and escaped characters
-        # this loop replaces newline and escape chars with special tags
-        # this allows multiple characters to be mapped to the same tag
-        for c in s:
-            colnum += 1
-            if escapeflag:
-                cilist += [OTChInfo(cc, linenum, colnum) for cc in self.__NewEscapedCharTag(c)]
-                escapeflag = False
-            elif c == self.__escapechar:
-                escapeflag = True
-            elif c == '\n':
-                cilist += [OTChInfo(cc, linenum, colnum) for cc in self.__newlinetag]
+        # this replaces newline and escape chars with special tags
+        # this allows multiple characters to be mapped to the same tag.
+        # The location of each character is kept as runs in a table.
+        pieces = []
+        starts, lines, columns, steps = [], [], [], []
+        length = 0
+
+        def addrun(piece, line, column, step):
+            if len(piece) == 0: return length
+            starts.append(length)
+            lines.append(line)
+            columns.append(column)
+            steps.append(step)
+            pieces.append(piece)
+            return length + len(piece)
+
+        linenum, linestart = 1, 0
+        pos = 0
+        while True:
+            m = self.__specialchars.search(s, pos)
+            if m == None:
+                length = addrun(s[pos:], linenum, pos - linestart + 1, 1)
+                break
+
+            i = m.start()
+            length = addrun(s[pos:i], linenum, pos - linestart + 1, 1)
+
+            if s[i] == '\n':
+                length = addrun(self.__newlinetag, linenum, i - linestart + 1, 0)
                 linenum += 1
-                colnum = 0
+                linestart = i + 1
+                pos = i + 1
+            elif i + 1 < len(s):
+                # escaped character, including escaped newlines
+                length = addrun(self.__NewEscapedCharTag(s[i+1]), linenum, i - linestart + 2, 0)
+                pos = i + 2
             else:
-                cilist += [OTChInfo(c, linenum, colnum)]
-
-        cilist += [OTChInfo(cc, linenum, colnum) for cc in self.__newlinetag]
+                pos = i + 1
+                break
 
-        chstr = ''.join([ci.ch for ci in cilist])
+        length = addrun(self.__newlinetag, linenum, len(s) - linestart, 0)
 
-        elimstack = []
+        chstr = ''.join(pieces)
+        cilist = OTLocTable(starts, lines, columns, steps, length)
 
         # Eliminate all the comments, skipping immune nest chars
 
-        searchpairs = ([(sc, (ec, False)) for sc,ec,t in filter(lambda (sc,ec,im): im, self.__nestchars)]
-                       +[(sc, (ec, True)) for sc,ec in self.__commenttags])
-        
+        ends = dict([(sc, (ec, False)) for sc,ec,t in filter(lambda (sc,ec,im): im, self.__nestchars)]
+                    +[(sc, (ec, True)) for sc,ec in self.__commenttags])
+
         # this loop goes through the entire config string and identifies the start and end positions of comments
         # that will be removed
+        elimstack = []
         ps = 0
-        while ps < len(chstr):
-            changemade = False
-
-            for ts, (te, cutout) in searchpairs:
-                if chstr[ps:].startswith(ts):
-                    pe = chstr[ps + len(ts):].find(te)
-                    if pe == -1:
-                        raise PyOptionTreeParseError(self.__LocString(cilist[ps:], action = 'Removing Comments'),
-                                                     '\'' + ts + '\' missing end tag \'' + te + '\'')
-                    if cutout: elimstack += [(ps, ps + pe + len(ts) + len(te))]
-                    ps += pe + len(ts) + len(te)
-                    changemade = True
-
-            if not changemade: ps += 1
-                
-        #self.__dbprint('\n\n\n\n######################### Eliminating!')
-        for es, ee in sorted(elimstack, reverse=True):
-            #self.__dbprint(''.join([ci.ch for ci in cilist[es:ee]]))
-            cilist[es:ee] = []
+        while True:
+            m = self.__commentstart.search(chstr, ps)
+            if m == None:
+                break
+
+            ps = m.start()
+            ts = m.group()
+            te, cutout = ends[ts]
+
+            pe = chstr.find(te, ps + len(ts))
+            if pe == -1:
+                raise PyOptionTreeParseError(self.__LocString(cilist[ps:], action = 'Removing Comments'),
+                                             '\'' + ts + '\' missing end tag \'' + te + '\'')
+            if cutout: elimstack += [(ps, pe + len(te))]
+            ps = pe + len(te)
+
+        if len(elimstack) != 0:
+            chstr = ''.join([chstr[a:b] for a, b in zip([0] + [e for s_, e in elimstack],
+                                                          [s_ for s_, e in elimstack] + [len(chstr)])])
+            cilist = cilist.Cut(elimstack)
+
+        return chstr, cilist
 
-        # Now process the list
-        try:
-            self.__ParseCharList(''.join([ci.ch for ci in cilist]), cilist, sourcename)
-        except PyOptionTreeException, ote:
-            raise ote
-        
     def get(self, name, default=OPTTREE_NONNONEXISTANTQUERY, vardict={}, recursionsleft=OPTTREE_MAXRECURSIONDEPTH):
         """
         Returns the parameter given by ``name``.  If ``default`` is
@@ -993,15 +1618,57 @@ class PyOptionTree:
         possible using \'..\'.
         """
 
-        required = (default == OPTTREE_NONNONEXISTANTQUERY)
+        required = (default is OPTTREE_NONNONEXISTANTQUERY)
 
         if recursionsleft == 0:
             raise PyOptionTreeRetrievalError(self.__LocString(), 'Maximum Recursion Depth Exceeded.')
 
+        # Resolved values are cached when no vardict is given; the
+        # entries are dropped when any key they depend on is set.
+        # Keys that aren't there are cached too (as OPTTREE_MISSING),
+        # so looking them up again with a default costs a dict lookup.
+        cacheable = (len(vardict) == 0 and type(name) == str)
+
+        if cacheable:
+            entry = self.__cache.get(name)
+            if entry is not None:
+                if entry[0] is not OPTTREE_MISSING:
+                    OTtracker.extend(entry[1])
+                    return OTCopyValue(entry[0])
+                elif not required:
+                    OTtracker.extend(entry[1])
+                    return default
+                # else look it up again for the error
+
+        if not cacheable and not OTtracker.active():
+            return self.__GetValueOrDefault(name, default, required, vardict, recursionsleft)
+
+        # Without a default, failures raise; with one, they give
+        # OPTTREE_MISSING so we can tell them from real values
+        version = OTcacheversion[0]
+        frame = OTtracker.push()
+        try:
+            v = self.__GetValueOrDefault(name, (OPTTREE_MISSING, default)[required], required, vardict, recursionsleft)
+        finally:
+            OTtracker.pop()
+
+        if not required and v is not OPTTREE_MISSING and OTHasMissing(v):
+            # Part of the value fell back to the default; that isn't
+            # cached, and the default goes where the parts failed
+            return self.__GetValueOrDefault(name, default, required, vardict, recursionsleft)
+
+        if cacheable and not frame.volatile:
+            self.__StoreCached(name, v, frame.deps, version)
+
+        if v is OPTTREE_MISSING:
+            return default
+        return v
+
+    def __GetValueOrDefault(self, name, default, required, vardict, recursionsleft):
         try:
             return self.__GetValue(name, default, required, vardict, recursionsleft)
         except PyOptionTreeException, ote:
-            if required:
+            if required or isinstance(ote, PyOptionTreeIncludeError):
                 raise ote.PrependMessage(self.__LocString(action='Resolving key \"' + name + '\"'))
             else:
                 return default
@@ -1019,11 +1686,7 @@ class PyOptionTree:
         otherwise.  
         """
 
-        try:
-            return (self.get(name, default = OPTTREE_NONNONEXISTANTQUERY+'__', vardict=vardict)
-                    != OPTTREE_NONNONEXISTANTQUERY + '__')
-        except PyOptionTreeException, ote:
-            raise ote
+        return self.get(name, default = OPTTREE_MISSING, vardict=vardict) is not OPTTREE_MISSING
 
     def __contains__(self, name):
         """
@@ -1120,15 +1783,87 @@ class PyOptionTree:
         parameters and branches in the local tree.
         """
 
-        return [(n, self.__ReadyValue(v)) for n, (v, o) in self.__opts.items()]
-    
+        return list(self.iterItems())
+
+    def iterItems(self, depth = 1, under = ''):
+        """
+        Yields (<name>, <value>) tuples of the parameters and branches
+        in the tree, resolving each value only when it is reached, so
+        stopping early leaves the rest untouched.
+
+        With depth greater than 1 the branches are gone through as
+        well, down to that many levels (None means no limit); each
+        branch is yielded before its contents.  If under is given,
+        only the items inside that branch are yielded.  Below the
+        local tree, names are given from this tree, e.g.
+        'plot/colors/0', so they can be passed to get().
+        """
+
+        return self.__IterItems(depth, under, True, True)
+
+    def iterLeaves(self, depth = 1, under = ''):
+        """
+        Same as iterItems(), but yields only the parameters, not the
+        branches.
+        """
+
+        return self.__IterItems(depth, under, True, False)
+
+    def iterBranches(self, depth = 1, under = ''):
+        """
+        Same as iterItems(), but yields only the branches.
+        """
+
+        return self.__IterItems(depth, under, False, True)
+
+    def __IterItems(self, depth, under, leaves, branches):
+        if under:
+            ot = self.get(under, OPTTREE_MISSING)
+            if not isinstance(ot, PyOptionTree):
+                return
+
+            prefix = self.__NameList2Name(self.__Name2NameList(under)) + '/'
+        else:
+            ot = self
+            prefix = ''
+
+        for item in ot.__IterLocal(prefix, depth, leaves, branches, set()):
+            yield item
+
+    def __IterLocal(self, prefix, depth, leaves, branches, active):
+        active.add(id(self))
+
+        for n in self.__OptKeys():
+            vr = self.__OptItem(n)
+            if vr is None:
+                continue
+
+            v = self.__ReadyValue(vr[0])
+
+            if not isinstance(v, PyOptionTree):
+                if leaves:
+                    yield (prefix + n, v)
+                continue
+
+            if branches:
+                yield (prefix + n, v)
+
+            if depth is None or depth > 1:
+                if id(v) in active:
+                    raise PyOptionTreeRetrievalError(self.__LocString(action = 'Iterating Over Tree'),
+                                                     'Key \"' + prefix + n + '\" links back to a branch containing it.')
+                for item in v.__IterLocal(prefix + n + '/', depth and depth - 1, leaves, branches, active):
+                    yield item
+
+        active.discard(id(self))
+
 
     def itemList(self):
         """
         Returns a list of the names of all the items in the local tree.
         """
 
-        return [n for n, (v, o) in self.__opts.items()]
+        return self.__OptKeys()
 
     def leaves(self):
         """
@@ -1136,9 +1871,7 @@ class PyOptionTree:
         parameters in the tree, excluding branches.
         """
 
-        return [(n, v) for n,v in
-                filter(lambda (n,v): not isinstance(v, PyOptionTree),
-                       [(n,self.__ReadyValue(v)) for n,(v,o) in self.__opts.items()])]
+        return list(self.iterLeaves())
     
     def leafList(self):
         """
@@ -1154,10 +1887,60 @@ class PyOptionTree:
         in the tree.
         """
 
-        return [(n, v) for n,v in
-                filter(lambda (n,v): isinstance(v, PyOptionTree),
-                       [(n,self.__ReadyValue(v)) for n,(v,o) in self.__opts.items()])]
+        return list(self.iterBranches())
     
+    def flatItems(self):
+        """
+        Returns a list of (<name>, <value>) tuples of all the
+        parameters in the tree and its branches, in the order they
+        were set.  Each name is the full name from this tree, e.g.
+        'templogger/read_interval'.  Like strhash(), the values of each
+        branch are cached along with the keys they came from, so only
+        the branches that changed are gone through again.
+        """
+
+        flat = []
+        self.__Flatten('', flat, set())
+        return flat
+
+    def __Flatten(self, prefix, flat, active):
+        active.add(id(self))
+        for n, v in self.__FlatEntry():
+            if isinstance(v, PyOptionTree):
+                if id(v) in active:
+                    raise PyOptionTreeRetrievalError(self.__LocString(action = 'Flattening Tree'),
+                                                     'Key \"' + prefix + n + '\" links back to a branch containing it.')
+                v.__Flatten(prefix + n + '/', flat, active)
+            else:
+                flat.append((prefix + n, OTCopyValue(v)))
+        active.discard(id(self))
+
+    def __FlatEntry(self):
+        # The (name, value) pairs of the local tree, in order, with
+        # branches left as trees.  Cached on the local keys only, so
+        # setting a key in one branch doesn't touch the others.
+        entry = self.__cache.get(OPTTREE_FLATKEY)
+        if entry is not None:
+            OTtracker.extend(entry[1])
+            return entry[0]
+
+        version = OTcacheversion[0]
+        frame = OTtracker.push()
+        try:
+            OTtracker.record(self, OPTTREE_STRUCTUREKEY)
+            local = []
+
+            for n, (v, rank) in sorted(self.__OptItems(), key = lambda item: item[1][1]):
+                OTtracker.record(self, n)
+                local.append((n, self.__ReadyValue(v)))
+        finally:
+            OTtracker.pop()
+
+        if not frame.volatile:
+            self.__StoreCached(OPTTREE_FLATKEY, local, frame.deps, version)
+
+        return local
+
     def branchList(self):
         """
         Returns a list of the names of the branches of the local tree.
@@ -1205,16 +1988,17 @@ class PyOptionTree:
         Returns a copy of the tree.  If the tree has a parent, the
         copy would share the same parent and name as the original, but
         all name resolutions from the original node ignore this one.
+
+        The copy is made in constant time; the two trees share their
+        options until either one is used, and then only the branches
+        on the path being used are copied.
         """
 
         ot = PyOptionTree(None, userfunclist = self.__userfunclist)
         ot.__parent = self.parent()
         ot.__treename = self.__treename
         ot.__sources = self.__sources
-        ot.__opts = {}
-        for k, (v, r) in self.__opts.items():
-            #self.__dbprint('COPY>  Copying key=' + str(k) + '  v=' + str(v) + '   r=' + str(r) + '\n\n')
-            ot.__SetValue(k, ot.__CopyIn(self, v, k, rerefsl = False), r)
+        ot.__ShareOpts(self, False, -1, False)
 
         return ot
 
@@ -1249,6 +2033,34 @@ class PyOptionTree:
         f.write(str(self))
         f.close()
 
+    def saveJSON(self, filename):
+        """
+        Saves the retrieved values of the tree, as given by
+        flatItems(), to a JSON object in ``filename`` that
+        addJSONFile() can load.  Only values JSON can represent can be
+        saved; tuples come back as lists.  Much faster than saveTree()
+        for large trees, but links, functions and eval statements are
+        not kept.
+        """
+        self.__SaveFlatFile(filename, OTWriteJSON, 'Saving Tree as JSON')
+
+    def saveYAML(self, filename):
+        """
+        The same as saveJSON(), but writes YAML, one option per line;
+        load it with addYAMLFile().
+        """
+        self.__SaveFlatFile(filename, OTWriteYAML, 'Saving Tree as YAML')
+
+    def __SaveFlatFile(self, filename, writer, action):
+        pairs = self.flatItems()
+        f = file(filename, 'w')
+        try:
+            writer(f, pairs)
+        except ValueError, e:
+            raise PyOptionTreeRetrievalError(self.__LocString(action = action), str(e))
+        finally:
+            f.close()
+
     def saveTreeAsLog(self, fileprefix, filesuffix='opt'):
         """
         Saves the tree to an option tree file that can be reloaded and
@@ -1301,13 +2113,37 @@ class PyOptionTree:
     def strhash(self):
         """
         Returns a string hash of alphanumeric characters of the option
-        tree.  The current implementation is a little slow, as it
-        retrieves all the values, thus it is immune to links and the
-        like.
+        tree.  The hash is computed from the retrieved values, thus it
+        is immune to links and the like.  It is cached along with the
+        keys it was computed from (here, in the branches and at the
+        ends of any links), so it is only recomputed after one of
+        those is set.
         """
 
         # return base64.b64encode(md5(self.string()).digest()).replace('/', '').replace('+', '')[:8]
 
+        entry = self.__cache.get(OPTTREE_STRHASHKEY)
+        if entry is not None:
+            OTtracker.extend(entry[1])
+            return entry[0]
+
+        version = OTcacheversion[0]
+        frame = OTtracker.push()
+        try:
+            OTtracker.record(self, OPTTREE_STRUCTUREKEY)
+            for n in self.__OptKeys():
+                OTtracker.record(self, n)
+
+            h = self.__ComputeStrHash()
+        finally:
+            OTtracker.pop()
+
+        if not frame.volatile:
+            self.__StoreCached(OPTTREE_STRHASHKEY, h, frame.deps, version)
+
+        return h
+
+    def __ComputeStrHash(self):
         mhash = md5()
 
         def updatehash(v):
@@ -1326,22 +2162,58 @@ class PyOptionTree:
             else:
                 mhash.update(cPickle.dumps(v))
 
-        updatehash(self.items())
+        for item in self.iterItems():
+            updatehash(item)
 
         return base64.b64encode(mhash.digest()).replace('/', '').replace('+', '')[:8]
 
     def __eq__(self, ot):
         """
         Tests the equality of two trees.  Currently uses hashes, which
-        is slower than directly, but this will hopefully change soon.
+        are cached, so comparing trees that haven't changed is cheap.
         """
 
         if not isinstance(ot, PyOptionTree): return False
 
+        if ot is self: return True
 
         return self.strhash() == ot.strhash()
     
         
+    def profileEvals(self, enable = True):
+        """
+        Turns recording of the statistics returned by evalProfile() on
+        or off for the whole tree.  It is off by default, so
+        evaluating statements costs nothing extra.
+        """
+
+        root = self.root()
+        if not enable:
+            root.__evalstats = None
+        elif root.__evalstats is None:
+            root.__evalstats = {}
+
+    def evalProfile(self, reset = False):
+        """
+        Returns a list of (source, line, column, expression,
+        evaluations, seconds) tuples, one for each eval statement
+        evaluated in the tree since profileEvals() was called (or since
+        evalProfile(reset = True) was called), most expensive first.
+        Expressions that only use the values they link to and simple
+        builtins are cached until one of those values changes; the
+        others are evaluated every time they are retrieved.  Only real
+        evaluations are counted, not values taken from the cache.
+        """
+
+        root = self.root()
+        if root.__evalstats is None:
+            return []
+
+        stats = sorted([k + tuple(v) for k, v in root.__evalstats.items()], key = itemgetter(5), reverse = True)
+        if reset:
+            root.__evalstats = {}
+        return stats
+
     def update(self, udict):
         """
         This function updates the current option tree with all the
@@ -1349,8 +2221,29 @@ class PyOptionTree:
         format, and the value pairs can be any type.
         """
 
-        for k,v in udict.items():
-            self.set(k,v)
+        self.__SetMany([(k, v) for k, v in udict.items()])
+
+        return self
+
+    def addMapping(self, mapping):
+        """
+        Sets many options at once.  ``mapping`` is a dictionary or a
+        list of (name, value) pairs; names are in link format, as in
+        set().  A value that is itself a dictionary is taken as a
+        branch holding its items (an empty one creates an empty
+        branch), so nested and flat mappings can be mixed, e.g.::
+
+          ot.addMapping({'plot/colors/0' : 'red',
+                         'temperature' : {'units' : 'F'}})
+
+        Each branch is walked to or created only once, however many
+        keys it holds, so large mappings load in linear time.  Returns
+        a reference to the option tree.
+        """
+
+        pairs = []
+        self.__FlattenMapping(mapping, [], pairs)
+        self.__SetMany(pairs)
 
         return self
 
@@ -1359,7 +2252,7 @@ class PyOptionTree:
         Returns the number of variables and branches in this node of the tree.
         """
         
-        return len(self.__opts)
+        return len(self.__OptKeys())
     
 
     ######################################################################
@@ -1399,11 +2292,12 @@ class PyOptionTree:
 
         # Those labeled with OTTypeInfo are primitive types;
 
-        notname = OTSearchFunc(lambda s: not OTIsNameChar(s[0:1]), 0)
-        notnum  = OTSearchFunc(lambda s: not OTIsNumberChar(s[0:1]), 0)
+        notname = OTSearchFunc(lambda s, pos: not OTIsNameChar(s[pos:pos+1]), 0)
+        notnum  = OTSearchFunc(lambda s, pos: not OTIsNumberChar(s[pos:pos+1]), 0)
         
+        self.__typedispatch = {}
         self.__types = [
-            OTTypeInfo(lambda sh: sh[0].isdigit(), notnum, self.__Function_Number, 'Numeric',matchlength=0),
+            OTTypeInfo(lambda s, pos, end: s[pos].isdigit(), notnum, self.__Function_Number, 'Numeric',matchlength=0),
             OTTypeInfo('[',     ']',     self.__Function_List,     'List'),
             OTTypeInfo('(',     ')',     self.__Function_Tuple,    'Tuple'),
             OTTypeInfo('{',     '}',     self.__Function_Branch,   'Branch'),
@@ -1426,6 +2320,7 @@ class PyOptionTree:
             OTFuncInfo('sum',            self.__Function_CatList,  'Concatenation (+) List'),
             OTFuncInfo('rep',            self.__Function_Rep,      'String Replacement Function'),
             OTFuncInfo('optfile',        self.__Function_OptFile,  'Option Tree File', True),
+            OTFuncInfo('lazyoptfile',    self.__Function_LazyOptFile, 'Option Tree File (read on first use)', True),
             OTFuncInfo('copy',           self.__Function_Copy,     'Copy Item', True), 
             OTFuncInfo('reref',          self.__Function_ReRef,    'Copy Item (rereferenced)', True),
             OTFuncInfo('range',          self.__Function_Range,    'Creates sequence list (similar to range() in python)'),
@@ -1453,11 +2348,67 @@ class PyOptionTree:
             OTTypeInfo('false', '',      self.__Function_FalseBool,'Bool Value'),
             OTTypeInfo('No',    '',      self.__Function_FalseBool,'Bool Value'),
             OTTypeInfo('no',    '',      self.__Function_FalseBool,'Bool Value'),
-            OTTypeInfo(lambda sh: sh[0].isalpha(), notname, self.__Function_SoftLink, 'SoftLink',matchlength=0)]
+            OTTypeInfo(lambda s, pos, end: s[pos].isalpha(), notname, self.__Function_SoftLink, 'SoftLink',matchlength=0)]
     
     ######################################################################
     #   Helper functions for setting things
             
+    def __FlattenMapping(self, mapping, prefix, pairs):
+        if hasattr(mapping, 'items'):
+            mapping = mapping.items()
+
+        for k, v in mapping:
+            if isinstance(v, dict):
+                if len(v) == 0:
+                    pairs.append((prefix + [k], OPTTREE_CREATEBRANCH))
+                else:
+                    self.__FlattenMapping(v, prefix + [k], pairs)
+            else:
+                pairs.append((prefix + [k], v))
+
+    def __SetMany(self, pairs):
+        # Sets each (name, value) pair like set() does, but remembers
+        # the branches already reached so each is only walked once.
+        # name may be a list of names from an enclosing mapping; a value
+        # of OPTTREE_CREATEBRANCH only creates the branch.
+
+        branches = {(): self}
+
+        def branch(path):
+            b = branches.get(path)
+            if b is None:
+                b = branches[path] = branch(path[:-1]).__GetOrCreateBranch([path[-1]])
+            return b
+
+        for name, value in pairs:
+            if type(name) == list:
+                names = name
+            else:
+                names = [name]
+
+            fullname = '/'.join(names)
+            if len(fullname) == 0 or '' in names:
+                raise PyOptionTreeParseError(self.__LocString(action='Setting Value'), 'Empty name given.')
+
+            try:
+                namelist = []
+                for n in names:
+                    namelist += self.__Name2NameList(n)
+
+                if value is OPTTREE_CREATEBRANCH:
+                    branch(tuple(namelist))
+                    continue
+
+                b = branch(tuple(namelist[:-1]))
+                if (b.__HasOpt(namelist[-1]) and
+                    isinstance(b.__OptItem(namelist[-1])[0], (PyOptionTree, LinkupBase, OTFunctionEval))):
+                    # Replacing a branch, or a link or function that may
+                    # lead to one; forget the branches found so far
+                    branches = {(): self}
+                b.__SetValue(namelist[-1], value)
+            except PyOptionTreeException, ote:
+                raise ote.PrependMessage(self.__LocString(action='Setting key \"' + fullname + '\"'))
+
     def __SetValue(self, name, value, rank=None):
         # This assumes name is local; use __GetOrCreateBranch to reach this point
         if type(name) == tuple and len(name) == 1:
@@ -1470,23 +2421,202 @@ class PyOptionTree:
             #self.__dbprint("SETVALUE>  Getting tuple value")
             v = self.__GetValue([name[0]], default = OPTTREE_NONNONEXISTANTQUERY, required = False, readyvalue=False)
             #self.__dbprint("SETVALUE>  Creating Seq Rep")
-            if v == OPTTREE_NONNONEXISTANTQUERY:
+            if v is OPTTREE_NONNONEXISTANTQUERY:
                 v = []
-            self.__SetValue(name[:-1],
-                            OTFunctionEval(branch=self,
-                                           funcinfo=OTFuncInfo('seqrep',self.__Function_SeqRep,'Sequence Element Replacer'),
-                                           loc = None,
-                                           rawvaluelist = [v, (name[-1], value)],
-                                           name=self.__NameList2Name(name[:-1])))
+            self.__SetValue(name[:-1], self.__SeqRepOverlay(v, name[-1], value, name[:-1]))
         else:
             if name == './': return
             self.__VerifyName(name)
 
+            if self.__pending is not None:
+                self.__LoadPending()     # its options come before this one
+            self.__PrepareWrite()
             if rank == None:
                 rank = self.__setvarrank
                 self.__setvarrank += 1
-            self.__opts[name] = (value, rank)
+            self.__InvalidateCached(name)
+            if not self.__HasOpt(name):
+                self.__InvalidateCached(OPTTREE_STRUCTUREKEY)
+            self.__SetOpt(name, (value, rank))
         return value
+
+    def __SeqRepOverlay(self, v, index, value, name):
+        # Returns v with v[index] replaced by value.  If v is already a
+        # replacement, the new one is added to its list (or takes the
+        # place of one to the same index) instead of wrapping it, so
+        # many element assignments are applied in one pass rather than
+        # as a chain of seqreps each copying the whole sequence.
+
+        if not (isinstance(v, OTFunctionEval) and v.funcinfo.name == 'seqrep' and v.branch is self):
+            return OTFunctionEval(branch=self,
+                                  funcinfo=OTFuncInfo('seqrep',self.__Function_SeqRep,'Sequence Element Replacer'),
+                                  loc = None,
+                                  rawvaluelist = [v, (index, value)],
+                                  name=self.__NameList2Name(name))
+
+        # Replacements are only dropped when all of them are to plain
+        # non-negative indices; those name the same element however
+        # long the list has grown.  A negative index or an expression
+        # depends on what came before, so then they're all replayed.
+        replist = v.rawvaluelist[1:]
+        if type(index) == int and index >= 0 and not [r for r in replist
+                                                      if type(r) != tuple or len(r) != 2
+                                                      or type(r[0]) != int or r[0] < 0]:
+            replist = [r for r in replist if r[0] != index]
+
+        # The old value may be shared (with copies, or the cache), so
+        # it's never changed in place.
+        return OTFunctionEval(branch=self, funcinfo=v.funcinfo, loc=v.loc,
+                              rawvaluelist=v.rawvaluelist[:1] + replist + [(index, value)],
+                              name=v.name)
+
+    def __StoreCached(self, name, v, deps, version):
+        OTcachelock.acquire()
+        try:
+            if version != OTcacheversion[0]:
+                return   # something was set while resolving; v may be stale
+
+            self.__cache[name] = (OTCopyValue(v), deps)
+            for (tid, key), tree in deps.items():
+                tree.__dependents.setdefault(key, {})[(id(self), name)] = self
+        finally:
+            OTcachelock.release()
+
+    ######################################################################
+    # Copy on write.  A copy shares the __opts of the tree it was made
+    # from, which is then frozen; each option is copied in (as
+    # __CopyIn would) the first time the copy uses it.  Branches are
+    # copied in as copies sharing the original branch's options, so
+    # only the branches on the paths actually used get copied.
+
+    def __ShareOpts(self, src, rerefsl, depth, renumber):
+        if src.__pending is not None:
+            src.__LoadPending()
+
+        if src.__cowsource is not None:
+            src.__OptItems()        # a copy of a copy; copy its options in first
+
+        self.__opts = src.__opts
+        self.__cowopts = {}
+        self.__cowsource = src
+        self.__cowargs = (rerefsl, depth)
+        if renumber:
+            self.__setvarrank = src.__setvarrank
+
+        src.__optsshared = True
+        if len(src.__cowcopies) % 64 == 63:
+            src.__cowcopies = [r for r in src.__cowcopies
+                               if r() is not None and r().__cowsource is src]
+        src.__cowcopies.append(weakref.ref(self))
+
+    def __HasOpt(self, k):
+        if self.__pending is not None:
+            self.__LoadPending()
+
+        return k in self.__opts or (self.__cowsource is not None and k in self.__cowopts)
+
+    def __OptItem(self, k):
+        # Returns (value, rank), or None if k isn't one of our options
+        if self.__pending is not None:
+            self.__LoadPending()
+
+        if self.__cowsource is None:
+            return self.__opts.get(k)
+        elif k in self.__cowopts:
+            return self.__cowopts[k]
+        elif k in self.__opts:
+            return self.__CopyOptIn(k)
+        else:
+            return None
+
+    def __OptKeys(self):
+        if self.__pending is not None:
+            self.__LoadPending()
+
+        if self.__cowsource is None:
+            return self.__opts.keys()
+        else:
+            return self.__opts.keys() + [k for k in self.__cowopts.keys() if k not in self.__opts]
+
+    def __OptItems(self):
+        if self.__pending is not None:
+            self.__LoadPending()
+
+        if self.__cowsource is not None:
+            for k in self.__opts.keys():
+                if k not in self.__cowopts:
+                    self.__CopyOptIn(k)
+
+            # Everything has been copied in, so we're done sharing
+            self.__opts = self.__cowopts
+            self.__cowopts = None
+            self.__cowsource = None
+            self.__cowargs = None
+
+        return self.__opts.items()
+
+    def __SetOpt(self, k, vr):
+        if self.__pending is not None:
+            self.__LoadPending()
+
+        if self.__cowsource is not None:
+            self.__cowopts[k] = vr
+        else:
+            if self.__optsshared:
+                self.__opts = dict(self.__opts)
+                self.__optsshared = False
+            self.__opts[k] = vr
+
+    def __CopyOptIn(self, k):
+        v, r = self.__opts[k]
+        rerefsl, depth = self.__cowargs
+
+        if isinstance(v, PyOptionTree):
+            b = self.__NewBranch(k)
+            b.__sources = self.__sources
+            b.__ShareOpts(v, rerefsl, depth+1, True)
+            v = b
+        else:
+            v = self.__CopyIn(self.__cowsource, v, k, rerefsl, depth)
+
+        self.__cowopts[k] = (v, r)
+        return (v, r)
+
+    def __PrepareWrite(self):
+        # A branch shared by a copy of a tree above us is about to
+        # change, so the copies must copy in the branch on the path down
+        # to us first.  Going from the root down catches the copies
+        # made along the way.
+        path = []
+        t = self
+        while t is not None:
+            path.append(t)
+            t = t.__parent
+
+        for t, child in reversed(zip(path[1:], path[:-1])):
+            if len(t.__cowcopies) == 0:
+                continue
+
+            k = child.__treename
+            live = []
+            for r in t.__cowcopies:
+                c = r()
+                if c is not None and c.__cowsource is t:
+                    if k in c.__opts and k not in c.__cowopts:
+                        c.__CopyOptIn(k)
+                    live.append(r)
+            t.__cowcopies = live
+
+    def __InvalidateCached(self, key):
+        OTcachelock.acquire()
+        try:
+            OTcacheversion[0] += 1
+            dependents = self.__dependents.pop(key, None)
+            if dependents is not None:
+                for (tid, name), tree in dependents.items():
+                    tree.__cache.pop(name, None)
+        finally:
+            OTcachelock.release()
                  
     def __GetOrCreateBranch(self, namelist):
         # this function can be pretty confusing. read the comments carefully.
@@ -1522,7 +2652,7 @@ class PyOptionTree:
             # of this tree, then we will call this function again on that branch with the remaining elements of namelist.
             # if it does not exist, we will create it
 
-            if namelist[0] not in self.__opts:
+            if not self.__HasOpt(namelist[0]):
                 # the branch does not exist, so we need to create it.
                 # this is the tricky part, there was a bug in this piece that affected config files with deeply nested keys using the /root/sub/key syntax.
                 # first, we create a new branch. we do this by using the __NewBranch method of ourselves. this will
@@ -1653,6 +2783,7 @@ class PyOptionTree:
             else:
                 return v
         else:
+            OTtracker.record(self, namekey)
             if namekey == '..':
                 if self.__parent == None:
                     if required:
@@ -1662,11 +2793,11 @@ class PyOptionTree:
                         return default
                 else:
                     return self.__parent
-            elif namekey in self.__opts:
+            elif self.__HasOpt(namekey):
                 if readyvalue:
-                    return self.__ReadyValue(self.__opts[namekey][0], default, required, vardict, recursionsleft)
+                    return self.__ReadyValue(self.__OptItem(namekey)[0], default, required, vardict, recursionsleft)
                 else:
-                    return self.__opts[namekey][0]
+                    return self.__OptItem(namekey)[0]
             else:
                 if required:
                     raise PyOptionTreeRetrievalError(self.__LocString(action='Retrieving Value'),
@@ -1685,7 +2816,7 @@ class PyOptionTree:
             try:
                 return [self.__ReadyValue(val, default, required, vardict, recursionsleft) for val in v]
             except PyOptionTreeException, ote:
-                if required:
+                if required or isinstance(ote, PyOptionTreeIncludeError):
                     raise ote.PrependMessage(self.__LocString(action='Preparing List'))
                 else:
                     return default
@@ -1693,7 +2824,7 @@ class PyOptionTree:
             try:
                 return tuple([self.__ReadyValue(val, default, required, vardict, recursionsleft) for val in v])
             except PyOptionTreeException, ote:
-                if required:
+                if required or isinstance(ote, PyOptionTreeIncludeError):
                     raise ote.PrependMessage(self.__LocString(action='Preparing Tuple'))
                 else:
                     return default
@@ -1703,7 +2834,7 @@ class PyOptionTree:
                               self.__ReadyValue(val, default, required, vardict, recursionsleft))
                              for key, val in v.items()])
             except PyOptionTreeException, ote:
-                if required:
+                if required or isinstance(ote, PyOptionTreeIncludeError):
                     raise ote.PrependMessage(self.__LocString(action='Preparing Dictionary'))
                 else:
                     return default
@@ -1711,13 +2842,9 @@ class PyOptionTree:
             return self.__OriginalString(v)
         elif isinstance(v, OTSoftLink):
             try:
-                if required:
-                    return self.get(v.string, vardict=vardict, recursionsleft=recursionsleft-1)
-                else:
-                    return self.get(v.string, default, vardict=vardict, recursionsleft=recursionsleft-1)
-
+                return self.__FollowSoftLink(v, default, required, vardict, recursionsleft)
             except PyOptionTreeException, ote:
-                if required:
+                if required or isinstance(ote, PyOptionTreeIncludeError):
                     raise ote.PrependMessage(self.__LocString(v.loc, 'Resolving SoftLink to \"' + v.string + '\"',
                                                               v.origsource))
                 else:
@@ -1726,7 +2853,7 @@ class PyOptionTree:
             try:
                 return self.__EvaluateStatement(v, vardict, recursionsleft)
             except PyOptionTreeException, ote:
-                if required:
+                if required or isinstance(ote, PyOptionTreeIncludeError):
                     raise ote.PrependMessage(self.__LocString(v.loc, 'Evaluating exec statement', v.origsource))
                 else:
                     return default
@@ -1741,9 +2868,134 @@ class PyOptionTree:
             return v
         
 
+    def __FollowSoftLink(self, v, default, required, vardict, recursionsleft):
+        # Chains of softlinks are followed once and the key at the end
+        # is cached (see __SoftLinkTarget), so later lookups go
+        # straight to it.  Anything unusual is resolved as before.
+
+        if len(vardict) == 0:
+            target = self.__SoftLinkTarget(v, recursionsleft)
+
+            if target is not None:
+                tree, key = target
+                try:
+                    if required:
+                        return tree.get(key, recursionsleft=recursionsleft-1)
+                    else:
+                        return tree.get(key, default, recursionsleft=recursionsleft-1)
+                except PyOptionTreeException:
+                    pass    # redo it below so the error says where the link went wrong
+
+        if required:
+            return self.get(v.string, vardict=vardict, recursionsleft=recursionsleft-1)
+        else:
+            return self.get(v.string, default, vardict=vardict, recursionsleft=recursionsleft-1)
+
+    def __SoftLinkTarget(self, v, recursionsleft):
+        # Returns (tree, key) of the option softlink v ends up at, or
+        # None if it can't be worked out without resolving values.  The
+        # answer is cached, depending on every key passed through on
+        # the way, so setting any of them drops it.  A chain that loops
+        # back on itself raises an error naming the links in the loop.
+
+        entry = self.__cache.get(v)
+        if entry is not None:
+            OTtracker.extend(entry[1])
+            return entry[0]
+
+        version = OTcacheversion[0]
+        frame = OTtracker.push()
+        try:
+            target = None
+            tree, link = self, v
+            chain = []
+
+            while True:
+                t = tree.__LocateLinkKey(link.string, recursionsleft)
+                if t is None:
+                    break
+
+                target = t
+                name = t[0].__NameList2Name(t[0].pathFromRoot() + [t[1]])
+                if name in chain:
+                    raise PyOptionTreeRetrievalError(self.__LocString(action = 'Following SoftLinks'),
+                                                     'Circular softlinks: ' +
+                                                     ' -> '.join(['"' + n + '"' for n in chain[chain.index(name):] + [name]]))
+                chain.append(name)
+
+                tree, link = t[0], t[0].__OptItem(t[1])[0]
+                if not isinstance(link, OTSoftLink):
+                    break
+        finally:
+            OTtracker.pop()
+
+        if target is not None and not frame.volatile:
+            self.__StoreCached(v, target, frame.deps, version)
+
+        return target
+
+    def __LocateLinkKey(self, name, recursionsleft):
+        # The (tree, key) name refers to, if it's a plain key in a tree
+
+        namelist = self.__Name2NameList(name)
+        if len(namelist) == 0 or type(namelist[-1]) != str or namelist[-1] in ['/', '..']:
+            return None
+
+        tree = self
+        try:
+            for n in namelist[:-1]:
+                if n == '/':
+                    tree = tree.root()
+                else:
+                    tree = tree.__RetrieveLocalValue(n, None, False, {}, recursionsleft)
+                if not isinstance(tree, PyOptionTree):
+                    return None
+        except PyOptionTreeIncludeError:
+            raise
+        except PyOptionTreeException:
+            return None
+
+        OTtracker.record(tree, namelist[-1])
+        if not tree.__HasOpt(namelist[-1]):
+            return None
+
+        return (tree, namelist[-1])
+
     def __EvaluateStatement(self, evs, vardict, recursionsleft=OPTTREE_MAXRECURSIONDEPTH):
         # This evaluates the statement given...
 
+        code = OTEvalCode(evs)
+
+        # Pure statements are cached like get() values, keyed on the statement
+        pure = evs.pure and len(vardict) == 0
+        if pure:
+            entry = self.__cache.get(evs)
+            if entry is not None:
+                OTtracker.extend(entry[1])
+                return OTCopyValue(entry[0])
+        else:
+            OTtracker.markVolatile()   # the code may depend on anything, e.g. time or files
+
+        stats = self.__EvalStats(evs)
+
+        version = OTcacheversion[0]
+        frame = OTtracker.push()
+        if stats is not None:
+            btime = time.time()
+        try:
+            v = self.__RunStatement(evs, code, vardict, recursionsleft)
+        finally:
+            OTtracker.pop()
+            if stats is not None:
+                stats[0] += 1
+                stats[1] += time.time() - btime
+
+        if pure and not frame.volatile:
+            self.__StoreCached(evs, v, frame.deps, version)
+
+        return v
+
+    def __RunStatement(self, evs, code, vardict, recursionsleft):
         # First go through and retrieve the variables in the original vardict
 
         rvars = vardict.copy()
@@ -1758,24 +3010,41 @@ class PyOptionTree:
 
         try:
             #self.__dbprint('EVAL> ' + str(evs.string) + ' >< Locals = ' + str(rvars))
-            return eval(evs.string, globals(), rvars)
+            if code is None:
+                return eval(evs.string, globals(), rvars)
+            return eval(code, globals(), rvars)
         except Exception, e:
             errstring = self.__LocString(evs.loc, action = 'Evaluating Expression', source =evs.origsource)
             raise PyOptionTreeEvaluationError(errstring, str(e))
 
+    def __EvalStats(self, evs):
+        # [evaluations, seconds] for evs, kept at the root, or None if
+        # we aren't profiling
+        evalstats = self.root().__evalstats
+        if evalstats is None:
+            return None
+
+        if evs.loc != None and len(evs.loc) != 0:
+            key = (evs.origsource, evs.loc[0].line, evs.loc[0].column)
+        else:
+            key = (evs.origsource, 0, 0)
+        key += (getattr(evs, 'origstring', evs.string),)
+
+        return evalstats.setdefault(key, [0, 0.])
+
     def __FindPairs(self, s, cilist, p1, p2):
 
         ret = []
+        scanner = OTScanner(s, self.__nestchars)
 
         p = 0
         while True:
-            np = s[p:].find(p1)
+            np = s.find(p1, p)
             if np == -1:
                 break
             
-            np += p
             startp = np + len(p1)
-            endp = self.__NextInstance(startp, p2, len(s), s)
+            endp = self.__NextInstance(startp, p2, len(s), scanner)
 
             if endp == -1:
                 if cilist != None:
@@ -1792,27 +3061,40 @@ class PyOptionTree:
 
     def __EvaluateStoredFunction(self, sf, default=None, required=True, vardict={}, recursionsleft=OPTTREE_MAXRECURSIONDEPTH):
 
-        funcargs = inspect.getargspec(sf.funcinfo.getvalue)[0]
+        call = sf.funcinfo.call
+        if call is None:
+            call = sf.funcinfo.call = self.__CallPlan(sf.funcinfo)
+
+        return self.__ReadyValue(call(sf, default, required, vardict, recursionsleft))
+
+    def __CallPlan(self, funcinfo):
+        # The callable that evaluates a stored function of this type,
+        # built the first time one is evaluated (like the code of an
+        # eval statement) so each evaluation is a direct call.
+
+        getvalue = funcinfo.getvalue
+
+        if funcinfo.isuserfunc:
+            def call(sf, default, required, vardict, recursionsleft):
+                OTtracker.markVolatile()   # we can't know what user functions depend on
+                return getvalue(*sf.branch.__ReadyValue(sf.rawvaluelist, recursionsleft = recursionsleft))
+            return call
+
+        # A lambda calling the function with just the arguments it asks
+        # for, fetched in the order of OTFUNCTIONCALLARGS.
+        # readyfunc depends on the call's arguments, so it is still made
+        # on each call, but only for functions that ask for it.
+        args = []
+        for a in funcinfo.callargs:
+            if a == 'valuelist':
+                args.append('valuelist = ready(sf.branch, sf.rawvaluelist, recursionsleft = recursionsleft)')
+            elif a == 'readyfunc':
+                args.append('readyfunc = lambda v: ready(sf.branch, v, default, required, vardict, recursionsleft)')
+            else:
+                args.append('%s = sf.%s' % (a, a))
 
-        if sf.funcinfo.isuserfunc:
-            return self.__ReadyValue(sf.funcinfo.getvalue(*sf.branch.__ReadyValue(sf.rawvaluelist, recursionsleft = recursionsleft)))
-        else:
-            kwargs = {}
-
-            if 'branch' in funcargs:
-                kwargs['branch'] = sf.branch
-            if 'loc' in funcargs:
-                kwargs['loc'] = sf.loc
-            if 'rawvaluelist' in funcargs:
-                kwargs['rawvaluelist'] = sf.rawvaluelist
-            if 'valuelist' in funcargs:
-                kwargs['valuelist'] = sf.branch.__ReadyValue(sf.rawvaluelist, recursionsleft = recursionsleft)
-            if 'name' in funcargs:
-                kwargs['name'] = sf.name
-            if 'readyfunc' in funcargs:
-                kwargs['readyfunc'] = lambda v: sf.branch.__ReadyValue(v, default, required, vardict, recursionsleft)
-
-            return self.__ReadyValue(sf.funcinfo.getvalue(**kwargs))
+        return eval('lambda sf, default, required, vardict, recursionsleft: getvalue(' + ', '.join(args) + ')',
+                    {'getvalue' : getvalue, 'ready' : PyOptionTree.__ReadyValue})
     
     ######################################################################
     #  Tools for name bookkeeping
@@ -1843,12 +3125,12 @@ class PyOptionTree:
             namekey = [name[:indexstart]]
 
             while True:
-                newpos = name[pos:].find('[')
+                newpos = name.find('[', pos)
                 
                 if newpos == -1:
                     break
                 
-                newpos += pos + 1
+                newpos += 1
 
                 endpos = self.__NextInstance(newpos, ']', len(name), name)
                 
@@ -1923,12 +3205,14 @@ class PyOptionTree:
         """
         
         self.__RecordSource(source)
+        self.__RecordParse(self, 'src', source)
         
         #self.__dbprint('__PARSECHARLIST: STARTINGSTRING = $' + self.__TruncateErrorString(chstr) + '$')
 
         # Add the current parsing information to the stack
         self.__chstr += [chstr]
         self.__cilist += [cilist]
+        self.__scanners += [OTScanner(chstr, self.__nestchars)]
 
         # Run with them
         (rl, rr) = self.__ShrinkRange( (0, len(self.__ChS())) )
@@ -1970,10 +3254,13 @@ class PyOptionTree:
                 #self.__dbprint("IN PARSECHARLIST: self.__ChS() = " + self.__TruncateErrorString(self.__ChS()))
                 destbranch.__chstr += [self.__ChS()]
                 destbranch.__cilist += [self.__CiL()]
+                destbranch.__scanners += [self.__Scanner()]
                 (value, endpos) = destbranch.__ParseValue(valuer, varname)
                 destbranch.__chstr.pop()
                 destbranch.__cilist.pop()
+                destbranch.__scanners.pop()
                 destbranch.__SetValue(varname, value)
+                self.__RecordParse(destbranch, 'set', varname, value)
             except PyOptionTreeException, ote:
                 raise ote.PrependMessage(self.__LocString(rl, action = 'Parsing Token ' + self.__TruncateErrorString(name)))
             
@@ -1982,6 +3269,7 @@ class PyOptionTree:
         # Clean up unneeded memory as we use a lot of it
         self.__chstr.pop()
         self.__cilist.pop()
+        self.__scanners.pop()
 
     def __ParseValue(self, r, name):
         # Resolve the item
@@ -1993,18 +3281,19 @@ class PyOptionTree:
         if r[0] >= r[1]:
             return (None, r[1])
 
-        for t in self.__TypeList():
-            if t.Matches(self.__ChS()[r[0]:r[1]]):
+        for t in self.__TypesFor(self.__ChS()[r[0]]):
+            if t.Matches(self.__ChS(), r[0], r[1]):
                 rl = r[0] + t.matchlength
 
                 endpos = self.__NextInstance(rl, t.endmarker, r[1])
 
-                erroractionstr = self.__LocString(r, action = 'Parsing $' + self.__TruncateErrorString(self.__ChS()[rl:]) + '$ As ' + t.description)
+                # Only needed for errors, so only built for them
+                erroraction = lambda: self.__LocString(r, action = 'Parsing $' + self.__TruncatedErrorString( (rl, len(self.__ChS())) ) + '$ As ' + t.description)
 
                 #self.__dbprint('PARSEVALUE> Parsing $' + self.__TruncateErrorString(self.__ChS()[rl:]) + '$ As ' + t.description)
                 
                 if endpos == r[1] and type(t.endmarker) == str and len(t.endmarker) != 0: 
-                    raise PyOptionTreeParseError(self.__LocString(action = erroractionstr),
+                    raise PyOptionTreeParseError(self.__LocString(action = erroraction()),
                                                  'Terminating \'' + t.endmarker + '\' not found.')
 
                 # Get the value
@@ -2016,6 +3305,7 @@ class PyOptionTree:
                                              rawvaluelist = rvl, name=name)
 
                         if t.evalimmediately:
+                            self.__RecordImmediate(t, rvl)
                             v = self.__ReadyValue(otf)
                         else:
                             v = otf
@@ -2026,14 +3316,14 @@ class PyOptionTree:
                             v = t.getvalue(self, (rl, endpos))
                     
                 except PyOptionTreeException, ote:
-                    raise ote.PrependMessage(self.__LocString( (rl, endpos), action = erroractionstr))
+                    raise ote.PrependMessage(self.__LocString( (rl, endpos), action = erroraction()))
 
                 return (v, endpos + self.__Len(t.endmarker))
 
         # Nothing matches, so...
         raise PyOptionTreeParseError(self.__LocString(r, action = 'Parsing Value'),
                                    'Type not recognized: \"'
-                                   + self.__TruncateErrorString(self.__ChS()[r[0]:]) + '\"')
+                                   + self.__TruncatedErrorString( (r[0], len(self.__ChS())) ) + '\"')
 
     ######################################################################
     # Parsing the various things 
@@ -2124,11 +3414,13 @@ class PyOptionTree:
         
 
         #self.__dbprint('OT_FUNCTION_EVAL> sl = ' + ''.join(sl))
-        return OTEvalStatement(self.__OriginalString(''.join(sl)),
-                               loc=branch.__MakeLocTag( (rl, rr) ),
-                               origsource=branch.__CurSource(),
-                               sldict=vdict,
-                               origstring=self.__OriginalString(estr))
+        evs = OTEvalStatement(self.__OriginalString(''.join(sl)),
+                              loc=branch.__MakeLocTag( (rl, rr) ),
+                              origsource=branch.__CurSource(),
+                              sldict=vdict,
+                              origstring=self.__OriginalString(estr))
+        OTEvalCode(evs)     # compile it now, not every time it's evaluated
+        return evs
 
     def __Function_None(self, branch, r, name):
         return None
@@ -2184,31 +3476,105 @@ class PyOptionTree:
     ####################
     # Option File
     def __Function_OptFile(self, branch, valuelist, name):
+        return self.__IncludeOptFiles(branch, valuelist, name, False)
+
+    def __Function_LazyOptFile(self, branch, valuelist, name):
+        return self.__IncludeOptFiles(branch, valuelist, name, True)
+
+    def __IncludeOptFiles(self, branch, valuelist, name, lazy):
         ot = branch.__GetOrCreateBranch(name)
 
-        errlist = []
-        
         files = [(t, (t,t))[type(t) != tuple] for t in valuelist]
         for t in files:
             if len(t) != 2 or type(t[0]) != str or type(t[1]) != str:
                 raise PyOptionTreeParseError(branch.__LocString(action = "Importing Option File"),
                                              "Expected 2-tuple (file, name) or string, got \'" + str(t) +"\'" )
-        
+
+        # Paths are relative to the file being parsed, i.e. the current directory
+        files = [(os.path.abspath(f.strip()), n.strip()) for f, n in files]
+        errstring = branch.__LocString(action = str(valuelist))
+
+        # lazyoptfile() files are read the first time anything in the
+        # branch is used.  Missing files are read now so the error
+        # comes up at parse time, and the parse cache needs to see
+        # what's included.
+        if (lazy and self.root().__parserecord == None
+            and len([f for f, n in files if not os.path.isfile(f)]) == 0):
+
+            ot.__CheckOptionFiles(files, errstring)
+
+            if ot.__pending is not None and ot.__pending[0] == 'files':
+                ot.__pending[1].extend(files)
+            else:
+                ot.__pending = ('files', files, errstring)
+        else:
+            ot.__AddOptionFiles(files, errstring)
+
+        return ot
+
+    def __CheckOptionFiles(self, files, errstring):
+        # Catches the syntax errors that can be found without parsing:
+        # comments, strings and brackets that are never closed.
+        errlist = []
+
         for f, n in files:
-            f, n = f.strip(), n.strip()
-            
             try:
-                ot.addOptionsFile(f, sourcename=n)
+                fh = open(f, 'r')
+                try:
+                    content = fh.read()
+                finally:
+                    fh.close()
+
+                chstr, cilist = self.__PrepareString(content.replace('\n', ' \n'))
+
+                scanner = OTScanner(chstr, self.__nestchars)
+                m = self.__nestopen.search(chstr)
+                while m != None:
+                    nc = scanner.Opening(m.start())
+                    c = scanner.Closing(m.start(), nc)
+                    if c == -1:
+                        raise PyOptionTreeParseError(self.__LocString(cilist[m.start():], action = 'Checking Syntax', source = n),
+                                                     '\'' + nc[0] + '\' missing end tag \'' + nc[1] + '\'')
+                    m = self.__nestopen.search(chstr, c + len(nc[1]))
+
             except IOError, ioe:
                 errlist += ['Error Opening File \'' + n + '\': ' + str(ioe) + '\n']
             except PyOptionTreeException, ote:
                 errlist += [ote.message]
-        
+
         if len(errlist) > 0:
-            raise PyOptionTreeParseError(branch.__LocString(action = str(valuelist)),
-                                       ''.join(errlist))
+            raise PyOptionTreeParseError(errstring, ''.join(errlist))
 
-        return ot
+    def __AddOptionFiles(self, files, errstring):
+        errlist = []
+
+        for f, n in files:
+            try:
+                self.addOptionsFile(f, sourcename=n)
+            except IOError, ioe:
+                errlist += ['Error Opening File \'' + n + '\': ' + str(ioe) + '\n']
+            except PyOptionTreeException, ote:
+                errlist += [ote.message]
+
+        if len(errlist) > 0:
+            raise PyOptionTreeParseError(errstring, ''.join(errlist))
+
+    def __LoadPending(self):
+        # Reads the files lazyoptfile() put off (see
+        # __IncludeOptFiles).  If that fails, the error is raised
+        # again every time the branch is used, as it would have
+        # stopped the parse, and get() doesn't swallow it.
+        pending = self.__pending
+
+        if pending[0] == 'error':
+            raise PyOptionTreeIncludeError(pending[1], pending[2])
+
+        self.__pending = None
+        try:
+            self.__AddOptionFiles(pending[1], pending[2])
+        except PyOptionTreeParseError, ote:
+            self.__pending = ('error', pending[2], ote.message[len(pending[2]) + 2:])
+            raise PyOptionTreeIncludeError(pending[2], self.__pending[2])
 
 
     ######################################################################
@@ -2244,8 +3610,12 @@ class PyOptionTree:
 
             ot.__sources = self.__sources            
             
-            for k, e, n in sorted([(k,e,n) for k, (e,n) in v.__opts.items()], key=itemgetter(2)):
-                ot.__SetValue(k, ot.__CopyIn(v, e, k, rerefsl, depth+1))
+            if len(ot.__OptKeys()) == 0:
+                # Nothing to merge with, so share v's options until they are needed
+                ot.__ShareOpts(v, rerefsl, depth+1, True)
+            else:
+                for k, e, n in sorted([(k,e,n) for k, (e,n) in v.__OptItems()], key=itemgetter(2)):
+                    ot.__SetValue(k, ot.__CopyIn(v, e, k, rerefsl, depth+1))
             return ot
         elif isinstance(v, OTSoftLink):
             # If v points outside the tree, add prefix if reref is true,
@@ -2332,7 +3702,7 @@ class PyOptionTree:
         vl = valuelist[0]
         replist = valuelist[1:]
 
-        if vl == OPTTREE_NONNONEXISTANTQUERY:
+        if type(vl) == str and vl == OPTTREE_NONNONEXISTANTQUERY:
             vl = []
 
         if type(vl) == list or type(vl) == tuple:
@@ -2419,6 +3789,7 @@ class PyOptionTree:
             return self.__Function_WrapListEval(lambda v: self.__Function_Unpickle(branch, v, loc), valuelist)
         
         if type(valuelist) == str:
+            OTtracker.markVolatile()   # the file may change
             try:
                 return cPickle.load(valuelist)
             except cPickle.PicklingError, pe:
@@ -2463,6 +3834,8 @@ class PyOptionTree:
 
         # Okay, we've checked everything, now just expand out
 
+        OTtracker.markVolatile()   # new branches are created each time; don't hand out shared ones
+
         def ensureList(l):
             if type(l) == list:
                 return l
@@ -2545,9 +3918,9 @@ class PyOptionTree:
     # Bookkeeping functions
 
     def __NewEscapedCharTag(self, ch):
-        tag =  OTRandTag() +'_'
-        self.__escaped_chars[tag] = ch;
-        return self.__escaped_tag_prefix + tag
+        # The tag holds the character itself, so there's nothing to look
+        # up; ch is a byte, as __PrepareString encodes unicode input
+        return self.__escaped_tag_prefix + '%02x' % ord(ch)
 
     def __OriginalString(self, a):
         # Translates a string back into its original form
@@ -2557,16 +3930,10 @@ class PyOptionTree:
         elif type(a) == tuple:
             s = self.__ChS()[a[0]:a[1]]
             
-        sl = s.split(self.__escaped_tag_prefix)
-        rs = sl[0]
+        if s.find(self.__escaped_tag_prefix) != -1:
+            s = self.__escapedtag.sub(lambda m: chr(int(m.group(1), 16)), s)
 
-        for ss in sl[1:]:
-            if ss[:OPTTREE_RANDALPHALENGTH+1] in self.__escaped_chars:
-                rs += self.__escaped_chars[ss[:OPTTREE_RANDALPHALENGTH+1] ] + ss[OPTTREE_RANDALPHALENGTH+1:]
-            else:
-                rs += ss
-                    
-        return rs.replace(self.__newlinetag, '\n')
+        return s.replace(self.__newlinetag, '\n')
        
     def __ShrinkRange(self, r, s = None, skipsemicolons=True):
         return (self.__NextNonWSPos(r[0], s, skipsemicolons), self.__FirstNonWSPos(r[1], s))
@@ -2581,7 +3948,7 @@ class PyOptionTree:
                 rl += 1
             elif skipsemicolons and s[rl] == ';':  # We want to skip over the ; on the left, these don't matter
                 rl += 1
-            elif s[rl:].startswith(self.__newlinetag):
+            elif s.startswith(self.__newlinetag, rl):
                 rl += len(self.__newlinetag)
             else:
                 break
@@ -2596,7 +3963,7 @@ class PyOptionTree:
             if s[rr-1].isspace():
                 ##self.__dbprint('Skipping back on $' + s[rr-1] + '$')
                 rr -= 1
-            elif s[:rr].endswith(self.__newlinetag):
+            elif s.endswith(self.__newlinetag, 0, rr):
                 ##self.__dbprint('Skipping back on $' + s[max(0, rr-lnlt):rr] + '$')
                 rr -= len(self.__newlinetag)
             else:
@@ -2604,42 +3971,15 @@ class PyOptionTree:
 
         return rr
 
-    def __NextInstance(self, pos, searchmarker, endpos, st = '', hasimmunity = False):
+    def __NextInstance(self, pos, searchmarker, endpos, st = ''):
         if st == '':
-            st = self.__ChS()
-
-        searchstack = [searchmarker]
-
-        immunity = hasimmunity
-        
-        while pos < endpos:
-            if type(searchstack[-1]) == str and st[pos:].startswith(searchstack[-1]):
-                match = True
-                jumplength = len(searchstack[-1])
-            elif isinstance(searchstack[-1], OTSearchFunc) and searchstack[-1].matchfunc(st[pos:]):
-                match = True
-                jumplength = searchstack[-1].matchlength
-            else:
-                match = False
-
-            if match: 
-                if len(searchstack) == 1:
-                    return pos
+            scanner = self.__Scanner()
+        elif isinstance(st, OTScanner):
+            scanner = st
+        else:
+            scanner = OTScanner(st, self.__nestchars)
 
-                searchstack.pop()
-                immunity = False
-                pos += jumplength
-            else:
-                if not immunity:
-                    for k,r,im in self.__nestchars:
-                        if st[pos:].startswith(k):
-                            searchstack.append(r)
-                            immunity = im
-                            pos += len(k) - 1 
-                            break
-                pos += 1
-            
-        return endpos
+        return scanner.Find(pos, searchmarker, endpos)
 
     def __Len(self, s):
         if type(s) == str:
@@ -2660,7 +4000,7 @@ class PyOptionTree:
             pos = (pos, pos)
             l = self.__CiL()
             endflag = True
-        elif type(pos) == list and len(pos) != 0:
+        elif (type(pos) == list or isinstance(pos, OTLocTable)) and len(pos) != 0:
             l = pos
             pos = (0, len(pos) - 1)
             endflag = False
@@ -2704,6 +4044,8 @@ class PyOptionTree:
         return s + action.strip() 
 
     def __TruncatedErrorString(self, r, length = OPTTREE_TRUNCATEDERRORSTRINGLENGTH):
+        # Only translate as much of the range as can show up in the truncated string
+        r = (r[0], min(r[1], r[0] + (length + 2)*self.__maxtaglength))
         return self.__TruncateErrorString(self.__OriginalString(r), length)
 
     def __TruncateErrorString(self, s, length = OPTTREE_TRUNCATEDERRORSTRINGLENGTH):
@@ -2747,11 +4089,31 @@ class PyOptionTree:
         else:
             return self.__cilist[-1]
 
+    def __Scanner(self):
+        if self.__scanners == []:
+            return self.parent().__Scanner()
+        else:
+            return self.__scanners[-1]
+
     def __TypeList(self):
         if self.__types == None:
             return self.parent().__TypeList()
         else:
             return self.__types
+
+    def __TypesFor(self, ch):
+        # The part of the type table that can match a value starting
+        # with ch, in the same order; worked out the first time each
+        # character is seen.  Types that match on a string only need
+        # to be tried when it starts with ch.
+        if self.__types == None:
+            return self.parent().__TypesFor(ch)
+
+        tl = self.__typedispatch.get(ch)
+        if tl is None:
+            tl = [t for t in self.__types if t.firstchar is None or t.firstchar == ch]
+            self.__typedispatch[ch] = tl
+        return tl
     
     def __dbprint(self, s):
         if OTdebug:
@@ -2772,7 +4134,7 @@ class PyOptionTree:
         else:
             s = ''
         
-        for k,v,n in sorted([(k,v,n) for k, (v,n) in self.__opts.items()], key=itemgetter(2)):
+        for k,v,n in sorted([(k,v,n) for k, (v,n) in self.__OptItems()], key=itemgetter(2)):
             # use basestr to allow indentation in lists or tuples
             basestr = '  '*level + str(k) + ' = '
             (vs, advallinks) = self.__Value2Str(level, v,len(basestr))
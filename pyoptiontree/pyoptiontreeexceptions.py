@@ -46,3 +46,11 @@ class PyOptionTreeEvaluationError(PyOptionTreeException):
     
     def __init__(self, a1, a2):
         self.SetInitMessage(a1,'\n' + a2)
+
+class PyOptionTreeIncludeError(PyOptionTreeParseError):
+    """
+    The exception class raised when a file included with
+    lazyoptfile() fails to load.  Unlike other errors, get() raises
+    it even when a default is given, as a broken file would have
+    stopped the parse had it been read straight away.
+    """
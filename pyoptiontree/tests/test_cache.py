@@ -0,0 +1,107 @@
+import os, shutil, tempfile, unittest
+
+from pyoptiontree import PyOptionTree
+
+
+class ResolutionCacheTests(unittest.TestCase):
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testSet(self):
+        ot = self.parse('a = {b = {c = 1}}')
+        self.assertEqual(ot.get('a/b/c'), 1)
+        ot.set('a/b/c', 2)
+        self.assertEqual(ot.get('a/b/c'), 2)
+        self.assertEqual(ot.get('a/b').get('c'), 2)
+
+    def testSetThroughSoftLinks(self):
+        ot = self.parse('a = 1; b = a; c = b; d = [c, b]; t = {e = ../c}')
+        self.assertEqual(ot.get('c'), 1)
+        self.assertEqual(ot.get('d'), [1, 1])
+        self.assertEqual(ot.get('t/e'), 1)
+        ot.set('a', 2)
+        self.assertEqual(ot.get('c'), 2)
+        self.assertEqual(ot.get('d'), [2, 2])
+        self.assertEqual(ot.get('t/e'), 2)
+
+    def testRetargetedSoftLink(self):
+        ot = self.parse('a = 1; x = 3; b = a; c = b')
+        self.assertEqual(ot.get('c'), 1)
+        ot.addString('b = x')
+        self.assertEqual(ot.get('c'), 3)
+        ot.set('x', 4)
+        self.assertEqual(ot.get('c'), 4)
+        ot.set('a', 5)
+        self.assertEqual(ot.get('c'), 4)
+
+    def testReplacedBranch(self):
+        ot = self.parse('t = {v = 1}; l = t/v')
+        self.assertEqual(ot.get('l'), 1)
+        ot.addString('t = {v = 2}')
+        self.assertEqual(ot.get('l'), 2)
+        self.assertEqual(ot.get('t/v'), 2)
+
+    def testEvalDependencies(self):
+        ot = self.parse('a = 2; b = @(${a} + 1); c = [b, @(${b} * 2)]')
+        self.assertEqual(ot.get('c'), [3, 6])
+        ot.update({'a' : 10})
+        self.assertEqual(ot.get('b'), 11)
+        self.assertEqual(ot.get('c'), [11, 22])
+
+    def testFunctionDependencies(self):
+        ot = self.parse('n = 3; r = range(n); s = cat(r, [n])')
+        self.assertEqual(ot.get('s'), [0, 1, 2, 3])
+        ot.set('n', 2)
+        self.assertEqual(ot.get('r'), [0, 1])
+        self.assertEqual(ot.get('s'), [0, 1, 2])
+
+    def testAddMapping(self):
+        ot = self.parse('a = {b = 1}; c = a/b')
+        self.assertEqual(ot.get('c'), 1)
+        ot.addMapping({'a' : {'b' : 2}})
+        self.assertEqual(ot.get('c'), 2)
+
+    def testAddOptionsFile(self):
+        d = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(d, 'more.opt')
+            f = open(fn, 'w')
+            f.write('a = 5\n')
+            f.close()
+
+            ot = self.parse('a = 1; b = a')
+            self.assertEqual(ot.get('b'), 1)
+            ot.addOptionsFile(fn)
+            self.assertEqual(ot.get('b'), 5)
+        finally:
+            shutil.rmtree(d)
+
+    def testOtherKeysStayCached(self):
+        ot = self.parse('a = 1; b = 2; c = @(${a} + 1)')
+        ot.profileEvals()
+        self.assertEqual(ot.get('c'), 2)
+        ot.set('b', 3)
+        self.assertEqual(ot.get('c'), 2)
+        self.assertEqual(ot.evalProfile()[0][4], 1)
+        ot.set('a', 3)
+        self.assertEqual(ot.get('c'), 4)
+        self.assertEqual(ot.evalProfile()[0][4], 2)
+
+    def testReturnedValuesAreCopies(self):
+        ot = self.parse('l = [1, 2]; d = dict([("a", 1)])')
+        ot.get('l').append(3)
+        ot.get('d')['b'] = 2
+        self.assertEqual(ot.get('l'), [1, 2])
+        self.assertEqual(ot.get('d'), {'a' : 1})
+
+    def testVarDictNotCached(self):
+        ot = self.parse('b = @(x + 1)')
+        self.assertEqual(ot.get('b', vardict = {'x' : 1}), 2)
+        self.assertEqual(ot.get('b', vardict = {'x' : 5}), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
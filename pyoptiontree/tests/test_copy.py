@@ -0,0 +1,85 @@
+import unittest
+
+from pyoptiontree import PyOptionTree
+
+
+class CopyOnWriteTests(unittest.TestCase):
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testCopyIsolation(self):
+        ot = self.parse('a = 1; t = {b = 2; u = {c = [1, 2]}}')
+        cp = ot.copy()
+
+        cp.set('t/u/c', 3)
+        cp.set('t/new', 4)
+        self.assertEqual(ot.get('t/u/c'), [1, 2])
+        self.assertFalse(ot.isValid('t/new'))
+
+        ot.set('a', 5)
+        ot.set('t/b', 6)
+        self.assertEqual(cp.get('a'), 1)
+        self.assertEqual(cp.get('t/b'), 2)
+        self.assertEqual(cp.get('t/u/c'), 3)
+        self.assertEqual(cp.get('t/new'), 4)
+
+    def testCopiedValuesNotShared(self):
+        ot = self.parse('l = [1, [2, 3]]')
+        cp = ot.copy()
+        cp.get('l')[1].append(4)
+        self.assertEqual(ot.get('l'), [1, [2, 3]])
+
+    def testCopyOfCopy(self):
+        ot = self.parse('t = {a = 1; b = 2}')
+        cp1 = ot.copy()
+        cp2 = cp1.copy()
+        cp1.set('t/a', 10)
+        cp2.set('t/b', 20)
+        ot.set('t/a', 100)
+        self.assertEqual((ot.get('t/a'), ot.get('t/b')), (100, 2))
+        self.assertEqual((cp1.get('t/a'), cp1.get('t/b')), (10, 2))
+        self.assertEqual((cp2.get('t/a'), cp2.get('t/b')), (1, 20))
+
+    def testCopyFunctionIsolation(self):
+        ot = self.parse('base = {a = 1; s = {b = 2}}; c1 = copy(base); c2 = copy(base); c1/a = 3; c2/s/b = 4')
+        self.assertEqual((ot.get('base/a'), ot.get('base/s/b')), (1, 2))
+        self.assertEqual((ot.get('c1/a'), ot.get('c1/s/b')), (3, 2))
+        self.assertEqual((ot.get('c2/a'), ot.get('c2/s/b')), (1, 4))
+
+        ot.set('base/s/b', 5)
+        self.assertEqual(ot.get('c1/s/b'), 2)
+
+    def testCopyKeepsLinksInside(self):
+        ot = self.parse('x = 1; base = {a = 2; b = a; c = /x}; t = {c = copy(../base)}')
+        self.assertEqual(ot.get('t/c/b'), 2)
+        self.assertEqual(ot.get('t/c/c'), 1)
+        ot.set('base/a', 5)
+        self.assertEqual(ot.get('t/c/b'), 2)
+        ot.set('t/c/a', 6)
+        self.assertEqual(ot.get('t/c/b'), 6)
+        self.assertEqual(ot.get('base/b'), 5)
+        ot.set('x', 3)
+        self.assertEqual(ot.get('t/c/c'), 3)
+
+    def testReref(self):
+        ot = self.parse('list1 = {style1 = "Bold"; items = [("Colorado", style1)]}; '
+                        'list2 = {style1 = "Tiny"; items = reref(../list1/items)}')
+        self.assertEqual(ot.get('list1/items'), [('Colorado', 'Bold')])
+        self.assertEqual(ot.get('list2/items'), [('Colorado', 'Tiny')])
+
+    def testCopyMergesIntoExistingBranch(self):
+        ot = self.parse('base = {a = 1; b = 2}; t = {b = 3; c = 4}; t = copy(base)')
+        self.assertEqual(ot.get('t/a'), 1)
+        self.assertEqual(ot.get('t/b'), 2)
+
+    def testCopyEqualsOriginal(self):
+        ot = self.parse('a = 1; t = {b = [1, 2]; u = {c = "x"}}; l = t/u/c')
+        self.assertEqual(ot.copy(), ot)
+        self.assertEqual(ot.get('t').copy(), ot.get('t'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from pyoptiontree import PyOptionTree
+
+
+class TypeDispatchTests(unittest.TestCase):
+
+    def parse(self, s, userfunclist = []):
+        ot = PyOptionTree(userfunclist = userfunclist)
+        ot.addString(s)
+        return ot
+
+    def testValueTypes(self):
+        ot = self.parse('n = 12; f = -1.5e2; s = "a"; l = [1, (2, 3)]; t = {x = ../n}; '
+                        'b = True; z = None; e = @(${n} + 1); k = n; r = range(2)')
+        self.assertEqual(ot.get('n'), 12)
+        self.assertEqual(ot.get('f'), -150.)
+        self.assertEqual(ot.get('s'), 'a')
+        self.assertEqual(ot.get('l'), [1, (2, 3)])
+        self.assertEqual(ot.get('t/x'), 12)
+        self.assertEqual(ot.get('b'), True)
+        self.assertEqual(ot.get('z'), None)
+        self.assertEqual(ot.get('e'), 13)
+        self.assertEqual(ot.get('k'), 12)
+        self.assertEqual(ot.get('r'), [0, 1])
+
+    def testUserFunctionAddedAfterParse(self):
+        ot = self.parse('a = 1')
+        ot.addUserFunctions([('foo', lambda x: x * 10)])
+        ot.addString('b = foo(2); t = {c = foo(../a)}')
+        self.assertEqual(ot.get('b'), 20)
+        self.assertEqual(ot.get('t/c'), 10)
+
+    def testUserFunctionSharingFirstCharacter(self):
+        # 'c' has already been dispatched (to cat and copy) when cube is added
+        ot = self.parse('a = cat("x", "y"); b = copy(a)')
+        self.assertEqual(ot.get('b'), 'xy')
+        ot.addUserFunctions([('cube', lambda x: x ** 3)])
+        ot.addString('c = cube(2); d = cat("z", "w")')
+        self.assertEqual(ot.get('c'), 8)
+        self.assertEqual(ot.get('d'), 'zw')
+
+    def testUserFunctionOverriddenAfterParse(self):
+        ot = self.parse('a = foo(3)', [('foo', lambda x: x)])
+        self.assertEqual(ot.get('a'), 3)
+        ot.addUserFunctions([('foo', lambda x: -x)])
+        ot.addString('b = foo(3)')
+        self.assertEqual(ot.get('b'), -3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import gc, unittest
+
+from pyoptiontree import PyOptionTree
+
+
+def classState():
+    # Sizes of the mutable containers held by the class
+    return dict([(k, len(v)) for k, v in vars(PyOptionTree).items() if isinstance(v, (dict, list, set))])
+
+
+class EscapeTests(unittest.TestCase):
+
+    def parse(self, s, ot = None):
+        if ot is None:
+            ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testEscapedCharacters(self):
+        ot = self.parse(r'a = "q\"uote"; b = "back\\slash"; c = "\# \% \/\/ \/*"; d = x\ y; '
+                        r"e = 'it\'s'; f = [\"a\", \"b\"]")
+        self.assertEqual(ot.get('a'), 'q"uote')
+        self.assertEqual(ot.get('b'), 'back\\slash')
+        self.assertEqual(ot.get('c'), '# % // /*')
+        self.assertEqual(ot.get('e'), "it's")
+
+    def testEscapedNewline(self):
+        ot = self.parse('a = "line1\\\nline2"')
+        self.assertEqual(ot.get('a'), 'line1\nline2')
+
+    def testEscapedUnicode(self):
+        # Escaped characters past Latin-1, from unicode strings and from
+        # UTF-8 encoded ones (as read from files)
+        for s in [u'a = "x\\中\\éy"; key0 = "\\€5"; key1 = "\\\U0001f525"; key2 = 1',
+                  u'a = "x\\中\\éy"; key0 = "\\€5"; key1 = "\\\U0001f525"; key2 = 1'.encode('utf-8')]:
+            ot = self.parse(s)
+            self.assertEqual(ot.get('a'), u'x中éy'.encode('utf-8'))
+            self.assertEqual(ot.get('key0'), u'€5'.encode('utf-8'))
+            self.assertEqual(ot.get('key1'), u'\U0001f525'.encode('utf-8'))
+            self.assertEqual(ot.get('key2'), 1)
+
+    def testTagTextInInput(self):
+        # Text that looks like an escape tag (but isn't) is left alone
+        ot = self.parse('a = "_EC00_41 \\x41"')
+        self.assertEqual(ot.get('a'), '_EC00_41 x41')
+
+    def testSoak(self):
+        # Repeated parsing, as every `set` command does, must not leave
+        # anything behind in the class or grow the number of live objects
+        s = u'; '.join([u'k%d = "v\\"%d\\\\ \\#%d \\中"' % (i, i, i) for i in xrange(50)])
+        ot = PyOptionTree()
+
+        self.parse(s, ot)
+        self.parse(s)
+        gc.collect()
+        state, objects = classState(), len(gc.get_objects())
+
+        for i in xrange(100):
+            self.parse(s, ot)
+            self.parse(s)
+
+        gc.collect()
+        self.assertEqual(classState(), state)
+        self.assertTrue(len(gc.get_objects()) - objects < 100, len(gc.get_objects()) - objects)
+        self.assertEqual(ot.get('k49'), u'v"49\\ #49 中'.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
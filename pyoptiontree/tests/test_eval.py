@@ -0,0 +1,64 @@
+import unittest
+
+from pyoptiontree import PyOptionTree
+
+
+class EvalTests(unittest.TestCase):
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testPureStatementFollowsDependencies(self):
+        ot = self.parse('a = 2; b = @(${a} * 3)')
+        self.assertEqual(ot.get('b'), 6)
+        ot.set('a', 5)
+        self.assertEqual(ot.get('b'), 15)
+
+    def testImpureStatementEvaluatedEachTime(self):
+        counter = [0]
+        def count():
+            counter[0] += 1
+            return counter[0]
+        ot = self.parse('b = @(count())')
+        self.assertEqual(ot.get('b', vardict = {'count' : count}), 1)
+        self.assertEqual(ot.get('b', vardict = {'count' : count}), 2)
+
+    def testMemoizedValuesAreCopies(self):
+        ot = self.parse('s = @(set([1, 2])); t = s; u = @([set([1]), {"a" : [1]}])')
+        ot.get('t').add(3)
+        self.assertEqual(ot.get('s'), set([1, 2]))
+        ot.get('s').add(4)
+        self.assertEqual(ot.get('s'), set([1, 2]))
+        v = ot.get('u')
+        v[0].add(2)
+        v[1]['a'].append(2)
+        self.assertEqual(ot.get('u'), [set([1]), {'a' : [1]}])
+
+    def testProfileOffByDefault(self):
+        ot = self.parse('a = 2; b = @(${a} * 3)')
+        ot.get('b')
+        self.assertEqual(ot.evalProfile(), [])
+
+    def testProfileCountsOnlyEvaluations(self):
+        ot = self.parse('a = 2; b = @(${a} * 3)')
+        ot.profileEvals()
+        for i in range(5):
+            ot.get('b')     # evaluated once, then cached
+        ot.set('a', 3)
+        ot.get('b')
+
+        profile = ot.evalProfile(reset = True)
+        self.assertEqual(len(profile), 1)
+        self.assertEqual(profile[0][4], 2)
+        self.assertEqual(ot.evalProfile(), [])
+
+        ot.profileEvals(False)
+        ot.set('a', 4)
+        ot.get('b')
+        self.assertEqual(ot.evalProfile(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os, shutil, tempfile, unittest
+
+from pyoptiontree import PyOptionTree, PyOptionTreeParseError
+
+
+class FlatFileTests(unittest.TestCase):
+
+    OPTIONS = ('a = 1; f = 2.5; s = "x \\"quoted\\" \\\\ y"; n = None; b = True; '
+               'l = [1, "two", [3.5, None]]; d = dict([("k", [1, 2])]); '
+               't = {u = {v = "deep"}; w = ../a}; e = @(${a} + 1); r = range(3)')
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testFlatItems(self):
+        ot = self.parse('a = 1; t = {b = 2; u = {c = ../b}}; d = 3')
+        self.assertEqual(ot.flatItems(), [('a', 1), ('t/b', 2), ('t/u/c', 2), ('d', 3)])
+        self.assertEqual(ot.get('t').flatItems(), [('b', 2), ('u/c', 2)])
+
+    def testFlatItemsFollowChanges(self):
+        ot = self.parse('a = 1; t = {b = 2; u = {c = ../b}}')
+        ot.flatItems()
+        ot.set('t/b', 5)
+        ot.set('t/new', 6)
+        ot.set('z', {'k' : 1})
+        self.assertEqual(ot.flatItems(), [('a', 1), ('t/u/c', 5), ('t/b', 5), ('t/new', 6), ('z', {'k' : 1})])
+
+    def roundtrip(self, save, add, name):
+        ot = self.parse(self.OPTIONS)
+        fn = os.path.join(self.dir, name)
+        save(ot, fn)
+        loaded = PyOptionTree()
+        add(loaded, fn)
+        return ot, loaded
+
+    def check(self, ot, loaded):
+        self.assertEqual(loaded.flatItems(), ot.flatItems())
+        self.assertEqual(loaded.get('t/u/v'), 'deep')
+        self.assertEqual(loaded.get('e'), 2)
+        self.assertEqual(type(loaded.get('s')), str)
+
+    def testJSONRoundTrip(self):
+        self.check(*self.roundtrip(PyOptionTree.saveJSON, PyOptionTree.addJSONFile, 'tree.json'))
+
+    def testYAMLRoundTrip(self):
+        self.check(*self.roundtrip(PyOptionTree.saveYAML, PyOptionTree.addYAMLFile, 'tree.yaml'))
+
+    def testSameAsSaveTree(self):
+        ot = self.parse('a = 1; s = "x"; l = [1, [2, "y"]]; t = {u = {v = 2.5}}')
+        ot.saveJSON(os.path.join(self.dir, 'tree.json'))
+        ot.saveTree(os.path.join(self.dir, 'tree.opt'))
+
+        fromjson = PyOptionTree()
+        fromjson.addJSONFile(os.path.join(self.dir, 'tree.json'))
+        fromopt = PyOptionTree()
+        fromopt.addOptionsFile(os.path.join(self.dir, 'tree.opt'))
+        self.assertEqual(fromjson.flatItems(), fromopt.flatItems())
+
+    def testEmpty(self):
+        for save, add, name in [(PyOptionTree.saveJSON, PyOptionTree.addJSONFile, 'e.json'),
+                                (PyOptionTree.saveYAML, PyOptionTree.addYAMLFile, 'e.yaml')]:
+            fn = os.path.join(self.dir, name)
+            save(PyOptionTree(), fn)
+            loaded = PyOptionTree()
+            add(loaded, fn)
+            self.assertEqual(loaded.flatItems(), [])
+
+    def testBadJSON(self):
+        fn = os.path.join(self.dir, 'bad.json')
+        f = open(fn, 'w')
+        f.write('[1, 2]')
+        f.close()
+        self.assertRaises(PyOptionTreeParseError, PyOptionTree().addJSONFile, fn)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from pyoptiontree import PyOptionTree
+
+
+class StoredFunctionTests(unittest.TestCase):
+
+    def parse(self, s, userfunclist = []):
+        ot = PyOptionTree(userfunclist = userfunclist)
+        ot.addString(s)
+        return ot
+
+    def testBuiltins(self):
+        ot = self.parse('n = 4; name = "x"; r = range(1, n); d = dict([("a", 1), ("b", n)]); '
+                        'c = cat("a", name, "b"); s = sum(1, 2, n); p = rep("${name}-${n}"); '
+                        'q = seqrep([1, 2, 3], (1, 0))')
+        self.assertEqual(ot.get('r'), [1, 2, 3])
+        self.assertEqual(ot.get('d'), {'a' : 1, 'b' : 4})
+        self.assertEqual(ot.get('c'), 'axb')
+        self.assertEqual(ot.get('s'), 7)
+        self.assertEqual(ot.get('p'), 'x-4')
+        self.assertEqual(ot.get('q'), [1, 0, 3])
+
+    def testNestedFunctions(self):
+        ot = self.parse('n = 3; l = cat(range(n), range(n, add(n, 2)))')
+        self.assertEqual(ot.get('l'), [0, 1, 2, 3, 4])
+        ot.set('n', 1)
+        self.assertEqual(ot.get('l'), [0, 1, 2])
+
+    def testUserFunctions(self):
+        calls = []
+        def scale(x, factor = 2):
+            calls.append((x, factor))
+            return x*factor
+        ot = self.parse('a = 3; b = scale(a); c = scale(a, 10); d = [scale(1), scale(b)]',
+                        [('scale', scale)])
+        self.assertEqual(ot.get('b'), 6)
+        self.assertEqual(ot.get('c'), 30)
+        self.assertEqual(ot.get('d'), [2, 12])
+        self.assertEqual(ot.get('c', vardict = {'x' : 0}), 30)
+        self.assertTrue((3, 10) in calls)
+
+    def testUserFunctionEvaluatedEveryTime(self):
+        counter = [0]
+        def count():
+            counter[0] += 1
+            return counter[0]
+        ot = self.parse('c = count()', [('count', count)])
+        self.assertEqual(ot.get('c'), 1)
+        self.assertEqual(ot.get('c'), 2)
+
+    def testImmediateUserFunction(self):
+        counter = [0]
+        def count():
+            counter[0] += 1
+            return counter[0]
+        ot = self.parse('c = countnow()', [('countnow', count, True)])
+        self.assertEqual(counter[0], 1)
+        self.assertEqual(ot.get('c'), 1)
+        self.assertEqual(ot.get('c'), 1)
+
+    def testBranchFunctions(self):
+        ot = self.parse('t = {a = 1; b = range(a, 4); c = rep("${a}")}')
+        self.assertEqual(ot.get('t/b'), [1, 2, 3])
+        self.assertEqual(ot.get('t/c'), '1')
+
+
+if __name__ == '__main__':
+    unittest.main()
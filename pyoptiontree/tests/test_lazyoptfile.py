@@ -0,0 +1,76 @@
+import os, shutil, tempfile, unittest
+
+from pyoptiontree import PyOptionTree, PyOptionTreeParseError, PyOptionTreeIncludeError
+
+
+class LazyOptFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        f = open(os.path.join(self.dir, name), 'w')
+        f.write(content)
+        f.close()
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testOptFileEvaluatesAtInclude(self):
+        self.write('inc.opt', 'y = copy(../x)\nz = now(../x)\nw = copy(../base)\n')
+        ot = self.parse('x = 1; base = {v = 1}; inc = optfile("inc.opt"); x = 2; base/v = 2')
+        self.assertEqual(ot.get('inc/y'), 1)
+        self.assertEqual(ot.get('inc/z'), 1)
+        self.assertEqual(ot.get('inc/w/v'), 1)
+
+    def testLazyOptFileEvaluatesOnFirstUse(self):
+        self.write('inc.opt', 'y = copy(../x)\n')
+        ot = self.parse('x = 1; inc = lazyoptfile("inc.opt"); x = 2')
+        self.assertEqual(ot.get('inc/y'), 2)
+
+    def testLazyOptFileValues(self):
+        self.write('inc.opt', 'a = 1\nb = [1, 2, ../a]\nc = {d = "e"}\n')
+        ot = self.parse('a = 3; inc = lazyoptfile("inc.opt"); inc/a = 4')
+        self.assertEqual(ot.get('inc/a'), 4)
+        self.assertEqual(ot.get('inc/b'), [1, 2, 3])
+        self.assertEqual(ot.get('inc/c/d'), 'e')
+        self.assertEqual(ot.get('inc/missing', 5), 5)
+
+    def testLazyOptFileSameAsOptFile(self):
+        self.write('inc.opt', 'a = 1\nb = [1, 2, ../a]\nc = {d = "e"}\n')
+        self.assertEqual(self.parse('a = 3; inc = lazyoptfile("inc.opt")'),
+                         self.parse('a = 3; inc = optfile("inc.opt")'))
+
+    def testMissingFileFailsAtInclude(self):
+        self.assertRaises(PyOptionTreeParseError, self.parse, 'inc = lazyoptfile("missing.opt")')
+
+    def testSyntaxErrorFailsAtInclude(self):
+        for content in ['a = [1, 2\n', 'a = "x\n', 'a = 1 /* b = 2\n', 'a = foo(1\n']:
+            self.write('bad.opt', content)
+            self.assertRaises(PyOptionTreeParseError, self.parse, 'inc = optfile("bad.opt")')
+            self.assertRaises(PyOptionTreeParseError, self.parse, 'inc = lazyoptfile("bad.opt")')
+
+    def testLoadErrorNotSwallowed(self):
+        self.write('bad.opt', 'a = 1\nb = @@@\n')
+        ot = self.parse('inc = lazyoptfile("bad.opt"); l = inc/a')
+
+        for i in range(2):  # and again, once the error is stored
+            self.assertRaises(PyOptionTreeIncludeError, ot.get, 'inc/a')
+            self.assertRaises(PyOptionTreeIncludeError, ot.get, 'inc/a', 5)
+            self.assertRaises(PyOptionTreeIncludeError, ot.get, 'l', 5)
+            self.assertRaises(PyOptionTreeIncludeError, ot.isValid, 'inc/a')
+            self.assertRaises(PyOptionTreeIncludeError, ot.isValid, 'inc/zz')
+
+        self.assertEqual(ot.get('other', 3), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from pyoptiontree import PyOptionTree, PyOptionTreeParseError
+
+
+class AddMappingTests(unittest.TestCase):
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testNestedAndFlat(self):
+        ot = PyOptionTree()
+        ot.addMapping({'a/b' : 1, 'a' : {'c' : 2, 'd' : {'e' : 3}}, 'f' : [1, 2]})
+        self.assertEqual(ot.get('a/b'), 1)
+        self.assertEqual(ot.get('a/c'), 2)
+        self.assertEqual(ot.get('a/d/e'), 3)
+        self.assertEqual(ot.get('f'), [1, 2])
+
+    def testEmptyDictCreatesBranch(self):
+        ot = PyOptionTree()
+        ot.addMapping({'a' : {}, 'b' : {'c' : {}}})
+        self.assertTrue(isinstance(ot.get('a'), PyOptionTree))
+        self.assertEqual(ot.get('a').size(), 0)
+        self.assertTrue(isinstance(ot.get('b/c'), PyOptionTree))
+
+    def testNoneIsStored(self):
+        ot = PyOptionTree()
+        ot.addMapping({'a' : None, 'b' : {'c' : None}})
+        ot.addMapping([('d', None), ('t/e', None)])
+        for name in ['a', 'b/c', 'd', 't/e']:
+            self.assertEqual(ot.get(name, 'missing'), None)
+        # the same as set() and update()
+        other = PyOptionTree()
+        other.set('a', None)
+        other.update({'d' : None})
+        self.assertEqual(other.get('a', 'missing'), None)
+        self.assertEqual(other.get('d', 'missing'), None)
+
+    def testThroughSoftLink(self):
+        ot = self.parse('t = {z = 1}; l = t')
+        ot.addMapping([('l/z', 2), ('l/y', 3)])
+        self.assertEqual(ot.get('t/z'), 2)
+        self.assertEqual(ot.get('t/y'), 3)
+
+    def testSoftLinkReplacedByValue(self):
+        ot = self.parse('t = {z = 1}; l = t')
+        self.assertRaises(PyOptionTreeParseError, ot.addMapping, [('l/z', 2), ('l', 3), ('l/z', 4)])
+        self.assertEqual(ot.get('t/z'), 2)
+        self.assertEqual(ot.get('l'), 3)
+
+    def testSoftLinkReplacedByBranch(self):
+        ot = self.parse('t = {z = 1}; l = t')
+        ot.addMapping([('l/z', 2), ('l', PyOptionTree()), ('l/z', 3)])
+        self.assertEqual(ot.get('t/z'), 2)
+        self.assertEqual(ot.get('l/z'), 3)
+
+    def testBranchReplaced(self):
+        ot = self.parse('t = {z = 1}')
+        ot.addMapping([('t/z', 2), ('t', {}), ('t/y', 3)])
+        self.assertEqual(ot.get('t/z'), 2)
+        ot.addMapping([('t/z', 4), ('t', 5)])
+        self.assertEqual(ot.get('t'), 5)
+
+    def testEmptyName(self):
+        ot = PyOptionTree()
+        self.assertRaises(PyOptionTreeParseError, ot.addMapping, {'' : 1})
+        self.assertRaises(PyOptionTreeParseError, ot.addMapping, {'a' : {'' : 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
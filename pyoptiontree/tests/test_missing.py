@@ -0,0 +1,76 @@
+import unittest
+
+from pyoptiontree import PyOptionTree
+
+
+class MissingKeyTests(unittest.TestCase):
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testSetAfterMiss(self):
+        ot = self.parse('a = 1')
+        self.assertEqual(ot.get('b', 'd'), 'd')
+        self.assertFalse(ot.isValid('b'))
+        ot.set('b', 2)
+        self.assertEqual(ot.get('b', 'd'), 2)
+        self.assertTrue('b' in ot)
+
+    def testNestedSetAfterMiss(self):
+        ot = self.parse('t = {a = 1}')
+        self.assertEqual(ot.get('t/u/v', None), None)
+        ot.set('t/u/v', 3)
+        self.assertEqual(ot.get('t/u/v', None), 3)
+        self.assertEqual(ot.get('t/u').get('v'), 3)
+
+    def testAddStringCreatesBranch(self):
+        ot = self.parse('a = 1')
+        self.assertEqual(ot.get('t/v', 0), 0)
+        self.assertFalse(ot.isValid('t'))
+        ot.addString('t = {v = 5}')
+        self.assertEqual(ot.get('t/v', 0), 5)
+        self.assertTrue(ot.isValid('t/v'))
+
+    def testLinkToKeyAddedLater(self):
+        ot = self.parse('a = b; t = {c = ../b}')
+        self.assertEqual(ot.get('a', 'd'), 'd')
+        self.assertEqual(ot.get('t/c', 'd'), 'd')
+        self.assertFalse(ot.isValid('a'))
+        ot.set('b', 7)
+        self.assertEqual(ot.get('a', 'd'), 7)
+        self.assertEqual(ot.get('t/c', 'd'), 7)
+        self.assertTrue(ot.isValid('a'))
+        ot.set('b', 8)
+        self.assertEqual(ot.get('a'), 8)
+
+    def testPartialList(self):
+        ot = self.parse('a = 1; l = [a, b, [c, a]]')
+        self.assertEqual(ot.get('l', 'd'), [1, 'd', ['d', 1]])
+        self.assertEqual(ot.get('l', None), [1, None, [None, 1]])
+        self.assertTrue(ot.isValid('l'))
+        ot.set('b', 2)
+        self.assertEqual(ot.get('l', 'd'), [1, 2, ['d', 1]])
+        ot.set('c', 3)
+        self.assertEqual(ot.get('l', 'd'), [1, 2, [3, 1]])
+        self.assertEqual(ot.get('l'), [1, 2, [3, 1]])
+
+    def testMissWithoutDefaultRaises(self):
+        ot = self.parse('a = 1')
+        self.assertEqual(ot.get('b', None), None)
+        self.assertRaises(Exception, ot.get, 'b')
+        ot.set('b', 2)
+        self.assertEqual(ot.get('b'), 2)
+
+    def testDefaultNotCached(self):
+        ot = self.parse('a = 1')
+        self.assertEqual(ot.get('b', 1), 1)
+        self.assertEqual(ot.get('b', 2), 2)
+        v = ot.get('b', [])
+        v.append(1)
+        self.assertEqual(ot.get('b', []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
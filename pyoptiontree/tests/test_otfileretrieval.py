@@ -0,0 +1,76 @@
+import os, shutil, tempfile, unittest
+
+from pyoptiontree import otfileretrieval as otr
+from pyoptiontree import PyOptionTreeRetrievalError
+
+
+class RetrievalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.settings = otr.OTRetrievalSettings.copy()
+        otr.OTConfigureRetrieval(cachedir = os.path.join(self.dir, 'cache'))
+
+    def tearDown(self):
+        otr.OTRetrievalSettings.update(self.settings)
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        name = os.path.join(self.dir, name)
+        if not os.path.isdir(os.path.dirname(name)):
+            os.makedirs(os.path.dirname(name))
+        f = open(name, 'w')
+        f.write(content)
+        f.close()
+        return name
+
+    def read(self, name):
+        f = open(name)
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def testMirrorKeyedOnHostAndPath(self):
+        self.write('mirror/host1/a/config.opt', 'one')
+        self.write('mirror/host2/b/config.opt', 'two')
+        self.write('mirror/www.example.com/c/config.opt', 'three')
+        otr.OTConfigureRetrieval(directory = os.path.join(self.dir, 'mirror'), offline = True)
+
+        self.assertEqual(self.read(otr.OT_retrieve_file('host1:/a/config.opt')), 'one')
+        self.assertEqual(self.read(otr.OT_retrieve_file('me@host2:/b/config.opt')), 'two')
+        self.assertEqual(self.read(otr.OT_retrieve_file('http://www.example.com/c/config.opt', 'url')), 'three')
+        self.assertRaises(PyOptionTreeRetrievalError, otr.OT_retrieve_file, 'host2:/a/config.opt')
+        self.assertRaises(PyOptionTreeRetrievalError, otr.OT_retrieve_file, 'host1:/../../a/config.opt')
+
+    def testMirrorOnlyUsedOffline(self):
+        self.write('mirror/config.opt', 'mirror')
+        source = self.write('src/config.opt', 'source')
+        otr.OTConfigureRetrieval(directory = os.path.join(self.dir, 'mirror'))
+        self.assertEqual(self.read(otr.OT_retrieve_file(source, 'file')), 'source')
+
+    def testParallelRetrieval(self):
+        files = [self.write('src/f%d' % i, 'x%d' % i) for i in range(10)]
+        before = otr.OTRetrievalStats['fetched']
+        self.assertEqual([self.read(f) for f in otr.OT_retrieve_files(files, 'file')],
+                         ['x%d' % i for i in range(10)])
+        self.assertEqual(otr.OTRetrievalStats['fetched'] - before, 10)
+
+    def testObjectsBounded(self):
+        otr.OTConfigureRetrieval(maxobjects = 3, ttl = 0)
+        files = [self.write('src/f%d' % i, 'x%d' % i) for i in range(10)]
+        for f in files:
+            last = otr.OT_retrieve_file(f, 'file')
+        self.assertEqual(len(os.listdir(os.path.join(self.dir, 'cache', 'objects'))), 3)
+        self.assertEqual(self.read(last), 'x9')
+
+    def testClearCache(self):
+        source = self.write('src/config.opt', 'source')
+        otr.OT_retrieve_file(source, 'file')
+        otr.OTClearRetrievalCache()
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'cache')))
+        self.assertEqual(self.read(otr.OT_retrieve_file(source, 'file')), 'source')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os, sys, shutil, subprocess, tempfile, unittest
+
+from pyoptiontree import PyOptionTree, OTParseCache
+
+# Run in a separate process.  With 'notokenize' the tokenizer raises,
+# so the file can only be added from the cache.
+CHILD = """
+import sys
+from pyoptiontree import PyOptionTree, OTParseCache
+
+def notokenize(self, s):
+    raise RuntimeError('tokenized')
+if sys.argv[3] == 'notokenize':
+    PyOptionTree._PyOptionTree__PrepareString = notokenize
+
+ot = PyOptionTree()
+ot.setParseCache(OTParseCache(sys.argv[1]))
+ot.addOptionsFile(sys.argv[2])
+ot.set('a', 10)
+print repr((ot.get('b'), ot.get('c'), ot.get('t/d'), ot.get('inc/x')))
+"""
+
+class ParseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        name = os.path.join(self.dir, name)
+        f = open(name, 'w')
+        f.write(content)
+        f.close()
+        return name
+
+    def entries(self):
+        return len([fn for fn in os.listdir(self.cachedir) if fn.endswith('.otc')])
+
+    def load(self, fn, cache = None):
+        ot = PyOptionTree()
+        ot.setParseCache(cache or OTParseCache(self.cachedir))
+        ot.addOptionsFile(fn)
+        return ot
+
+    def child(self, fn, mode):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        script = self.write('child.py', CHILD)
+        p = subprocess.Popen([sys.executable, script, self.cachedir, fn, mode], cwd = root,
+                             stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+                             env = dict(os.environ, PYTHONPATH = root))
+        out, err = p.communicate()
+        self.assertEqual(p.returncode, 0, err)
+        return eval(out)
+
+    def testReusedAcrossProcesses(self):
+        self.write('inc.opt', 'x = [1, 2]\n')
+        fn = self.write('main.opt', 'a = 1\nb = a\nc = @(${a} * 2)\nt = {d = range(../a)}\ninc = optfile("inc.opt")\n')
+
+        first = self.child(fn, 'tokenize')
+        self.assertEqual(self.entries(), 1)
+        self.assertEqual(self.child(fn, 'notokenize'), first)
+        self.assertEqual(first, (10, 20, range(10), [1, 2]))
+
+    def testSameTreeAsParsing(self):
+        self.write('inc.opt', 'x = [1, 2]\n')
+        fn = self.write('main.opt', 'a = 1\nb = a\nc = @(${a} * 2)\nt = {d = range(../a)}\ninc = optfile("inc.opt")\n')
+
+        parsed = PyOptionTree()
+        parsed.addOptionsFile(fn)
+        self.load(fn)
+        self.assertEqual(self.load(fn), parsed)
+
+    def testStaleContent(self):
+        fn = self.write('main.opt', 'a = 1\n')
+        self.assertEqual(self.load(fn).get('a'), 1)
+        self.write('main.opt', 'a = 2\n')
+        self.assertEqual(self.load(fn).get('a'), 2)
+
+    def testStaleInclude(self):
+        self.write('inc.opt', 'x = 1\n')
+        fn = self.write('main.opt', 'inc = optfile("inc.opt")\n')
+        self.assertEqual(self.load(fn).get('inc/x'), 1)
+        self.write('inc.opt', 'x = 2\n')
+        self.assertEqual(self.load(fn).get('inc/x'), 2)
+
+    def testParseTimeFunctionsNotCached(self):
+        fn = self.write('main.opt', 'a = 1\nb = copy(a)\n')
+        self.load(fn)
+        self.assertEqual(self.entries(), 0)
+
+    def testBounded(self):
+        cache = OTParseCache(self.cachedir, maxentries = 2)
+        for i in range(4):
+            self.load(self.write('f%d.opt' % i, 'a = %d\n' % i), cache)
+        self.assertEqual(self.entries(), 2)
+        cache.clear()
+        self.assertEqual(self.entries(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from pyoptiontree import PyOptionTree
+
+
+class ElementAssignmentTests(unittest.TestCase):
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def testPlainIndices(self):
+        ot = self.parse('l = [1, 2, 3]; l[1] = 5; l[4] = 6; l[1] = 7')
+        self.assertEqual(ot.get('l'), [1, 7, 3, None, 6])
+
+    def testManyAssignmentsToOneIndex(self):
+        ot = PyOptionTree()
+        ot.set('l', [0, 0])
+        for i in range(2000):
+            ot.set('l[1]', i)
+        self.assertEqual(ot.get('l'), [0, 1999])
+
+    def testNegativeIndexSeesEarlierExtension(self):
+        # l[-1] is the element l[5] = 1 added, so the later l[5] = 2
+        # must not drop l[5] = 1 from in front of it.
+        ot = self.parse('l = [1, 2, 3]; l[5] = 1; l[-1] = 9; l[5] = 2')
+        self.assertEqual(ot.get('l'), [1, 2, 3, None, None, 2])
+
+    def testNegativeIndexThenPlainIndex(self):
+        ot = self.parse('l = [1, 2, 3]; l[-1] = 9; l[5] = 1; l[-1] = 8; l[2] = 7')
+        self.assertEqual(ot.get('l'), [1, 2, 7, None, None, 8])
+
+    def testSliceKeepsOrder(self):
+        ot = self.parse('l = [1, 2, 3]; l[0] = 4; l[1:] = [5]; l[1] = 6')
+        self.assertEqual(ot.get('l'), [4, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from pyoptiontree import PyOptionTree, PyOptionTreeParseError
+
+
+class TokenizerTests(unittest.TestCase):
+
+    def parse(self, s):
+        ot = PyOptionTree()
+        ot.addString(s)
+        return ot
+
+    def error(self, s):
+        try:
+            self.parse(s)
+        except PyOptionTreeParseError, e:
+            return str(e)
+        self.fail('no error parsing ' + repr(s))
+
+    def testComments(self):
+        ot = self.parse('a = 1 // c\n/* multi\nline */ b = 2 # z\n<!-- x = 1 -->c = 3\n% d = 4\ne = "/* not a comment */"')
+        self.assertEqual(ot.get('a'), 1)
+        self.assertEqual(ot.get('b'), 2)
+        self.assertEqual(ot.get('c'), 3)
+        self.assertFalse(ot.isValid('x'))
+        self.assertFalse(ot.isValid('d'))
+        self.assertEqual(ot.get('e'), '/* not a comment */')
+
+    def testEscapes(self):
+        ot = self.parse('a = "x\\"y"; b = \'q\\\\r\'; c = "a\\\nb"; d = "\\# \\/"')
+        self.assertEqual(ot.get('a'), 'x"y')
+        self.assertEqual(ot.get('b'), 'q\\r')
+        self.assertEqual(ot.get('c'), 'a\nb')
+        self.assertEqual(ot.get('d'), '# /')
+
+    def testMultiLineValues(self):
+        ot = self.parse('d = [1,\n 2, // two\n 3]\nt = {\n  a = 1\n  b = "x"\n}')
+        self.assertEqual(ot.get('d'), [1, 2, 3])
+        self.assertEqual(ot.get('t/b'), 'x')
+
+    def testErrorLocations(self):
+        self.assertTrue('Line 3, Columns 11-13' in self.error('a = 1\n/* c\n c */ b = @@@'))
+        self.assertTrue('Line 4, Columns 2-5' in self.error('a = "x\\"\\"" \n b = [1,\n 2,\n $$$]'))
+        self.assertTrue('Line 2, Columns 7-13' in self.error('a = 1\nb = 2 /* open'))
+        self.assertTrue('Line 1, Col 1' in self.error('a\n'))
+
+    def testLongInput(self):
+        n = 5000
+        lines = ['k%d = "%d" // comment %d' % (i, i, i) for i in xrange(n)]
+        ot = self.parse('\n'.join(lines))
+        self.assertEqual(ot.get('k%d' % (n - 1)), str(n - 1))
+        self.assertTrue('Line %d, Columns 8-10' % (n + 1) in self.error('\n'.join(lines + ['last = @@@'])))
+
+if __name__ == '__main__':
+    unittest.main()